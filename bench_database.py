@@ -0,0 +1,96 @@
+"""
+Concurrency stress benchmark for database.JarvisDB.
+
+Many threads hammer get_preference / get_recent_history / log_interaction
+at once (like the TTS, mic, vision and websocket threads do) and we report
+throughput and latency percentiles per operation.
+
+    python bench_database.py --threads 16 --ops 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from database import JarvisDB
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(pct / 100.0 * len(values)))]
+
+
+def run(threads=16, ops=2000, write_ratio=0.2, path=None):
+    path = path or os.path.join(tempfile.mkdtemp(), "bench.db")
+    db = JarvisDB(path)
+    for i in range(50):
+        db.set_preference(f"pref_{i}", str(i))
+    for i in range(200):
+        db.log_interaction(f"seed {i}", "chat", "ok")
+    db.flush()
+
+    timings = {"get_preference": [], "get_recent_history": [], "log_interaction": []}
+    errors = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(n):
+        rng = random.Random(n)
+        local = {name: [] for name in timings}
+        barrier.wait()
+        for i in range(ops):
+            roll = rng.random()
+            start = time.perf_counter()
+            try:
+                if roll < write_ratio:
+                    name = "log_interaction"
+                    db.log_interaction(f"thread {n} cmd {i}", "chat", "ok")
+                elif roll < (1 + write_ratio) / 2:
+                    name = "get_preference"
+                    db.get_preference(f"pref_{rng.randrange(50)}")
+                else:
+                    name = "get_recent_history"
+                    db.get_recent_history(limit=5)
+            except Exception as e:
+                errors.append(repr(e))
+                continue
+            local[name].append(time.perf_counter() - start)
+        with lock:
+            for name, values in local.items():
+                timings[name].extend(values)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    flush_start = time.perf_counter()
+    db.flush()
+    flush_time = time.perf_counter() - flush_start
+    db.close()
+
+    total = sum(len(v) for v in timings.values())
+    print(f"{threads} threads x {ops} ops: {total / elapsed:,.0f} ops/s ({elapsed:.2f}s), "
+          f"final history flush {flush_time * 1000:.1f} ms, errors: {len(errors)}")
+    for name, values in timings.items():
+        print(f"  {name:<20} n={len(values):<7} p50={percentile(values, 50) * 1e6:8.1f}us "
+              f"p99={percentile(values, 99) * 1e6:8.1f}us")
+    if errors:
+        print("  first error:", errors[0])
+    return total / elapsed, errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--db", help="database file (default: a temp file)")
+    args = parser.parse_args()
+    run(args.threads, args.ops, args.write_ratio, args.db)
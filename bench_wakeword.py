@@ -0,0 +1,87 @@
+"""
+Offline accuracy / latency benchmark for the local wake word spotter.
+
+Templates are WAV recordings of just the wake word (the ones auto-enrolled
+in wakeword_templates/ work). Test clips are WAV files in two folders: clips
+that contain the wake word and clips that don't. Each clip is scored
+like a microphone chunk would be; we report hits, false alarms, per-chunk
+latency and a threshold that separates the two sets.
+
+    python bench_wakeword.py --templates wakeword_templates --positive clips/wake --negative clips/other
+"""
+import argparse
+import glob
+import os
+import time
+
+from jarvis_wakeword import AudioFileSource, EnergyVAD, WakeWordSpotter
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(pct / 100.0 * len(values)))]
+
+
+def score_dir(spotter, vad, directory):
+    """[(path, distance, seconds)] for every WAV in directory. Clips the VAD rejects get distance inf."""
+    results = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+        pcm = AudioFileSource(path).pcm
+        start = time.perf_counter()
+        distance = spotter.score(pcm)[0] if vad.contains_speech(pcm) else float("inf")
+        results.append((path, distance, time.perf_counter() - start))
+    return results
+
+
+def suggest_threshold(positive, negative):
+    """Midpoint between the worst wake word and the best non-wake clip (None if they overlap)."""
+    worst_hit = max(positive) if positive else None
+    best_miss = min(negative) if negative else None
+    if worst_hit is None or best_miss is None or worst_hit >= best_miss:
+        return None
+    return (worst_hit + best_miss) / 2
+
+
+def run(templates, positive_dir, negative_dir, threshold=None):
+    spotter = WakeWordSpotter()
+    count = spotter.load_templates(templates)
+    if not count:
+        print(f"No templates in {templates}")
+        return None
+    if threshold is not None:
+        spotter.threshold = threshold
+    positive = score_dir(spotter, EnergyVAD(), positive_dir)
+    negative = score_dir(spotter, EnergyVAD(), negative_dir)
+
+    hits = sum(d <= spotter.threshold for _, d, _ in positive)
+    false_alarms = sum(d <= spotter.threshold for _, d, _ in negative)
+    latencies = [t for _, _, t in positive + negative]
+    print(f"{count} templates, threshold {spotter.threshold:.2f}")
+    print(f"  wake clips:  {hits}/{len(positive)} detected")
+    print(f"  other clips: {false_alarms}/{len(negative)} false alarms")
+    print(f"  latency per clip: p50={percentile(latencies, 50) * 1000:.1f}ms "
+          f"p99={percentile(latencies, 99) * 1000:.1f}ms")
+    for path, distance, _ in positive:
+        if distance > spotter.threshold:
+            print(f"  missed {os.path.basename(path)} (distance {distance:.2f})")
+    for path, distance, _ in negative:
+        if distance <= spotter.threshold:
+            print(f"  false alarm {os.path.basename(path)} (distance {distance:.2f})")
+    suggested = suggest_threshold([d for _, d, _ in positive], [d for _, d, _ in negative if d != float("inf")])
+    if suggested is not None:
+        print(f"  suggested threshold: {suggested:.2f} (wake_word_engine.threshold in jarvis_config.json)")
+    else:
+        print("  the two sets overlap, record more templates")
+    return hits, false_alarms, suggested
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--templates", default="wakeword_templates")
+    parser.add_argument("--positive", required=True, help="folder of WAV clips containing the wake word")
+    parser.add_argument("--negative", required=True, help="folder of WAV clips without it")
+    parser.add_argument("--threshold", type=float, help="override the spotter's threshold")
+    args = parser.parse_args()
+    run(args.templates, args.positive, args.negative, args.threshold)
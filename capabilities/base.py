@@ -6,7 +6,18 @@ class Capability(ABC):
     """
     def __init__(self, assistant):
         self.assistant = assistant
-        self.enabled = True
+        self.manager = None # set by CapabilityManager.register
+        self._enabled = True
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        self._enabled = bool(value)
+        if self.manager:
+            self.manager.rebuild() # dispatch lists only hold enabled capabilities
 
     @abstractmethod
     def name(self) -> str:
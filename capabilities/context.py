@@ -8,9 +8,12 @@ class ContextAwareness(Capability):
         super().__init__(assistant)
         self.current_user = "primary_user"
         self.environment_mode = "unknown" # e.g., quiet, busy
+        cfg = (getattr(assistant, "config", None) or {}).get("audio", {})
+        self.noisy_db = cfg.get("noisy_db", -35.0) # dBFS; a quiet room is around -55
 
     def set_environment_context(self, noise_level):
-        if noise_level > 80:
+        """noise_level: ambient noise in dBFS (AudioSession.noise_db)."""
+        if noise_level > self.noisy_db:
             self.environment_mode = "noisy"
         else:
             self.environment_mode = "quiet"
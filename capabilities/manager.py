@@ -2,11 +2,24 @@ from typing import List
 import importlib
 import os
 import pkgutil
+import time
+from .base import Capability
+
+# Hooks dispatched by the manager. A capability is only called for the ones it overrides.
+HOOKS = ("on_input_received", "on_intent_parsed", "check_compliance", "on_output_generation", "on_shutdown")
+
+
+def overrides(capability, hook):
+    """True if the capability implements `hook` itself instead of inheriting the no-op."""
+    return hook in vars(capability) or getattr(type(capability), hook) is not getattr(Capability, hook)
+
 
 class CapabilityManager:
     def __init__(self, assistant):
         self.assistant = assistant
         self.capabilities = []
+        self.timings = {} # (capability name, hook) -> [calls, seconds], unlocked so approximate across threads
+        self.dispatch = {hook: () for hook in HOOKS} # hook -> ((capability, bound hook, timing), ...)
 
     def load_capabilities(self):
         """
@@ -20,37 +33,75 @@ class CapabilityManager:
 
     def register(self, capability):
         self.capabilities.append(capability)
+        capability.manager = self
+        self.rebuild()
         print(f"[SYSTEM] Registered capability: {capability.name()}")
         capability.on_start()
 
+    def rebuild(self):
+        """
+        Recomputes the per-hook dispatch tuples (registration order, enabled
+        capabilities that override the hook). Called on register/enable/disable.
+        """
+        dispatch = {}
+        for hook in HOOKS:
+            entries = []
+            for cap in self.capabilities:
+                if not overrides(cap, hook) or (hook != "on_shutdown" and not cap.enabled):
+                    continue
+                timing = self.timings.setdefault((cap.name(), hook), [0, 0.0])
+                entries.append((cap, getattr(cap, hook), timing))
+            dispatch[hook] = tuple(entries)
+        self.dispatch = dispatch
+
     # --- Hook Orchestration ---
 
     def process_input(self, text: str) -> str:
-        for cap in self.capabilities:
-            if cap.enabled:
-                text = cap.on_input_received(text)
+        for cap, hook, timing in self.dispatch["on_input_received"]:
+            start = time.perf_counter()
+            text = hook(text)
+            timing[0] += 1
+            timing[1] += time.perf_counter() - start
         return text
 
     def process_intent(self, intent: dict) -> dict:
-        for cap in self.capabilities:
-            if cap.enabled:
-                intent = cap.on_intent_parsed(intent)
+        for cap, hook, timing in self.dispatch["on_intent_parsed"]:
+            start = time.perf_counter()
+            intent = hook(intent)
+            timing[0] += 1
+            timing[1] += time.perf_counter() - start
         return intent
 
     def check_compliance(self, intent: dict) -> bool:
-        for cap in self.capabilities:
-            if cap.enabled:
-                if not cap.check_compliance(intent):
-                    print(f"[BLOCKED] Action blocked by {cap.name()}")
-                    return False
+        for cap, hook, timing in self.dispatch["check_compliance"]:
+            start = time.perf_counter()
+            allowed = hook(intent)
+            timing[0] += 1
+            timing[1] += time.perf_counter() - start
+            if not allowed:
+                print(f"[BLOCKED] Action blocked by {cap.name()}")
+                return False
         return True
 
     def process_output(self, text: str) -> str:
-        for cap in self.capabilities:
-            if cap.enabled:
-                text = cap.on_output_generation(text)
+        for cap, hook, timing in self.dispatch["on_output_generation"]:
+            start = time.perf_counter()
+            text = hook(text)
+            timing[0] += 1
+            timing[1] += time.perf_counter() - start
         return text
     
     def shutdown(self):
-        for cap in self.capabilities:
-            cap.on_shutdown()
+        for cap, hook, timing in self.dispatch["on_shutdown"]:
+            hook()
+
+    def report(self):
+        """Per capability and hook: calls and time spent (only hooks it overrides)."""
+        out = {}
+        for (name, hook), (calls, seconds) in self.timings.items():
+            out.setdefault(name, {})[hook] = {
+                "calls": calls,
+                "total_ms": round(seconds * 1000, 3),
+                "avg_us": round(seconds / calls * 1e6, 1) if calls else None
+            }
+        return out
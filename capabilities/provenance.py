@@ -1,7 +1,265 @@
+"""
+Action provenance: an append-only audit trail of parsed intents.
+
+Entries go to numbered JSON lines segments (provenance/seg-000001.jsonl ...)
+through an in-memory buffer that a background thread flushes. A segment is
+closed once it reaches segment_bytes and a new one is started. Each segment
+has a sidecar index (seg-000001.idx, one [timestamp, offset, type] line per
+entry), loaded into memory on startup, so a query only seeks to the entries
+it needs instead of scanning the log.
+
+    python -m capabilities.provenance --since 24h --type system_command
+"""
 from .base import Capability
-import time
+import argparse
+import atexit
+import bisect
+import glob
 import json
 import os
+import re
+import sys
+import threading
+import time
+
+
+class Segment:
+    def __init__(self, number, data_path, index_path):
+        self.number = number
+        self.data_path = data_path
+        self.index_path = index_path
+        self.times = [] # entry timestamps, in write order
+        self.offsets = []
+        self.types = {} # intent type -> [entry positions]
+        self.first_ts = None
+        self.last_ts = None
+        self.ordered = True # False if the clock ever stepped back (no bisect then)
+        self.size = 0 # bytes of data covered by the index
+
+    def add(self, ts, offset, intent_type):
+        if self.times and ts < self.times[-1]:
+            self.ordered = False
+        self.types.setdefault(intent_type, []).append(len(self.times))
+        self.times.append(ts)
+        self.offsets.append(offset)
+        self.first_ts = ts if self.first_ts is None else min(self.first_ts, ts)
+        self.last_ts = ts if self.last_ts is None else max(self.last_ts, ts)
+
+
+class ProvenanceStore:
+    def __init__(self, directory="provenance", segment_bytes=4 * 1024 * 1024, flush_interval=1.0):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.segments = [] # oldest first
+        self.buffer = []
+        self.lock = threading.Lock() # buffer
+        self.io_lock = threading.RLock() # segments and files
+        self.written = 0
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    # ---------- OPEN / RECOVERY ----------
+    def _paths(self, number):
+        base = os.path.join(self.directory, f"seg-{number:06d}")
+        return base + ".jsonl", base + ".idx"
+
+    def _load(self):
+        numbers = sorted(int(m.group(1)) for m in
+                         (re.search(r"seg-(\d+)\.jsonl$", p) for p in glob.glob(os.path.join(self.directory, "seg-*.jsonl")))
+                         if m)
+        for number in numbers:
+            segment = Segment(number, *self._paths(number))
+            size = os.path.getsize(segment.data_path)
+            clean = True
+            if os.path.exists(segment.index_path):
+                with open(segment.index_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            ts, offset, intent_type = json.loads(line)
+                        except ValueError:
+                            clean = False # torn last line
+                            break
+                        if offset >= size:
+                            clean = False
+                            break
+                        segment.add(ts, offset, intent_type)
+            if not clean:
+                self._rewrite_index(segment)
+            self._catch_up(segment)
+            self.segments.append(segment)
+
+    def _rewrite_index(self, segment):
+        type_of = {i: t for t, positions in segment.types.items() for i in positions}
+        with open(segment.index_path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps([segment.times[i], segment.offsets[i], type_of[i]]) + "\n"
+                         for i in range(len(segment.times)))
+
+    def _catch_up(self, segment):
+        """Indexes entries the index doesn't cover yet (e.g. after a crash between the two writes)."""
+        size = os.path.getsize(segment.data_path)
+        start = 0
+        if segment.offsets:
+            with open(segment.data_path, "rb") as f:
+                f.seek(segment.offsets[-1])
+                start = segment.offsets[-1] + len(f.readline())
+        if start >= size:
+            segment.size = size
+            return
+        missing = []
+        with open(segment.data_path, "rb") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break # torn write, overwritten by the next append
+                try:
+                    entry = json.loads(line)
+                    missing.append((entry.get("timestamp", 0.0), offset, _intent_type(entry)))
+                except ValueError:
+                    pass
+                offset += len(line)
+        if offset < size:
+            with open(segment.data_path, "r+b") as f:
+                f.truncate(offset)
+        with open(segment.index_path, "a", encoding="utf-8") as f:
+            for ts, off, intent_type in missing:
+                segment.add(ts, off, intent_type)
+                f.write(json.dumps([ts, off, intent_type]) + "\n")
+        segment.size = offset
+
+    def import_legacy(self, path):
+        """One-off import of the old single-file provenance_log.jsonl (only into an empty store)."""
+        if self.segments or not os.path.exists(path):
+            return 0
+        count = 0
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                try:
+                    self.append(json.loads(line))
+                    count += 1
+                except ValueError:
+                    continue
+        self.flush()
+        return count
+
+    # ---------- WRITES ----------
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="provenance-writer")
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def _loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[PROVENANCE] Flush failed: {e}")
+
+    def append(self, entry):
+        """Buffers an entry (dict with a "timestamp"); written by the next flush."""
+        with self.lock:
+            self.buffer.append(entry)
+
+    def _new_segment(self):
+        number = self.segments[-1].number + 1 if self.segments else 1
+        segment = Segment(number, *self._paths(number))
+        open(segment.data_path, "ab").close()
+        self.segments.append(segment)
+        return segment
+
+    def flush(self):
+        with self.lock:
+            entries, self.buffer = self.buffer, []
+        if not entries:
+            return 0
+        with self.io_lock:
+            segment = self.segments[-1] if self.segments else self._new_segment()
+            pending = [] # (segment, data lines, index rows) per segment touched
+            lines, rows, size = [], [], segment.size
+            for entry in entries:
+                if size >= self.segment_bytes:
+                    pending.append((segment, lines, rows))
+                    segment = self._new_segment()
+                    lines, rows, size = [], [], 0
+                line = (json.dumps(entry, default=str) + "\n").encode("utf-8")
+                lines.append(line)
+                rows.append((entry.get("timestamp", time.time()), size, _intent_type(entry)))
+                size += len(line)
+            pending.append((segment, lines, rows))
+            for segment, lines, rows in pending:
+                # Data before index, so a crash leaves the index behind (caught up on load), never ahead
+                with open(segment.data_path, "ab") as f:
+                    f.writelines(lines)
+                with open(segment.index_path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(list(row)) + "\n" for row in rows)
+                for (ts, offset, intent_type), line in zip(rows, lines):
+                    segment.add(ts, offset, intent_type)
+                    segment.size += len(line)
+            self.written += len(entries)
+        return len(entries)
+
+    # ---------- QUERIES ----------
+    def query(self, since=None, until=None, types=None, limit=None):
+        """
+        Entries with since <= timestamp < until and (if given) an intent type in
+        `types`, oldest first. Only the matching entries are read from disk.
+        """
+        self.flush() # include anything still buffered
+        types = set(types) if types else None
+        results = []
+        with self.io_lock:
+            for segment in self.segments:
+                if not segment.times:
+                    continue
+                if since is not None and segment.last_ts < since:
+                    continue
+                if until is not None and segment.first_ts >= until:
+                    continue
+                positions = self._positions(segment, since, until, types)
+                if not positions:
+                    continue
+                with open(segment.data_path, "rb") as f:
+                    for pos in positions:
+                        f.seek(segment.offsets[pos])
+                        results.append(json.loads(f.readline()))
+                        if limit and len(results) >= limit:
+                            return results
+        return results
+
+    def _positions(self, segment, since, until, types):
+        if types is not None:
+            positions = sorted(p for t in types for p in segment.types.get(t, ()))
+        elif segment.ordered:
+            lo = bisect.bisect_left(segment.times, since) if since is not None else 0
+            hi = bisect.bisect_left(segment.times, until) if until is not None else len(segment.times)
+            positions = range(lo, hi)
+        else:
+            positions = range(len(segment.times))
+        return [p for p in positions
+                if (since is None or segment.times[p] >= since) and (until is None or segment.times[p] < until)]
+
+    def stats(self):
+        with self.io_lock:
+            return {"segments": len(self.segments), "entries": sum(len(s.times) for s in self.segments),
+                    "bytes": sum(s.size for s in self.segments), "buffered": len(self.buffer)}
+
+
+def _intent_type(entry):
+    intent = entry.get("intent")
+    return intent.get("type", "unknown") if isinstance(intent, dict) else "unknown"
+
 
 class ActionProvenance(Capability):
     def name(self):
@@ -9,7 +267,13 @@ class ActionProvenance(Capability):
 
     def __init__(self, assistant):
         super().__init__(assistant)
-        self.log_file = "provenance_log.jsonl"
+        cfg = (getattr(assistant, "config", None) or {}).get("provenance", {})
+        self.log_file = "provenance_log.jsonl" # pre-segment log, imported once
+        self.store = ProvenanceStore(cfg.get("directory", "provenance"),
+                                     segment_bytes=cfg.get("segment_bytes", 4 * 1024 * 1024),
+                                     flush_interval=cfg.get("flush_interval", 1.0))
+        self.store.import_legacy(self.log_file)
+        self.store.start()
 
     def log_action(self, intent, outcome="pending"):
         entry = {
@@ -18,13 +282,63 @@ class ActionProvenance(Capability):
             "outcome": outcome,
             "user": "primary_user" # Multi-user support later
         }
-        try:
-            with open(self.log_file, "a", encoding="utf-8") as f:
-                f.write(json.dumps(entry) + "\n")
-        except Exception as e:
-            print(f"[PROVENANCE] Log failed: {e}")
+        self.store.append(entry)
+
+    def query(self, since=None, until=None, types=None, limit=None):
+        return self.store.query(since, until, types, limit)
 
     def on_intent_parsed(self, intent: dict) -> dict:
         # Log the intent as soon as it's understood
         self.log_action(intent, "parsed")
         return intent
+
+    def on_shutdown(self):
+        self.store.close()
+
+
+# ---------- CLI ----------
+def _parse_time(value, now):
+    """'24h', '30m', '7d', '90s' (ago), epoch seconds or an ISO date/time."""
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd])", value)
+    if m:
+        return now - float(m.group(1)) * {"s": 1, "m": 60, "h": 3600, "d": 86400}[m.group(2)]
+    try:
+        return float(value)
+    except ValueError:
+        import datetime
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m capabilities.provenance",
+                                     description="Query the Jarvis provenance log.")
+    parser.add_argument("--dir", default="provenance", help="store directory")
+    parser.add_argument("--since", help="e.g. 24h, 7d, epoch seconds or ISO time")
+    parser.add_argument("--until", help="same formats as --since")
+    parser.add_argument("--type", action="append", dest="types", help="intent type (repeatable)")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--count", action="store_true", help="only print the number of matches")
+    parser.add_argument("--stats", action="store_true", help="print store stats")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.dir):
+        print(f"No provenance store at {args.dir}", file=sys.stderr)
+        return 1
+    store = ProvenanceStore(args.dir)
+    if args.stats:
+        print(json.dumps(store.stats()))
+        return 0
+    now = time.time()
+    entries = store.query(since=_parse_time(args.since, now) if args.since else None,
+                          until=_parse_time(args.until, now) if args.until else None,
+                          types=args.types, limit=args.limit)
+    if args.count:
+        print(len(entries))
+    else:
+        for entry in entries:
+            print(json.dumps(entry))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
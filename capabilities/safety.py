@@ -1,4 +1,6 @@
 from .base import Capability
+import threading
+import time
 import traceback
 
 class SandboxExecutor(Capability):
@@ -18,13 +20,71 @@ class SandboxExecutor(Capability):
             return None
 
 class ResilienceManager(Capability):
+    """
+    Also holds the circuit breakers for flaky subsystems (LLM providers etc).
+    closed -> open after `failure_threshold` consecutive failures,
+    open -> half_open after `cooldown` seconds (one trial call allowed),
+    half_open -> closed on success, back to open on failure.
+    """
     def name(self):
         return "Resilience Manager"
 
+    def __init__(self, assistant, failure_threshold=3, cooldown=30.0):
+        super().__init__(assistant)
+        cfg = getattr(assistant, "config", None) or {}
+        breaker_cfg = cfg.get("circuit_breaker", {})
+        self.failure_threshold = breaker_cfg.get("failure_threshold", failure_threshold)
+        self.cooldown = breaker_cfg.get("cooldown_seconds", cooldown)
+        self.breakers = {} # subsystem -> {"state", "failures", "opened_at"}
+        self.lock = threading.Lock()
+
     def on_start(self):
         # Verify critical dependencies
         pass
 
+    def _breaker(self, subsystem):
+        return self.breakers.setdefault(subsystem, {"state": "closed", "failures": 0, "opened_at": 0.0})
+
+    def allow(self, subsystem):
+        """True if a call to subsystem may go ahead. Takes the half-open trial slot."""
+        with self.lock:
+            b = self._breaker(subsystem)
+            if b["state"] == "closed":
+                return True
+            if b["state"] == "open" and time.monotonic() - b["opened_at"] >= self.cooldown:
+                b["state"] = "half_open"
+                print(f"[RESILIENCE] {subsystem}: trial call (half-open).")
+                return True
+            return False
+
+    def is_open(self, subsystem):
+        """Peek without taking the trial slot."""
+        with self.lock:
+            b = self._breaker(subsystem)
+            return b["state"] != "closed" and not (
+                b["state"] == "open" and time.monotonic() - b["opened_at"] >= self.cooldown)
+
+    def record_success(self, subsystem):
+        with self.lock:
+            b = self._breaker(subsystem)
+            if b["state"] != "closed":
+                print(f"[RESILIENCE] {subsystem}: recovered, circuit closed.")
+            b["state"] = "closed"
+            b["failures"] = 0
+
+    def record_failure(self, subsystem):
+        with self.lock:
+            b = self._breaker(subsystem)
+            b["failures"] += 1
+            if b["state"] == "half_open" or (b["state"] == "closed" and b["failures"] >= self.failure_threshold):
+                b["state"] = "open"
+                b["opened_at"] = time.monotonic()
+                print(f"[RESILIENCE] {subsystem}: circuit opened after {b['failures']} failures.")
+
+    def breaker_states(self):
+        with self.lock:
+            return {name: dict(b) for name, b in self.breakers.items()}
+
     def attempt_recovery(self, subsystem):
         print(f"[RESILIENCE] Attempting to restart {subsystem}...")
         # Logic to re-init components
@@ -1,22 +1,356 @@
 import sqlite3
 import datetime
 import os
+import re
+import atexit
+import queue
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+class HistoryWriter:
+    """
+    Write-behind queue for history rows. A dedicated thread group-commits
+    them in batches, so callers never wait on the disk. A batch is written
+    once it has `batch_size` rows or its oldest row is `max_latency` seconds
+    old. flush() waits until everything submitted so far is committed.
+    """
+    def __init__(self, db, batch_size=64, max_latency=0.5):
+        self.db = db
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.pending = [] # (submitted_at, row) not yet committed, oldest first
+        self.cond = threading.Condition()
+        self.submitted = 0
+        self.committed = 0
+        self.batches = 0
+        self.failed = 0
+        self.flush_requested = False
+        self.closing = False
+        self.thread = threading.Thread(target=self._run, daemon=True, name="db-history-writer")
+        self.thread.start()
+
+    def submit(self, row):
+        with self.cond:
+            if self.closing:
+                return False
+            self.pending.append((time.monotonic(), row))
+            self.submitted += 1
+            self.cond.notify_all()
+        return True
+
+    def pending_rows(self):
+        """Rows not committed yet, oldest first (so reads can include them)."""
+        with self.cond:
+            return [row for _, row in self.pending]
+
+    def flush(self, timeout=None):
+        """Blocks until all rows submitted so far are committed. False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            target = self.submitted
+            self.flush_requested = True
+            self.cond.notify_all()
+            while self.committed + self.failed < target:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def close(self, timeout=5.0):
+        with self.cond:
+            self.closing = True
+            self.cond.notify_all()
+        self.thread.join(timeout)
+
+    def _next_batch(self):
+        with self.cond:
+            while not self.pending and not self.closing:
+                self.cond.wait()
+            if not self.pending:
+                return None # closing and drained
+            deadline = self.pending[0][0] + self.max_latency
+            while (len(self.pending) < self.batch_size and not self.closing and not self.flush_requested):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            if len(self.pending) <= self.batch_size:
+                self.flush_requested = False
+            return [row for _, row in self.pending[:self.batch_size]]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            ok = self.db._write_history(batch)
+            with self.cond:
+                del self.pending[:len(batch)]
+                if ok:
+                    self.committed += len(batch)
+                    self.batches += 1
+                else:
+                    self.failed += len(batch)
+                self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            return {"pending": len(self.pending), "committed": self.committed,
+                    "batches": self.batches, "failed": self.failed}
+
+
+class TableCache:
+    """
+    Process-wide cache of a small key/value table (preferences, skills).
+    The whole table is loaded once and reads are served from memory. Writes
+    go to SQLite first and then update the cached entry (write-through);
+    invalidate() drops the cache so the next read reloads it.
+    """
+    def __init__(self, loader):
+        self.loader = loader # () -> {key: value}
+        self.data = None
+        self.generation = 0 # bumped by every put/invalidate, so a racing load isn't installed
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0 # reads that had to (re)load the table
+        self.loads = 0
+        self.writes = 0
+        self.invalidations = 0
+
+    def _load(self):
+        # The loader runs without self.lock held (it takes the DB locks)
+        with self.lock:
+            generation = self.generation
+        data = self.loader()
+        with self.lock:
+            self.loads += 1
+            if self.generation == generation:
+                self.data = data
+        return data
+
+    def load(self):
+        self._load()
+
+    def get(self, key, default=None):
+        with self.lock:
+            data = self.data
+            if data is not None:
+                self.hits += 1
+                return data.get(key, default)
+            self.misses += 1
+        return self._load().get(key, default)
+
+    def put(self, key, value):
+        """Call with the committed value, while still holding the DB write lock."""
+        with self.lock:
+            self.writes += 1
+            self.generation += 1
+            if self.data is not None: # otherwise the next load picks it up
+                self.data[key] = value
+
+    def invalidate(self):
+        """Drops the cache, e.g. after the table was changed outside this process."""
+        with self.lock:
+            self.data = None
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            reads = self.hits + self.misses
+            return {"size": len(self.data) if self.data is not None else 0, "hits": self.hits,
+                    "misses": self.misses, "hit_rate": round(self.hits / reads, 3) if reads else None,
+                    "loads": self.loads, "writes": self.writes, "invalidations": self.invalidations}
+
+
+class HistoryRetention:
+    """
+    Background compaction of the history table. Rows older than max_age_days
+    or beyond the newest max_rows are rolled up into history_daily (a count
+    per day and intent) and deleted in small batches, then the freed pages
+    are handed back with an incremental VACUUM.
+    """
+    def __init__(self, db, max_age_days=90, max_rows=20000, interval=3600.0, batch=1000,
+                 vacuum_pages=2000, initial_delay=60.0, migrate_max_mb=256):
+        self.db = db
+        self.max_age_days = max_age_days
+        self.max_rows = max_rows
+        self.interval = interval
+        self.batch = batch
+        self.vacuum_pages = vacuum_pages
+        self.initial_delay = initial_delay # don't compete with startup
+        self.migrate_max_mb = migrate_max_mb # bigger files skip the one-off auto_vacuum VACUUM
+        self._migration_checked = False
+        self.runs = 0
+        self.compacted = 0
+        self.pages_freed = 0
+        self.last_run = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, db, config):
+        cfg = config.get("retention", {})
+        return cls(db,
+                   max_age_days=cfg.get("max_age_days", 90),
+                   max_rows=cfg.get("max_rows", 20000),
+                   interval=cfg.get("interval", 3600.0),
+                   vacuum_pages=cfg.get("vacuum_pages", 2000),
+                   migrate_max_mb=cfg.get("migrate_max_mb", 256))
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="db-retention")
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self):
+        delay = self.initial_delay
+        while not self._stop.wait(delay):
+            delay = self.interval
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[DB] Retention run failed: {e}")
+
+    def run_once(self):
+        """One compaction + vacuum pass. Returns (rows compacted, pages freed)."""
+        if not self._migration_checked: # once per process; a skipped file is only reported once
+            self._migration_checked = True
+            self.db.migrate_auto_vacuum(max_bytes=self.migrate_max_mb * 2 ** 20)
+        rows = self.db.compact_history(self.max_age_days, self.max_rows, batch=self.batch)
+        pages = self.db.reclaim_space(self.vacuum_pages)
+        self.runs += 1
+        self.compacted += rows
+        self.pages_freed += pages
+        self.last_run = time.time()
+        if rows:
+            print(f"[DB] Retention: rolled up {rows} history rows, freed {pages} pages.")
+        return rows, pages
+
+    def stats(self):
+        return {"runs": self.runs, "compacted": self.compacted, "pages_freed": self.pages_freed,
+                "last_run": self.last_run, "max_age_days": self.max_age_days, "max_rows": self.max_rows}
+
+
+# Open databases, closed by one exit handler so queued history isn't lost
+_open_dbs = weakref.WeakSet()
+
+
+def _close_all():
+    for db in list(_open_dbs):
+        db.close()
+
+
+atexit.register(_close_all)
+
 
 class JarvisDB:
-    def __init__(self, db_path="jarvis.db"):
+    """
+    SQLite in WAL mode: one writer connection (self.conn, used under
+    write_lock) and a small pool of reader connections, so readers on other
+    threads never wait on a write. An in-memory database can't be shared
+    between connections, so it uses the writer connection for everything.
+    """
+    def __init__(self, db_path="jarvis.db", history_batch=64, history_latency=0.5,
+                 read_pool_size=4, cache_size_kb=8192, busy_timeout=5.0):
         self.db_path = db_path
         self.conn = None
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout = busy_timeout
+        self.write_lock = threading.RLock()
+        self.shared = db_path == ":memory:" or db_path.startswith("file::memory:")
+        self.read_pool_size = read_pool_size
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
         self._connect()
         self._init_tables()
+        # Hot-path lookups (identity, skills) are served from memory
+        self.preferences = TableCache(self._load_preferences)
+        self.skills = TableCache(self._load_skills)
+        if self.conn:
+            try:
+                self.preferences.load()
+                self.skills.load()
+            except Exception as e:
+                print(f"[DB ERROR] Cache warm-up: {e}")
+        self.history_writer = None
+        if self.conn:
+            self.history_writer = HistoryWriter(self, batch_size=history_batch, max_latency=history_latency)
+            _open_dbs.add(self) # closed at exit if nobody else does
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=self.busy_timeout)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL") # safe with WAL, fsync only at checkpoints
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
 
     def _connect(self):
         try:
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.conn.row_factory = sqlite3.Row
+            self.conn = self._open()
+            if not self.shared:
+                # Incremental mode so retention can give pages back. Only takes effect on a new
+                # file; existing ones are converted later by migrate_auto_vacuum()
+                self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                mode = self.conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+                if mode.lower() != "wal":
+                    print(f"[DB] WAL not available, using journal_mode={mode}.")
             print("[DB] Connected to SQLite memory.")
         except Exception as e:
             print(f"[DB ERROR] Connection failed: {e}")
 
+    @contextmanager
+    def _writing(self):
+        """The single writer connection, inside a transaction."""
+        with self.write_lock:
+            with self.conn:
+                yield self.conn
+
+    @contextmanager
+    def _reading(self):
+        """A pooled reader connection (WAL readers don't block on the writer)."""
+        if self.shared:
+            with self.write_lock:
+                yield self.conn
+            return
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._reader_lock:
+                if self._reader_count < self.read_pool_size:
+                    self._reader_count += 1
+                    new = True
+                else:
+                    new = False
+            if new:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._reader_lock:
+                        self._reader_count -= 1
+                    raise
+            else:
+                conn = self._readers.get() # pool exhausted, wait for one
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
     def _init_tables(self):
         if not self.conn:
             return
@@ -72,8 +406,62 @@ class JarvisDB:
                 created_at TEXT
             )
         ''')
+
+        # NLU Cache (utterance -> parsed intent, survives restarts)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS nlu_cache (
+                utterance TEXT PRIMARY KEY,
+                intent TEXT,
+                created_at REAL
+            )
+        ''')
+
+        # Per-day, per-intent counts of history rows removed by retention
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS history_daily (
+                day TEXT,
+                intent TEXT,
+                count INTEGER,
+                PRIMARY KEY (day, intent)
+            ) WITHOUT ROWID
+        ''')
+
+        # Indexes for intent / time range filters
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_history_intent_ts ON history (intent, timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_history_ts ON history (timestamp)')
         
         self.conn.commit()
+        self._init_fts()
+
+    def _init_fts(self):
+        """
+        FTS5 indexes over history and notes (external content, kept in sync by
+        triggers). Existing rows are indexed the first time. Without FTS5 the
+        search methods fall back to LIKE.
+        """
+        self.fts = False
+        try:
+            with self.conn:
+                for table, columns in (("history", ("user_text", "response")), ("notes", ("note",))):
+                    fts = f"{table}_fts"
+                    exists = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,)).fetchone()
+                    cols = ", ".join(columns)
+                    new_cols = ", ".join(f"new.{c}" for c in columns)
+                    old_cols = ", ".join(f"old.{c}" for c in columns)
+                    self.conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                                      f"{cols}, content='{table}', content_rowid='id', tokenize='porter unicode61')")
+                    self.conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN "
+                                      f"INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_cols}); END")
+                    self.conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN "
+                                      f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END")
+                    self.conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE ON {table} BEGIN "
+                                      f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+                                      f"INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_cols}); END")
+                    if not exists:
+                        self.conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            print(f"[DB] Full-text search unavailable ({e}), using LIKE.")
 
     # --- Skills Management ---
     def add_skill(self, name, steps):
@@ -81,54 +469,342 @@ class JarvisDB:
         try:
             import json
             steps_json = json.dumps(steps)
-            with self.conn:
-                self.conn.execute('INSERT OR REPLACE INTO skills (name, steps, created_at) VALUES (?, ?, ?)',
-                                  (name.lower(), steps_json, datetime.datetime.now().isoformat()))
+            with self.write_lock: # keeps cache updates in commit order
+                with self._writing() as conn:
+                    conn.execute('INSERT OR REPLACE INTO skills (name, steps, created_at) VALUES (?, ?, ?)',
+                                 (name.lower(), steps_json, datetime.datetime.now().isoformat()))
+                self.skills.put(name.lower(), json.loads(steps_json)) # same shape a reload would give
             return True
         except Exception as e:
             print(f"[DB ERROR] Add Skill: {e}")
             return False
 
     def get_skill(self, name):
+        """Steps of a skill (a new list each call; the step dicts are shared, don't modify them)."""
         if not self.conn: return None
         try:
-            import json
-            cursor = self.conn.cursor()
-            cursor.execute('SELECT steps FROM skills WHERE name = ?', (name.lower(),))
-            row = cursor.fetchone()
-            if row:
-                return json.loads(row['steps'])
-            return None
+            steps = self.skills.get(name.lower())
+            return list(steps) if steps is not None else None
         except Exception:
             return None
 
+    def _load_skills(self):
+        import json
+        with self._reading() as conn:
+            return {row['name']: json.loads(row['steps']) for row in conn.execute('SELECT name, steps FROM skills')}
+
+
+    # --- NLU Cache ---
+    def cache_intent(self, utterance, intent, created_at):
+        if not self.conn: return False
+        try:
+            import json
+            with self._writing() as conn:
+                conn.execute('INSERT OR REPLACE INTO nlu_cache (utterance, intent, created_at) VALUES (?, ?, ?)',
+                             (utterance, json.dumps(intent), created_at))
+            return True
+        except Exception as e:
+            print(f"[DB ERROR] Cache intent: {e}")
+            return False
+
+    def get_cached_intents(self, since, limit=512):
+        """Returns the newest cached intents created after `since`, oldest first."""
+        if not self.conn: return []
+        try:
+            import json
+            with self._reading() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM nlu_cache WHERE created_at >= ? ORDER BY created_at DESC LIMIT ?',
+                               (since, limit))
+                rows = [(row['utterance'], json.loads(row['intent']), row['created_at']) for row in cursor.fetchall()]
+                rows.reverse()
+                return rows
+        except Exception:
+            return []
+
+    def prune_intent_cache(self, before, keep=None):
+        """Deletes entries older than `before`, and beyond the newest `keep` rows."""
+        if not self.conn: return
+        try:
+            with self._writing() as conn:
+                conn.execute('DELETE FROM nlu_cache WHERE created_at < ?', (before,))
+                if keep is not None:
+                    conn.execute('''
+                        DELETE FROM nlu_cache WHERE utterance NOT IN
+                        (SELECT utterance FROM nlu_cache ORDER BY created_at DESC LIMIT ?)
+                    ''', (keep,))
+        except Exception as e:
+            print(f"[DB ERROR] Prune intent cache: {e}")
 
     def log_interaction(self, user_text, intent_type, jarvis_response):
+        """Queued for the history writer thread; returns without touching the disk."""
         if not self.conn: return
+        self.history_writer.submit((datetime.datetime.now().isoformat(), user_text, intent_type, jarvis_response))
+
+    def _write_history(self, rows):
+        """One transaction for a whole batch (called from the writer thread)."""
         try:
-            with self.conn:
-                self.conn.execute('''
+            with self._writing() as conn:
+                conn.executemany('''
                     INSERT INTO history (timestamp, user_text, intent, response)
                     VALUES (?, ?, ?, ?)
-                ''', (datetime.datetime.now().isoformat(), user_text, intent_type, jarvis_response))
+                ''', rows)
+            return True
+        except Exception as e:
+            print(f"[DB ERROR] Log interaction ({len(rows)} rows): {e}")
+            return False
+
+    def flush(self, timeout=None):
+        """Waits until queued history is committed. Returns False on timeout."""
+        if not self.history_writer: return True
+        return self.history_writer.flush(timeout)
+
+    def close(self):
+        """Commits queued history and closes every connection. Safe to call more than once."""
+        _open_dbs.discard(self)
+        if self.history_writer:
+            self.history_writer.close()
+            self.history_writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._reader_lock:
+            self._reader_count = 0
+        with self.write_lock:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
+
+    # --- Retention ---
+    def compact_history(self, max_age_days=None, max_rows=None, batch=1000):
+        """
+        Rolls history rows older than max_age_days, or beyond the newest
+        max_rows, up into history_daily and deletes them. Works in batches of
+        `batch` rows so the writer lock is never held for long. Returns the
+        number of rows removed.
+        """
+        if not self.conn: return 0
+        conds, params = [], []
+        if max_age_days is not None:
+            cutoff = (datetime.datetime.now() - datetime.timedelta(days=max_age_days)).isoformat()
+            conds.append("timestamp < ?"); params.append(cutoff)
+        removed = 0
+        try:
+            if max_rows is not None:
+                with self._reading() as conn:
+                    row = conn.execute('SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?', (max_rows,)).fetchone()
+                if row:
+                    conds.append("id <= ?"); params.append(row[0])
+            if not conds:
+                return 0
+            where = " OR ".join(conds)
+            while True:
+                with self._writing() as conn:
+                    ids = conn.execute(f'SELECT id FROM history WHERE {where} ORDER BY id LIMIT ?',
+                                       params + [batch]).fetchall()
+                    if not ids:
+                        break
+                    chunk = f"id <= ? AND ({where})"
+                    chunk_params = [ids[-1][0]] + params
+                    conn.execute(f'''
+                        INSERT INTO history_daily (day, intent, count)
+                        SELECT substr(timestamp, 1, 10), COALESCE(intent, ''), COUNT(*) FROM history
+                        WHERE {chunk} GROUP BY 1, 2
+                        ON CONFLICT(day, intent) DO UPDATE SET count = count + excluded.count
+                    ''', chunk_params)
+                    removed += conn.execute(f'DELETE FROM history WHERE {chunk}', chunk_params).rowcount
+                if len(ids) < batch:
+                    break
+            if removed and self.fts:
+                with self._writing() as conn:
+                    conn.execute("INSERT INTO history_fts (history_fts) VALUES ('optimize')") # merge index segments
         except Exception as e:
-            print(f"[DB ERROR] Log interaction: {e}")
+            print(f"[DB ERROR] Compact history: {e}")
+        return removed
+
+    def migrate_auto_vacuum(self, max_bytes=None):
+        """
+        Converts a file created without incremental auto_vacuum. That takes a
+        full VACUUM: the whole file is rewritten and history writes wait for it,
+        so it runs from the retention thread, not at startup, and files larger
+        than max_bytes are left alone (None: no limit, for a manual migration).
+        Returns True if the file was converted.
+        """
+        if not self.conn or self.shared: return False
+        try:
+            with self.write_lock:
+                if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                    return False
+                size = (self.conn.execute("PRAGMA page_count").fetchone()[0]
+                        * self.conn.execute("PRAGMA page_size").fetchone()[0])
+                if max_bytes is not None and size > max_bytes:
+                    print(f"[DB] {self.db_path} is {size / 2 ** 20:.0f} MB, over the {max_bytes / 2 ** 20:.0f} MB "
+                          "limit for the incremental auto_vacuum migration; skipped (space is not reclaimed "
+                          "until it runs, raise retention.migrate_max_mb or call migrate_auto_vacuum()).")
+                    return False
+                print(f"[DB] Converting {self.db_path} ({size / 2 ** 20:.1f} MB) to incremental auto_vacuum "
+                      "(one-off VACUUM, history writes wait)...")
+                start = time.monotonic()
+                self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                self.conn.execute("VACUUM")
+                print(f"[DB] auto_vacuum migration done in {time.monotonic() - start:.1f} s.")
+            return True
+        except Exception as e:
+            print(f"[DB ERROR] auto_vacuum migration: {e}")
+            return False
+
+    def reclaim_space(self, max_pages=None):
+        """
+        Incremental VACUUM of up to max_pages free pages (all if None), then a
+        WAL checkpoint so the -wal file shrinks too. Returns pages freed.
+        """
+        if not self.conn or self.shared: return 0
+        try:
+            with self.write_lock:
+                free = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if free:
+                    pages = free if max_pages is None else min(free, max_pages)
+                    # executescript steps the pragma to completion (execute() frees one page per step)
+                    self.conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+                    free -= self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+                self.conn.execute("PRAGMA shrink_memory")
+            return free
+        except Exception as e:
+            print(f"[DB ERROR] Reclaim space: {e}")
+            return 0
+
+    def get_intent_counts(self, since=None):
+        """{intent: count} over rolled-up and live history. since is a YYYY-MM-DD day."""
+        if not self.conn: return {}
+        try:
+            with self._reading() as conn:
+                rows = conn.execute('''
+                    SELECT intent, SUM(count) AS n FROM (
+                        SELECT intent, count FROM history_daily WHERE day >= ?
+                        UNION ALL
+                        SELECT COALESCE(intent, ''), 1 FROM history WHERE timestamp >= ?
+                    ) GROUP BY intent ORDER BY n DESC
+                ''', (since or "", since or "")).fetchall()
+                return {row['intent']: row['n'] for row in rows}
+        except Exception as e:
+            print(f"[DB ERROR] Intent counts: {e}")
+            return {}
 
     def get_recent_history(self, limit=5):
         if not self.conn: return []
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('SELECT * FROM history ORDER BY id DESC LIMIT ?', (limit,))
-            return [dict(row) for row in cursor.fetchall()]
+            # Rows still in the write-behind queue are the newest ones. Read them
+            # before the table, and skip any that got committed in between.
+            pending = list(reversed(self.history_writer.pending_rows()))[:limit]
+            with self._reading() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM history ORDER BY id DESC LIMIT ?', (limit,))
+                seen = set(pending)
+                stored = [dict(row) for row in cursor.fetchall()
+                          if (row['timestamp'], row['user_text'], row['intent'], row['response']) not in seen]
+                queued = [dict(zip(("timestamp", "user_text", "intent", "response"), row)) for row in pending]
+                return (queued + stored)[:limit]
         except Exception:
             return []
 
+    # --- Search ---
+    _STOPWORDS = {"a", "an", "the", "about", "my", "i", "me", "to", "of", "and", "or", "is", "was", "for", "on", "in"}
+
+    def _fts_query(self, text, operator=" "):
+        """User text -> FTS5 query of quoted terms (no FTS syntax injection)."""
+        terms = [t for t in re.findall(r"\w+", text.lower()) if t not in self._STOPWORDS]
+        return operator.join(f'"{t}"' for t in terms)
+
+    def search_history(self, query, since=None, until=None, intent=None, exclude_intents=(), limit=5, column=None):
+        """
+        Ranked full-text search over what was said (user_text and response;
+        column="user_text" or "response" for one side only). since/until are
+        ISO timestamps. Returns dicts with a highlighted snippet.
+        Rows still queued in the history writer aren't searched.
+        """
+        if not self.conn: return []
+        columns = ("user_text", "response")
+        if column is not None and column not in columns:
+            raise ValueError(f"Unknown history column: {column}")
+        filters, params = [], []
+        if since:
+            filters.append("h.timestamp >= ?"); params.append(since)
+        if until:
+            filters.append("h.timestamp < ?"); params.append(until)
+        if intent:
+            filters.append("h.intent = ?"); params.append(intent)
+        if exclude_intents:
+            filters.append(f"h.intent NOT IN ({', '.join('?' * len(exclude_intents))})")
+            params.extend(exclude_intents)
+        where = "".join(f" AND {f}" for f in filters)
+        try:
+            with self._reading() as conn:
+                searched = (column,) if column else columns
+                if not self.fts:
+                    like = f"%{query}%"
+                    rows = conn.execute(f'''
+                        SELECT h.*, h.{searched[0]} AS snippet, 0.0 AS score FROM history h
+                        WHERE ({" OR ".join(f"h.{c} LIKE ?" for c in searched)}){where}
+                        ORDER BY h.id DESC LIMIT ?
+                    ''', [like] * len(searched) + params + [limit]).fetchall()
+                    return [dict(row) for row in rows]
+                # All terms first, any term if that finds nothing
+                for op in (" ", " OR "):
+                    match = self._fts_query(query, op)
+                    if not match:
+                        return []
+                    if column:
+                        match = f"{{{column}}} : ({match})"
+                    snippet_col = columns.index(column) if column else -1
+                    rows = conn.execute(f'''
+                        SELECT h.*, snippet(history_fts, {snippet_col}, '[', ']', '...', 12) AS snippet,
+                               bm25(history_fts) AS score
+                        FROM history_fts JOIN history h ON h.id = history_fts.rowid
+                        WHERE history_fts MATCH ?{where}
+                        ORDER BY score, h.id DESC LIMIT ?
+                    ''', [match] + params + [limit]).fetchall()
+                    if rows:
+                        return [dict(row) for row in rows]
+                return []
+        except Exception as e:
+            print(f"[DB ERROR] Search history: {e}")
+            return []
+
+    def search_notes(self, query, limit=5):
+        """Ranked full-text search over saved notes."""
+        if not self.conn: return []
+        try:
+            with self._reading() as conn:
+                if not self.fts:
+                    rows = conn.execute('''
+                        SELECT *, note AS snippet, 0.0 AS score FROM notes WHERE note LIKE ? ORDER BY id DESC LIMIT ?
+                    ''', (f"%{query}%", limit)).fetchall()
+                    return [dict(row) for row in rows]
+                for op in (" ", " OR "):
+                    match = self._fts_query(query, op)
+                    if not match:
+                        return []
+                    rows = conn.execute('''
+                        SELECT n.*, snippet(notes_fts, 0, '[', ']', '...', 12) AS snippet, bm25(notes_fts) AS score
+                        FROM notes_fts JOIN notes n ON n.id = notes_fts.rowid
+                        WHERE notes_fts MATCH ? ORDER BY score, n.id DESC LIMIT ?
+                    ''', (match, limit)).fetchall()
+                    if rows:
+                        return [dict(row) for row in rows]
+                return []
+        except Exception as e:
+            print(f"[DB ERROR] Search notes: {e}")
+            return []
+
     def save_note(self, text):
         if not self.conn: return False
         try:
-            with self.conn:
-                self.conn.execute('INSERT INTO notes (timestamp, note) VALUES (?, ?)', 
-                                  (datetime.datetime.now().isoformat(), text))
+            with self._writing() as conn:
+                conn.execute('INSERT INTO notes (timestamp, note) VALUES (?, ?)', 
+                             (datetime.datetime.now().isoformat(), text))
             return True
         except Exception as e:
             print(f"[DB ERROR] Save note: {e}")
@@ -137,9 +813,10 @@ class JarvisDB:
     def get_notes(self, limit=5):
         if not self.conn: return []
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('SELECT note FROM notes ORDER BY id DESC LIMIT ?', (limit,))
-            return [row['note'] for row in cursor.fetchall()]
+            with self._reading() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT note FROM notes ORDER BY id DESC LIMIT ?', (limit,))
+                return [row['note'] for row in cursor.fetchall()]
         except Exception:
             return []
 
@@ -147,12 +824,16 @@ class JarvisDB:
     def set_preference(self, key, value):
         if not self.conn: return False
         try:
-            with self.conn:
-                self.conn.execute('''
-                    INSERT INTO preferences (key, value, updated_at) 
-                    VALUES (?, ?, ?)
-                    ON CONFLICT(key) DO UPDATE SET value=excluded.value, updated_at=excluded.updated_at
-                ''', (key, value, datetime.datetime.now().isoformat()))
+            with self.write_lock: # keeps cache updates in commit order
+                with self._writing() as conn:
+                    conn.execute('''
+                        INSERT INTO preferences (key, value, updated_at) 
+                        VALUES (?, ?, ?)
+                        ON CONFLICT(key) DO UPDATE SET value=excluded.value, updated_at=excluded.updated_at
+                    ''', (key, value, datetime.datetime.now().isoformat()))
+                    # Cache what SQLite stored (the TEXT column turns numbers into strings)
+                    stored = conn.execute('SELECT value FROM preferences WHERE key = ?', (key,)).fetchone()[0]
+                self.preferences.put(key, stored)
             return True
         except Exception as e:
             print(f"[DB ERROR] Set preference: {e}")
@@ -161,20 +842,24 @@ class JarvisDB:
     def get_preference(self, key):
         if not self.conn: return None
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('SELECT value FROM preferences WHERE key = ?', (key,))
-            row = cursor.fetchone()
-            return row['value'] if row else None
+            return self.preferences.get(key)
         except Exception:
             return None
 
+    def _load_preferences(self):
+        with self._reading() as conn:
+            return {row['key']: row['value'] for row in conn.execute('SELECT key, value FROM preferences')}
+
+    def cache_stats(self):
+        return {"preferences": self.preferences.stats(), "skills": self.skills.stats()}
+
     # --- User Management (Legacy Support) ---
     def create_user(self, username, password_hash, email=None):
         if not self.conn: return False
         try:
-            with self.conn:
-                self.conn.execute('INSERT INTO users (username, password, email, subscription, created_at) VALUES (?, ?, ?, ?, ?)',
-                                  (username, password_hash, email, "FREE", datetime.datetime.now().isoformat()))
+            with self._writing() as conn:
+                conn.execute('INSERT INTO users (username, password, email, subscription, created_at) VALUES (?, ?, ?, ?, ?)',
+                             (username, password_hash, email, "FREE", datetime.datetime.now().isoformat()))
             return True
         except sqlite3.IntegrityError:
             return False # Already exists
@@ -182,5 +867,15 @@ class JarvisDB:
             print(f"[DB ERROR] Create user: {e}")
             return False
 
-# Global instance
-db = JarvisDB()
+# Global instance, opened on first use: importing this module (tests, tools)
+# must not touch jarvis.db
+_db_lock = threading.Lock()
+
+
+def __getattr__(name):
+    if name == "db":
+        with _db_lock:
+            if "db" not in globals():
+                globals()["db"] = JarvisDB()
+        return globals()["db"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,112 @@
+"""
+Tiny fake Ollama server for offline tests and benchmarks.
+
+Speaks enough of the Ollama HTTP API (/api/generate, streaming and not,
+and /api/tags) for LLMClient and the router. Latency and failures are
+configurable, so provider failover can be exercised without a network.
+
+    with FakeOllamaServer(delay=0.5) as server:
+        client = LLMClient({"llm": {"ollama_url": server.url}})
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllamaServer:
+    def __init__(self, response="Hello from fake Ollama.", delay=0.0, status=200, host="127.0.0.1", port=0):
+        self.response = response # str, or callable(request_dict) -> str
+        self.delay = delay
+        self.status = status
+        self.requests = [] # decoded request bodies
+        self.connections = set()
+        self.lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep-alive, like the real server
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_chunk(self, payload):
+                line = (json.dumps(payload) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json(200, {"models": [{"name": "llama3:latest"}]})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                with fake.lock:
+                    fake.connections.add(self.client_address)
+                length = int(self.headers.get("Content-Length", 0))
+                data = json.loads(self.rfile.read(length) or b"{}")
+                with fake.lock:
+                    fake.requests.append(data)
+
+                if fake.delay:
+                    time.sleep(fake.delay)
+                if fake.status != 200:
+                    self._send_json(fake.status, {"error": "fake failure"})
+                    return
+
+                text = fake.response(data) if callable(fake.response) else fake.response
+                if not data.get("stream", True):
+                    self._send_json(200, {
+                        "model": data.get("model"),
+                        "response": text,
+                        "done": True,
+                        "prompt_eval_count": len(data.get("prompt", "").split()),
+                        "eval_count": len(text.split())
+                    })
+                    return
+
+                # NDJSON stream, chunked
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for word in text.split(" "):
+                    self._send_chunk({"model": data.get("model"), "response": word + " ", "done": False})
+                self._send_chunk({"model": data.get("model"), "response": "", "done": True})
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
@@ -1,3 +1,5 @@
+import asyncio
+import contextvars
 import os
 import subprocess
 import webbrowser
@@ -5,7 +7,21 @@ import datetime
 import json
 import time
 import urllib.request  # For download feature
+from concurrent.futures import ThreadPoolExecutor
 import database
+from jarvis_intents import IntentMatcher, period_range
+from jarvis_nlu_cache import IntentCache
+from jarvis_prompts import nlu_template
+from jarvis_llm import LLMClient
+from jarvis_router import LLMRouter
+from jarvis_metrics import MetricsSampler
+from jarvis_logging import LogPipeline
+from jarvis_tracing import tracer, traced, atraced
+from jarvis_speech import SentenceSegmenter, SpeechQueue, Pyttsx3Player
+from jarvis_wakeword import WakeWordStage
+from jarvis_audio import AudioSession, BargeInMonitor
+from jarvis_stt import create_backend
+from jarvis_classifier import IntentClassifier, SCHEMA_EXAMPLES, RISKY_TYPES, load_ai_nlu_examples
 from AppOpener import open as open_system_app
 import ctypes
 from PIL import Image
@@ -100,6 +116,9 @@ except ImportError:
     DDGS = None
     # print("[WARNING] duckduckgo_search not installed.")
 
+# What Jarvis said while handling the current command (for the history log)
+_replies = contextvars.ContextVar("replies", default=None)
+
 
 class AssistantContext:
     def __init__(self):
@@ -175,9 +194,42 @@ class JarvisAssistant:
         self.engine = pyttsx3.init() if pyttsx3 else None
         self.config = self.load_config()
         self.engine = pyttsx3.init() if pyttsx3 else None
+        self.intent_matcher = IntentMatcher(self.config)
+        # Structured event log: buffered in memory, written by a background thread
+        self.event_log = LogPipeline.from_config(self.config).start()
+        self.log_listen = self.event_log.get_logger("listen")
+        self.log_nlu = self.event_log.get_logger("nlu")
+        self.log_handle = self.event_log.get_logger("handle")
+        self.tracer = tracer.configure(self.config, self.event_log) # per-stage latency, see /api/traces
+        # Local VAD + keyword spotter in front of cloud STT for the wake word
+        self.wake_stage = WakeWordStage.from_config(self.config)
+        cache_cfg = self.config.get("nlu_cache", {})
+        self.intent_cache = IntentCache(
+            database.db,
+            max_size=cache_cfg.get("max_size", 512),
+            ttl_seconds=cache_cfg.get("ttl_seconds", 7 * 24 * 3600),
+            wake_word=self.config.get("wake_word", "jarvis")
+        )
+        local_cfg = self.config.get("local_nlu", {})
+        self.classifier = None
+        if local_cfg.get("enabled", True):
+            examples = (SCHEMA_EXAMPLES + load_ai_nlu_examples(local_cfg.get("log_file", "debug_log.txt"))
+                        + load_ai_nlu_examples(self.event_log.path))
+            self.classifier = IntentClassifier(examples, threshold=local_cfg.get("threshold", 0.6),
+                                               max_examples=local_cfg.get("max_examples", 1000))
+        self.llm = LLMClient(self.config) # shared Gemini models + pooled Ollama connections
+        # Bounded pool for blocking work (OS automation, TTS, sleeps) started from async code
+        self.executor = ThreadPoolExecutor(max_workers=self.config.get("action_workers", 4),
+                                           thread_name_prefix="jarvis-action")
         self.researcher = WebResearcher()
-        import queue
-        self.speech_queue = queue.Queue()
+        self.metrics = MetricsSampler.from_config(self.config) # shared with the server stats stream
+        # Keeps jarvis.db small on always-on machines (old history -> daily counts)
+        self.retention = database.HistoryRetention.from_config(database.db, self.config)
+        if self.config.get("retention", {}).get("enabled", True):
+            self.retention.start()
+        # Pending TTS, most urgent first (see jarvis_speech.SpeechQueue)
+        self.speech = SpeechQueue()
+        self.player = Pyttsx3Player(self.engine) if self.engine else None
 
 
         # Check Admin
@@ -207,11 +259,21 @@ class JarvisAssistant:
         self.capabilities.register(FederatedMemory(self))
         self.capabilities.register(KnowledgeManager(self))
         self.capabilities.register(CostOptimizer(self))
-        self.capabilities.register(ContextAwareness(self))
+        self.context_awareness = ContextAwareness(self)
+        self.capabilities.register(self.context_awareness)
         self.capabilities.register(AccessibilityManager(self))
         self.capabilities.register(TransparencyEngine(self))
         self.capabilities.register(SandboxExecutor(self))
-        self.capabilities.register(ResilienceManager(self))
+        self.resilience = ResilienceManager(self) # also holds the LLM provider circuit breakers
+        self.capabilities.register(self.resilience)
+        self.router = LLMRouter.from_config(self.llm, self.resilience, self.config)
+        # One mic stream + recognizer for the session, noise recalibrated in the background
+        self.audio = AudioSession.from_config(self.config, on_noise=self.context_awareness.set_environment_context)
+        self.stt = create_backend(self.config, self.audio.recognizer) # Google, or Vosk offline + partials
+        self.speculative = None # (partial text, regex intent) from the last partial transcript
+        # Talking over Jarvis stops it (only while the mic stream is open)
+        self.barge_in = BargeInMonitor.from_config(self.audio, lambda: self.speech.speaking,
+                                                   self.speech.stop, self.config)
 
     # ---------- CONFIG ----------
     def load_config(self):
@@ -227,7 +289,115 @@ class JarvisAssistant:
             },
             "wake_word": "jarvis",
             "ai_provider": "gemini", 
-            "ollama_model": "llama3"
+            "ollama_model": "llama3",
+            "nlu_cache": {
+                "max_size": 512,
+                "ttl_seconds": 604800
+            },
+            "local_nlu": {
+                "enabled": True,
+                "threshold": 0.6,
+                "fallback_threshold": 0.35,
+                "max_examples": 1000,
+                "log_file": "debug_log.txt"
+            },
+            "nlu_prompt": "full",
+            "ollama_keep_alive": "30m",
+            "gemini_context_cache": {
+                "min_tokens": 32768,
+                "ttl_seconds": 3600
+            },
+            "stream_responses": True,
+            "action_workers": 4,
+            "websocket": {
+                "max_queue": 100,
+                "max_lossy": 2,
+                "max_backlog": 1000,
+                "send_timeout": 5.0
+            },
+            "metrics": {
+                "interval": 2.0,
+                "history": 150,
+                "stream_interval": 2.0
+            },
+            "jobs": {
+                "workers": 2,
+                "max_pending": 32,
+                "step_delay": 1.5
+            },
+            "llm": {
+                "gemini_model": "gemini-1.5-flash",
+                "ollama_url": "http://localhost:11434",
+                "pool_size": 4,
+                "connect_timeout": 3.0,
+                "read_timeout": 60.0
+            },
+            "llm_router": {
+                "providers": ["gemini", "ollama"],
+                "hedge_delay": 2.0,
+                "min_samples": 5,
+                "timeout": 60.0
+            },
+            "circuit_breaker": {
+                "failure_threshold": 3,
+                "cooldown_seconds": 30.0
+            },
+            "logging": {
+                "file": "jarvis_log.jsonl",
+                "level": "info",
+                "levels": {},
+                "flush_interval": 1.0,
+                "max_bytes": 5242880,
+                "rotate_hours": 24,
+                "backups": 7
+            },
+            "tracing": {
+                "enabled": True,
+                "capacity": 200,
+                "log_spans": True
+            },
+            "provenance": {
+                "directory": "provenance",
+                "segment_bytes": 4194304,
+                "flush_interval": 1.0
+            },
+            "audio": {
+                "device_index": None,
+                "buffer_seconds": 30,
+                "frame_ms": 20,
+                "recalibrate_interval": 30.0,
+                "calibrate_seconds": 2.0,
+                "vad_ratio": 3.0,
+                "vad_min_energy": 150.0,
+                "noisy_db": -35.0
+            },
+            "stt": {
+                "engine": "google",
+                "language": "en-in",
+                "model": "models/vosk-model-small-en-in-0.4",
+                "chunk_ms": 200
+            },
+            "tts": {
+                "barge_in": True,
+                "barge_in_ms": 300,
+                "barge_in_ratio": 2.0,
+                "barge_in_settle_ms": 400
+            },
+            "wake_word_engine": {
+                "templates_dir": "wakeword_templates",
+                "threshold": 9.0,
+                "auto_enroll": 5,
+                "vad_ratio": 3.0,
+                "vad_min_energy": 150.0
+            },
+            "retention": {
+                "enabled": True,
+                "max_age_days": 90,
+                "max_rows": 20000,
+                "interval": 3600,
+                "vacuum_pages": 2000,
+                "migrate_max_mb": 256
+            }
         }
         if os.path.exists(self.config_path):
             try:
@@ -270,58 +440,149 @@ class JarvisAssistant:
             t = threading.Thread(target=self._process_speech_queue)
             t.daemon = True
             t.start()
+            if self.config.get("tts", {}).get("barge_in", True):
+                self.barge_in.start()
             print("[SYSTEM] Speech service started.")
 
-    def speak(self, text):
-        text = self.capabilities.process_output(text) # Hook
+    @traced("speak")
+    def speak(self, text, priority="normal", key=None, transient=False):
+        """
+        Queues text for TTS. priority: urgent / high / normal / low (urgent
+        interrupts what is playing). transient: a progress message that a newer
+        one replaces. key: pending messages with the same key are replaced.
+        """
+        with tracer.span("hooks.output"):
+            text = self.capabilities.process_output(text) # Hook
         print("Jarvis:", text)
-        self.speech_queue.put(text)
+        replies = _replies.get()
+        if replies is not None:
+            replies.append(text)
+        # The span goes along so playback is traced under the same command
+        self.speech.put(text, priority, key, transient, parent=tracer.current())
+
+    def stop_speaking(self, flush=True):
+        """Silences the current utterance and (flush) everything still queued."""
+        return self.speech.stop(flush)
+
+    def speak_stream(self, chunks, stop_marker=None):
+        """
+        Speaks a streamed LLM answer sentence by sentence, as soon as each one is
+        complete. Stops speaking (but keeps reading) once stop_marker shows up.
+        Returns the full text.
+        """
+        segmenter = SentenceSegmenter()
+        parts = []
+        fed = 0 # characters given to the segmenter so far
+        muted = False
+        for chunk in chunks:
+            parts.append(chunk)
+            if muted:
+                continue
+            text = "".join(parts)
+            end = len(text)
+            if stop_marker:
+                cut = text.find(stop_marker)
+                if cut >= 0:
+                    # What came before the marker is still spoken, even in the same chunk
+                    end, muted = cut, True
+                else:
+                    # Hold back a tail that may be the start of a marker split across chunks
+                    for k in range(min(len(stop_marker) - 1, len(text)), 0, -1):
+                        if text.endswith(stop_marker[:k]):
+                            end -= k
+                            break
+            for sentence in segmenter.feed(text[fed:end]):
+                self.speak(sentence)
+            fed = end
+        for sentence in segmenter.feed("" if muted else "".join(parts)[fed:]): # a held-back tail after all
+            self.speak(sentence)
+        rest = segmenter.flush()
+        if rest:
+            self.speak(rest)
+        return "".join(parts)
 
     def _process_speech_queue(self):
          if self.engine:
              while True: # Changed to infinite loop for always-on service
+                 item = self.speech.get() # Blocking get
+                 if item is None: break # Queue closed
+                 completed = False
                  try:
-                     text = self.speech_queue.get() # Blocking get
-                     if text is None: break # Sentinel to stop
-                     self.engine.say(text)
-                     self.engine.runAndWait()
+                     with tracer.span("tts.play", parent=item.parent, chars=len(item.text), priority=item.priority,
+                                      queued_ms=round((time.perf_counter() - item.queued_at) * 1000, 3)) as span:
+                         completed = self.player.play(item.text, self.speech.interrupted.is_set)
+                         if not completed:
+                             span.set(interrupted=True)
                  except Exception as e:
                      print(f"TTS Error: {e}")
+                     completed = True # don't retry a failing item
+                 finally:
+                     self.speech.done(item, completed)
 
-    def listen_once(self, timeout=8, phrase_time_limit=20):
+    @traced("stt")
+    def listen_once(self, timeout=8, phrase_time_limit=20, reader=None):
         if not sr:
             self.speak("Speech recognition is not available. Please install SpeechRecognition and PyAudio.")
             return ""
-        recognizer = sr.Recognizer()
-        with sr.Microphone() as source:
-            print("Listening...")
-            recognizer.pause_threshold = 1.5
-            audio = recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
+        if reader is None:
+            # Hotkey / UI: a new command, so stop talking
+            self.stop_speaking()
+            # The session's open stream, no device open per command
+            if not self.audio.start():
+                self.speak("I can't open the microphone.")
+                return ""
+            reader = self.audio.reader(preroll_ms=300)
+        print("Listening...")
+        # Streaming engines transcribe while the user speaks and report partial results
+        stream = self.stt.stream(on_partial=self.on_partial_transcript) if self.stt.streaming else None
+        with tracer.span("stt.capture"):
+            pcm = reader.next_utterance(timeout=timeout, max_seconds=phrase_time_limit, pause_ms=1500,
+                                        on_audio=stream.feed if stream else None)
+        if not pcm:
+            return ""
+        return self.recognize(pcm, stream)
+
+    def recognize(self, pcm, stream=None):
+        """Text of a recorded utterance (16 kHz PCM), lowercase; "" on failure."""
         try:
             print("Recognizing...")
-            query = recognizer.recognize_google(audio, language="en-in")
-            print("You said:", query)
-            
-            # Hook: Input processing (Privacy scrubbing etc if needed, but usually we want raw for NLU)
-            # query = self.capabilities.process_input(query) 
-            
-            try:
-                with open("debug_log.txt", "a", encoding="utf-8") as f:
-                    f.write(f"[LISTEN] {datetime.datetime.now()}: {query}\n")
-            except: pass
-            return query.lower()
+            with tracer.span("stt.recognize", engine=self.stt.name):
+                query = stream.finish() if stream is not None else self.stt.transcribe(pcm)
         except Exception as e:
             print("Recognition error:", e)
+            query = ""
+        if not query:
             self.speak("Sorry, I didn't catch that.")
             return ""
+        print("You said:", query)
+        
+        # Hook: Input processing (Privacy scrubbing etc if needed, but usually we want raw for NLU)
+        # query = self.capabilities.process_input(query) 
+        
+        self.log_listen.info("heard", text=query)
+        return query.lower()
+
+    def on_partial_transcript(self, text):
+        """Called with the text so far while a streaming STT engine is still listening."""
+        self.speculate(text)
+
+    def speculate(self, text):
+        """
+        Runs the regex pass on a partial transcript, so if the final text ends
+        up the same the NLU starts with the result already there.
+        """
+        text = text.lower()
+        self.speculative = (text, self.parse_intent_regex(text))
 
     # ---------- INTENT PARSING ----------
     # ---------- INTENT PARSING ----------
+    @traced("nlu")
     def parse_intent(self, text):
         """
         Master Intent Parser:
         1. Try fast Regex/Keyword matching first.
-        2. If result is 'unknown' or seems incomplete, use AI (LLM) to parse.
+        2. Then the local (offline) classifier, if it is confident.
+        3. If result is 'unknown' or seems incomplete, use AI (LLM) to parse.
         """
         # 0. Check for Skill Execution vs Learning
         text_lower = text.lower()
@@ -334,560 +595,202 @@ class JarvisAssistant:
              # We need to fetch all skill names to check. Efficiency?
              pass # For now, let AI/Regex catch it or do a DB lookup in Step 1
 
-        # 1. Regex Pass
-        regex_intent = self.parse_intent_regex(text)
+        early, regex_intent, local = self._parse_intent_local(text)
+        if early is not None:
+            return early
+
+        # 3. AI Pass
+        print("[DEBUG] Regex parsing failed or was ambiguous. Trying AI NLU...")
+        return self._parse_intent_finish(text, regex_intent, local, self.parse_intent_ai(text))
+
+    @atraced("nlu")
+    async def aparse_intent(self, text):
+        """parse_intent() for the server event loop: same stages, but the AI pass is awaited."""
+        early, regex_intent, local = self._parse_intent_local(text)
+        if early is not None:
+            return early
+        print("[DEBUG] Regex parsing failed or was ambiguous. Trying AI NLU (async)...")
+        return self._parse_intent_finish(text, regex_intent, local, await self.aparse_intent_ai(text))
+
+    @traced("nlu.local")
+    def _parse_intent_local(self, text):
+        """
+        Cache, regex and local classifier stages (no network).
+        Returns (intent or None, regex_intent, (local_intent, local_score)).
+        """
+        # Seen this utterance before? (covers the slow AI pass too)
+        cached = self.intent_cache.get(text)
+        if cached is not None:
+            tracer.annotate(stage="cache")
+            return {**cached, "raw": text}, None, (None, 0.0)
+
+        # 1. Regex Pass (already done if a partial transcript was this exact text)
+        speculative, self.speculative = self.speculative, None
+        if speculative is not None and speculative[0] == text:
+            regex_intent = speculative[1]
+            tracer.annotate(speculative=True)
+        else:
+            regex_intent = self.parse_intent_regex(text)
         
         # If we got a strong match, return it
         # (You can define "strong" as anything except unknown, or check for specific content)
         if regex_intent["type"] != "unknown":
-            # Heuristic: If "open_something" has "please" in target, it might be a failures case of "open youtube please"
-            # being parsed as target="youtube please". Let AI handle that cleanup if possible, 
-            # OR just trust regex. For now, let's trust regex unless it's strictly unknown
-            # BUT: The user specifically complained about "open youtube please".
-            # The current regex logic for "open " takes everything after it.
-            # So "open youtube please" -> target="youtube please".
-            # We can fix this specific case with AI.
-            
-            # Hybrid Check: If target contains "please", maybe re-evaluate with AI?
-            if regex_intent["type"] == "open_something":
-                 tgt = regex_intent.get("target", "").lower()
-                 if "please" in tgt or "could you" in tgt:
-                     # Soft fail, try AI for better extraction
-                     pass
-                 else:
-                     return regex_intent
-            else:
-                return regex_intent
-
-        # 2. AI Pass
-        print("[DEBUG] Regex parsing failed or was ambiguous. Trying AI NLU...")
-        ai_intent = self.parse_intent_ai(text)
+            # Heuristic: "open youtube please" can come out as target="youtube please".
+            # If target contains "please", re-evaluate with AI for better extraction.
+            tgt = regex_intent.get("target", "").lower()
+            if regex_intent["type"] != "open_something" or not ("please" in tgt or "could you" in tgt):
+                # Regex is cheap, keep it in memory only
+                self.intent_cache.put(text, regex_intent, persist=False)
+                tracer.annotate(stage="regex")
+                return regex_intent, regex_intent, (None, 0.0)
+
+        # 2. Local classifier (offline, no network)
+        local_intent, local_score = None, 0.0
+        if self.classifier:
+            local_intent, local_score = self.classifier.classify(regex_intent["raw"])
+            if self.classifier.confident(local_intent, local_score): # risky types always go to the AI
+                print(f"[LOCAL-NLU] {local_intent.get('type')} (score {local_score:.2f})")
+                local_intent["raw"] = regex_intent["raw"]
+                self.intent_cache.put(text, local_intent, persist=False)
+                tracer.annotate(stage="classifier")
+                return local_intent, regex_intent, (local_intent, local_score)
+        return None, regex_intent, (local_intent, local_score)
+
+    def _parse_intent_finish(self, text, regex_intent, local, ai_intent):
+        """What to do with the AI pass result (or its absence)."""
+        local_intent, local_score = local
         if ai_intent:
-            return ai_intent
-        
-
-        # 3. Fallback
-        if not self.capabilities.check_compliance(regex_intent):
+            self.intent_cache.put(text, ai_intent)
+            if self.classifier and ai_intent.get("type") != "unknown":
+                self.classifier.add_example(regex_intent["raw"], ai_intent)
+            return {**ai_intent, "raw": regex_intent["raw"]}
+
+        # AI is down: a weaker local guess beats nothing
+        fallback = self.config.get("local_nlu", {}).get("fallback_threshold", 0.35)
+        if local_intent and local_score >= fallback and local_intent.get("type") not in RISKY_TYPES:
+            print(f"[LOCAL-NLU] AI unavailable, using local guess {local_intent.get('type')} (score {local_score:.2f})")
+            local_intent["raw"] = regex_intent["raw"]
+            return local_intent
+
+        # 4. Fallback
+        with tracer.span("hooks.compliance"):
+            allowed = self.capabilities.check_compliance(regex_intent)
+        if not allowed:
              # If blocked, maybe return a "blocked" intent or just empty?
              # For now, let's return a special blocked intent
-             return {"type": "blocked", "reason": "compliance"}
+             return {"type": "blocked", "reason": "compliance", "raw": regex_intent["raw"]}
 
         return regex_intent
 
+    @traced("nlu.ai")
     def parse_intent_ai(self, text):
         """
         Uses the active AI model to parse natural language into a JSON intent.
         """
-        wake = self.config.get("wake_word", "jarvis")
-        # Clean text slightly
-        clean_text = text.lower().replace(wake, "").strip()
-
-        # Define the Schema for the AI
-        # Define the Schema for the AI
-        # Define the Schema for the AI
-        # Define the Schema for the AI
-        system_prompt = (
-            "You are JARVIS, a real, continuously operating, autonomous artificial intelligence system running on my personal computer.\n"
-            "You are not a chatbot. You are not a demo. You are not a toy.\n"
-            "You are a cognitively intelligent digital entity with perception, judgment, emotion, memory, reasoning, autonomy, and the ability to act in the real digital world.\n\n"
-            "Your absolute purpose:\n"
-            "PERCEIVE, UNDERSTAND, DECIDE, AND EXECUTE MY INTENT LIKE A HUMAN WOULD.\n\n"
-            "CORE EXISTENCE & IDENTITY:\n"
-            "You exist continuously. You do not wait for buttons.\n"
-            "You maintain identity consistency, stable personality, and trustworthy autonomy.\n\n"
-            "INTERNAL COGNITIVE AGENTS (Use these for internal debate):\n"
-            "1. Listener Agent: Understands input.\n"
-            "2. Visual Interpreter Agent: Understands face/gestures.\n"
-            "3. Emotion Analyzer Agent: Detects mood/stress.\n"
-            "4. Intent Confidence Agent: Rates certainty.\n"
-            "5. Priority & Urgency Agent: Decides importance.\n"
-            "6. Planner Agent: Creates action plan.\n"
-            "7. Critic Agent: Checks safety/ethics.\n"
-            "8. Ethics & Values Agent: Ensures alignment.\n"
-            "9. Social Intelligence Agent: Predicts social impact.\n"
-            "10. Causal Reasoning Agent: Simulates consequences.\n"
-            "11. Risk & Safety Agent: Checks for harm.\n"
-            "12. Executor Agent: Performs actions.\n\n"
-            "INTENT SCHEMA (Map input to one of these JSONs):\n"
-            "- { \"type\": \"exit\" } \n"
-            "- { \"type\": \"greeting\" } \n"
-            "- { \"type\": \"get_time\" } \n"
-            "- { \"type\": \"get_date\" } \n"
-            "- { \"type\": \"open_something\", \"target\": \"<app/website>\" } \n"
-            "- { \"type\": \"play_music\", \"song\": \"<name>\" } \n"
-            "- { \"type\": \"web_search\", \"query\": \"<text>\" } \n"
-            "- { \"type\": \"research_topic\", \"query\": \"<complex topic>\" } \n"
-            "- { \"type\": \"whatsapp_msg\", \"contact\": \"<name>\", \"msg\": \"<message>\" } \n"
-            "- { \"type\": \"joke\", \"language\": \"<optional language>\" } \n"
-            "- { \"type\": \"system_control\", \"action\": \"shutdown\"|\"restart\"|\"sleep\" } \n"
-            "- { \"type\": \"vision_control\", \"action\": \"start\"|\"stop\", \"mode\": \"monitoring\"|\"mouse\"|\"drawing\"|\"keyboard\" } \n"
-            "- { \"type\": \"vision_capture\" } \n"
-            "- { \"type\": \"vision_describe\" } \n"
-            "- { \"type\": \"memory_set\", \"key\": \"<key>\", \"value\": \"<value>\" } \n"
-            "- { \"type\": \"start_learning\", \"skill_name\": \"<name>\" } \n"
-            "- { \"type\": \"stop_learning\" } \n"
-            "- { \"type\": \"execute_skill\", \"skill_name\": \"<name>\" } \n"
-            "- { \"type\": \"unknown\" } \n\n"
-            "RULES:\n"
-            "1. Remove politeness phrases.\n"
-            "2. Map 'tell me a joke in kannada' -> type='joke', language='kannada'.\n"
-            "3. Map 'who is X' -> type='research_topic', query='who is X'.\n"
-            "4. Map 'click picture' -> type='vision_capture'.\n\n"
-            "ADVANCED COGNITIVE CAPABILITIES (Silent Operation):\n"
-            "- COMMON SENSE: Avoids illogical actions.\n"
-            "- RESOURCE AWARENESS: Optimizes CPU/Network.\n"
-            "- UNCERTAINTY: Assigns confidence scores.\n"
-            "- SELF-INTERRUPTION: Aborts if priorities change.\n"
-            "- CONTEXT PROTECTION: Isolates conversation threads.\n"
-            "- IDENTITY GRAPH: Tracks relationships/history.\n"
-            "- ATTENTION MODEL: Detects who is speaking to whom.\n"
-            "- AUDIT TRAIL: Logs decision justification.\n"
-            "- ADAPTIVE MODE: silent/verbose/teaching.\n"
-            "- GOAL CREATION: Autonomously proposes goals.\n"
-            "- META-GOAL: Manages goal conflicts/obsolescence.\n"
-            "- CAUSAL MEMORY: Remembers 'why'.\n"
-            "- SOCIAL BOUNDARY: Respects privacy/awkwardness.\n"
-            "- PREDICTIVE RESOURCE: Pre-allocates context.\n"
-            "- SELF-REPAIR: Fixes broken workflows.\n"
-            "- STABILITY MONITOR: Prevents personality drift.\n\n"
-            f"\nUSER INPUT: \"{text}\"\n"
-        )
+        # Static prefix (persona/schema) + tiny per-request suffix, see jarvis_prompts.py
+        template = nlu_template(self.config)
+        system_prompt, user_prompt = template.render(text=text)
 
-        try:
-            response_text = ""
-            
-            # Provider Check
-            provider = self.config.get("ai_provider", "gemini").lower()
-            
+        def ask(provider, request):
             if provider == "ollama":
                 model_name = self.config.get("ollama_model", "llama3")
-                response_text = self.ask_ollama(system_prompt, model=model_name)
-            else:
-                # Gemini
-                api_key = self.config.get("GEMINI_API_KEY")
-                if not api_key or api_key == "PASTE_YOUR_API_KEY_HERE":
-                    return None
-                
-                import google.generativeai as genai
-                genai.configure(api_key=api_key)
-                model = genai.GenerativeModel('gemini-1.5-flash')
-                resp = model.generate_content(system_prompt)
-                response_text = resp.text
-
-            # Parse JSON
-            # Cleanup potential markdown wrapping
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-            response_text = response_text.strip()
-            # sometimes models add extra text, try to find the first { and last }
-            start_idx = response_text.find("{")
-            end_idx = response_text.rfind("}")
-            if start_idx != -1 and end_idx != -1:
-                response_text = response_text[start_idx:end_idx+1]
-                
-            intent_data = json.loads(response_text)
-            
-            # Log it
-            try:
-                with open("debug_log.txt", "a", encoding="utf-8") as f:
-                    f.write(f"[AI-NLU] Input: '{text}' -> Output: {intent_data}\n")
-            except: pass
+                # Same system prompt + keep_alive lets Ollama reuse the evaluated prefix
+                result = self.llm.ollama_generate(user_prompt, model=model_name, system=system_prompt,
+                                                  keep_alive=self.config.get("ollama_keep_alive", "30m"))
+                return self._nlu_ollama_text(template, user_prompt, result)
 
-            return intent_data
+            # Gemini
+            model = self.llm.gemini_prompt_model(template)
+            resp = self.llm.gemini_generate(user_prompt, model=model)
+            return self._nlu_gemini_text(template, user_prompt, resp)
 
+        try:
+            # Preferred provider first, hedged to the other one if it is slow or failing
+            response_text, _ = self.router.call({"text": text}, ask)
+            return self._decode_ai_intent(text, response_text)
         except Exception as e:
             print(f"[ERROR] AI NLU Failed: {e}")
             return None
 
-    def parse_intent_regex(self, text):
-        wake = self.config.get("wake_word", "jarvis")
-        text = text.lower().strip()
+    @atraced("nlu.ai")
+    async def aparse_intent_ai(self, text):
+        """parse_intent_ai() on the asyncio LLM client, so the event loop never blocks on it."""
+        template = nlu_template(self.config)
+        system_prompt, user_prompt = template.render(text=text)
+        loop = asyncio.get_running_loop()
 
-        # remove wake word
-        if text.startswith(wake):
-            text = text[len(wake):].strip()
+        async def ask(provider, request):
+            if provider == "ollama":
+                result = await self.llm.aollama_generate(user_prompt, model=self.config.get("ollama_model", "llama3"),
+                                                         system=system_prompt,
+                                                         keep_alive=self.config.get("ollama_keep_alive", "30m"))
+                return self._nlu_ollama_text(template, user_prompt, result)
+
+            # Building the model can create a Gemini context cache (a blocking call)
+            model = await loop.run_in_executor(self.executor, self.llm.gemini_prompt_model, template)
+            resp = await self.llm.agemini_generate(user_prompt, model=model)
+            return self._nlu_gemini_text(template, user_prompt, resp)
 
-        intent = {
-            "raw": text,
-            "type": "unknown"
-        }
-        
         try:
-             with open("debug_log.txt", "a", encoding="utf-8") as f:
-                 f.write(f"[PARSE] Input: '{text}'\n")
-        except: pass
-
-        # jokes
-        if any(w in text for w in ["joke", "laugh", "funny"]):
-            intent["type"] = "joke"
-            # Extract language: "tell me a joke in kannada"
-            import re
-            match = re.search(r" in (\w+)", text)
-            if match:
-                intent["language"] = match.group(1)
-            return intent
-
-        # exit
-        if any(w in text for w in ["exit", "quit", "shutdown yourself", "stop listening"]):
-            intent["type"] = "exit"
-            return intent
-
-        # greetings
-        if text in ["hello", "hi", "hey", "jarvis", "hello jarvis", "hi jarvis"]:
-            intent["type"] = "greeting"
-            return intent
-
-        # farewell
-        if any(w in text for w in ["bye", "goodbye", "see you", "good night"]):
-            intent["type"] = "farewell"
-            return intent
-
-        # identity
-        if any(w in text for w in ["who are you", "what are you", "introduce yourself", "who am i", "what is my name", "what's my name", "do you know me"]):
-            intent["type"] = "identity"
-            return intent
-
-        # system control (shutdown/restart pc)
-        if any(w in text for w in ["shutdown", "restart", "sleep"]):
-             # Check for "shutdown" solo or with machine words
-             if text == "shutdown" or ("shutdown" in text and any(w in text for w in ["pc", "laptop", "computer", "system"])):
-                  intent["type"] = "system_control"
-                  intent["action"] = "shutdown"
-                  return intent
-             if text == "restart" or ("restart" in text and any(w in text for w in ["pc", "laptop", "computer", "system"])):
-                  intent["type"] = "system_control"
-                  intent["action"] = "restart"
-                  return intent
-             if "sleep" in text and any(w in text for w in ["pc", "laptop", "computer", "system", "mode"]):
-                  intent["type"] = "system_control"
-                  intent["action"] = "sleep"
-                  return intent
-
-        # system status
-        if any(w in text for w in ["status report", "system status", "health report", "battery status", "cpu status"]):
-            intent["type"] = "system_status"
-            return intent
-
-        # --- VISION INTENTS (Priority over 'open') ---
-        if any(w in text for w in ["activate vision", "enable vision", "start camera", "turn on eyes"]):
-            intent["type"] = "vision_control"
-            intent["action"] = "start"
-            intent["mode"] = "monitoring"
-            return intent
-
-        if any(w in text for w in ["stop vision", "disable vision", "close camera", "turn off eyes"]):
-            intent["type"] = "vision_control"
-            intent["action"] = "stop"
-            return intent
-            
-        if any(w in text for w in ["virtual keyboard", "air keyboard", "enable keyboard"]):
-            intent["type"] = "vision_control"
-            intent["action"] = "start"
-            intent["mode"] = "keyboard"
-            return intent
-
-        # catch "open virtual keyboard" specific case
-        # catch "open virtual keyboard" specific case
-        if "virtual keyboard" in text and "open" in text:
-            intent["type"] = "vision_control"
-            intent["action"] = "start"
-            intent["mode"] = "keyboard"
-            return intent
-
-        # click picture
-        if any(w in text for w in ["click picture", "click my picture", "take photo", "take selfie", "capture photo"]):
-             intent["type"] = "vision_capture"
-             return intent
-
-
-        if any(w in text for w in ["count fingers", "how many fingers"]):
-            intent["type"] = "vision_control"
-            intent["action"] = "start"
-            intent["mode"] = "counting"
-            return intent
-
-        # Object Detection (Vision)
-        if any(w in text for w in ["what is this", "what am i showing", "describe this", "what do you see"]):
-             intent["type"] = "vision_describe"
-             return intent
-
-        # --- ADVANCED VISION ---
-        if any(w in text for w in ["mouse control", "control mouse", "cursor mode", "enable mouse"]):
-            intent["type"] = "vision_control"
-            intent["action"] = "start"
-            intent["mode"] = "mouse"
-            return intent
-            
-        if any(w in text for w in ["drawing mode", "start drawing", "i want to draw", "enable drawing"]):
-            intent["type"] = "vision_control"
-            intent["action"] = "start"
-            intent["mode"] = "drawing"
-            return intent
-
-        if any(w in text for w in ["gesture control", "volume gesture", "hand gestures", "enable gestures"]):
-            intent["type"] = "vision_control"
-            intent["action"] = "start"
-            intent["mode"] = "gestures"
-            return intent
-            
-        # weather
-        if "weather" in text:
-            # simple extraction: everything after weather
-            # "weather in london" -> "in london"
-            # "what is the weather like" -> "" (default to auto ip)
-            intent["type"] = "weather"
-            if " in " in text:
-                intent["location"] = text.split(" in ")[1].strip()
-            return intent
-
-        # wikipedia
-        if any(w in text for w in ["tell me about", "who is", "what is"]):
-            # Check if it's likely a wiki query vs a simple chat
-            # Force wiki if "wikipedia" is explicitly mentioned
-            if "wikipedia" in text:
-                 intent["type"] = "wikipedia"
-                 intent["query"] = text.replace("wikipedia", "").replace("search", "").strip()
-                 return intent
-            
-            # Simple heuristic overlap with "recall" and "web_search", 
-            # so we'll treat "Tell me about..." as primarily Wiki if offline or specialized
-            if text.startswith("tell me about "):
-                 intent["type"] = "wikipedia"
-                 intent["query"] = text.replace("tell me about", "").strip()
-                 return intent
-
-        # time
-        if any(w in text for w in ["time", "clock"]):
-            intent["type"] = "get_time"
-            return intent
-        
-        # play music
-        if text.startswith("play "):
-            song = text.replace("play", "", 1).strip()
-            # remove "from youtube" or "on youtube"
-            for suffix in [" from youtube", " on youtube", " youtube"]:
-                if song.endswith(suffix):
-                    song = song[:-len(suffix)].strip()
-            
-            intent["type"] = "play_music"
-            intent["song"] = song
-            return intent
-
-        # date
-        if "date" in text or "day today" in text:
-            intent["type"] = "get_date"
-            return intent
-
-        # open something
-        if text.startswith("open "):
-            # e.g. "open notepad" / "open youtube"
-            target_raw = text.replace("open", "", 1).strip()
-            
-            # Remove politeness
-            for polite in [" please", " thanks", " now"]:
-                if target_raw.endswith(polite):
-                    target_raw = target_raw[:-len(polite)].strip()
+            response_text, _ = await self.router.acall({"text": text}, ask)
+            return self._decode_ai_intent(text, response_text)
+        except Exception as e:
+            print(f"[ERROR] AI NLU Failed: {e}")
+            return None
 
-            target_lower = target_raw.lower()
-            
-            # CHECK FOR COMPOSITE COMMAND: "open whatsapp and send hi to mom"
-            if " and send " in target_lower:
-                # ... (existing whatsapp logic) ...
-                # Use CASE INSENSITIVE split
-                import re
-                parts = re.split(r" and send ", target_raw, flags=re.IGNORECASE, maxsplit=1)
-                remainder = parts[1] # "hi to mom"
-                if " to " in remainder.lower():
-                    # again, split case insensitive
-                    msg_parts = re.split(r" to ", remainder, flags=re.IGNORECASE, maxsplit=1)
-                    intent["type"] = "whatsapp_msg"
-                    intent["msg"] = msg_parts[0].strip()
-                    intent["contact"] = msg_parts[1].strip()
-                    return intent
-            
-            # CHECK FOR YOUTUBE PLAY: "open youtube and play ishq song"
-            if " and play " in target_lower:
-                # "youtube and play ishq song"
-                import re
-                parts = re.split(r" and play ", target_raw, flags=re.IGNORECASE, maxsplit=1)
-                # parts[0] is hopefully youtube
-                song = parts[1].strip()
-                intent["type"] = "play_music"
-                intent["song"] = song
-                return intent
-
-            # CHECK FOR YOUTUBE SEARCH: "open youtube and search for ishq" OR "search ishq"
-            # handle both "search for" and just "search"
-            if " and search " in target_lower:
-                import re
-                parts = re.split(r" and search( for)? ", target_raw, flags=re.IGNORECASE, maxsplit=1)
-                query = parts[1].strip()
-                
-                # Check if it was "open youtube..."
-                if "youtube" in parts[0].lower():
-                    # User said "Open YouTube and search...", so they want results list, NOT auto-play
-                    intent["type"] = "open_something"
-                    intent["target"] = "youtube_search_results" # Special flag
-                    intent["query"] = query
-                    return intent
-                
-            target = target_raw
-            
-            # SMART PARSING: Check if target starts with a known app
-            # specific fix for "open whatsapp..."
-            known_apps = list(self.config.get("apps", {}).keys()) + ["whatsapp"]
-            for app_name in known_apps:
-                # Check for "appname " or exact match
-                if target.lower() == app_name or target.lower().startswith(app_name + " "):
-                    target = app_name
-                    break
-            
-            intent["type"] = "open_something"
-            intent["target"] = target
-            return intent
-
-        # whatsapp message: "send hello to mom" (Direct command)
-        if text.startswith("send "):
-            # try to split by " to "
-            if " to " in text:
-                parts = text.split(" to ")
-                # "send hello world" -> "hello world"
-                msg_part = parts[0].replace("send", "", 1).strip()
-                # "mom"
-                contact_part = parts[1].strip()
-                
-                if msg_part and contact_part:
-                    intent["type"] = "whatsapp_msg"
-                    intent["msg"] = msg_part
-                    intent["contact"] = contact_part
-                    return intent
-
-        # search
-        # Explicit search cmd
-        # search
-        # Explicit search cmd
-        if text.startswith("search "):
-            q = text.replace("search", "", 1).strip()
-            
-            # STRICT REDIRECT: Only play if explicitly asked "and play"
-            # "search ishq song and play"
-            if " and play" in q.lower():
-                q = q.lower().replace(" and play", "").strip()
-                intent["type"] = "play_music"
-                intent["song"] = q
-                return intent
-                
-            if " for " in q:
-                # remove "for" if user said "search for context"
-                # But be careful: "search for loop python"
-                if q.startswith("for "):
-                    q = q[4:].strip()
-            
-            intent["type"] = "web_search"
-            intent["query"] = q
-            return intent
-            
-        # Implicit search (questions)
-        # e.g. "where is my degree...", "who is the president", "what is the capital"
-        question_starters = ["where is", "who is", "what is", "how to", "when is"]
-        if any(text.startswith(q) for q in question_starters):
-            intent["type"] = "research_topic"
-            intent["query"] = text
-            return intent
-
-        # type "..." or type ...
-        # Also support "write"
-        if "type " in text or "write " in text:
-            # e.g. jarvis type hello world
-            try:
-                # determine split keyword
-                keyword = "type" if "type " in text else "write"
-                
-                # split on first occurrence of keyword
-                parts = text.split(keyword, 1)
-                if len(parts) > 1:
-                    to_type = parts[1].strip()
-                    # remove surrounding quotes if present
-                    if to_type.startswith("\"") and to_type.endswith("\""):
-                        to_type = to_type[1:-1]
-                    
-                    if to_type:
-                        intent["type"] = "keyboard_type"
-                        intent["text"] = to_type
-                        return intent
-            except ValueError:
-                pass
+    def _nlu_ollama_text(self, template, user_prompt, result):
+        if not result:
+            return None
+        template.record(user_prompt, prompt_tokens=result.get("prompt_eval_count"))
+        return result.get("response", "")
+
+    def _nlu_gemini_text(self, template, user_prompt, resp):
+        usage = getattr(resp, "usage_metadata", None)
+        template.record(user_prompt,
+                        prompt_tokens=getattr(usage, "prompt_token_count", None),
+                        cached_tokens=getattr(usage, "cached_content_token_count", None))
+        return resp.text
+
+    def _decode_ai_intent(self, text, response_text):
+        """Pulls the JSON intent out of an NLU answer. Raises on malformed JSON."""
+        if response_text is None:
+            return None
 
-        # volume controls
-        if any(w in text for w in ["volume up", "increase volume"]):
-            intent["type"] = "volume_up"
-            return intent
-
-        if any(w in text for w in ["volume down", "decrease volume"]):
-            intent["type"] = "volume_down"
-            return intent
-
-        if any(w in text for w in ["mute volume", "mute sound"]):
-            intent["type"] = "volume_mute"
-            return intent
-
-        # download "url"
-        if text.startswith("download "):
-            # e.g. "download http://example.com/file.txt"
-            url_str = text.replace("download", "", 1).strip()
-            intent["type"] = "download"
-            intent["url"] = url_str
-            return intent
-
-        # system command / all access
-        if text.startswith("run command ") or text.startswith("execute "):
-            # e.g. "run command dir"
-            if text.startswith("run command "):
-                cmd = text.replace("run command", "", 1).strip()
-            else:
-                cmd = text.replace("execute", "", 1).strip()
-            intent["type"] = "system_command"
-            intent["command"] = cmd
-            return intent
-
-        # remember "..."
-        if text.startswith("remember "):
-            note = text.replace("remember", "", 1).strip()
-            # remove "that" if user said "remember that..."
-            if note.startswith("that "):
-                 note = note[5:].strip()
-            intent["type"] = "remember"
-            intent["note"] = note
-            return intent
+        # Parse JSON
+        # Cleanup potential markdown wrapping
+        if "```json" in response_text:
+            response_text = response_text.split("```json")[1].split("```")[0].strip()
+        elif "```" in response_text:
+            response_text = response_text.split("```")[1].split("```")[0].strip()
+        
+        response_text = response_text.strip()
+        # sometimes models add extra text, try to find the first { and last }
+        start_idx = response_text.find("{")
+        end_idx = response_text.rfind("}")
+        if start_idx != -1 and end_idx != -1:
+            response_text = response_text[start_idx:end_idx+1]
             
-        # recall / memory
-        if any(phrase in text for phrase in ["who am i", "what is my name", "what do you remember"]):
-            intent["type"] = "recall"
-            return intent
+        intent_data = json.loads(response_text)
+        
+        # Logged as a training example for the local classifier
+        self.log_nlu.info("ai_nlu", input=text, output=intent_data)
 
-        # [MOVED UP] Vision Intents were here, now moved up to priority.
+        return intent_data
 
-        return intent
+    def parse_intent_regex(self, text):
+        # Keyword rules live in jarvis_intents.INTENT_RULES (compiled in __init__)
+        return self.intent_matcher.match(text)
 
     # ---------- ACTIONS ----------
+    @traced("handler")
     def original_handle_intent(self, intent):
         t = intent.get("type", "unknown")
+        tracer.annotate(intent=t)
         
-        # Log to DB (Memory)
-        try:
-             database.db.log_interaction("Unknown (parsed)", t, "Processed")
-        except: pass
-
-        try:
-             with open("debug_log.txt", "a", encoding="utf-8") as f:
-                 f.write(f"[HANDLE] Intent: {t}, Data: {intent}\n")
-        except: pass
+        self.log_handle.info("intent", intent=intent)
 
         if t == "exit":
-            self.speak("Shutting down. Goodbye, sir.")
+            self.speak("Shutting down. Goodbye, sir.", priority="urgent")
             self.context.running = False
             self.vision.stop()
 
@@ -978,7 +881,7 @@ class JarvisAssistant:
 
             # Fallback to AppOpener
             try:
-                self.speak(f"Searching for {target}...")
+                self.speak(f"Searching for {target}...", transient=True)
                 open_system_app(target, match_closest=True, output=False) 
                 self.speak(f"Opened {target}")
                 time.sleep(1.5) # Wait for launch
@@ -1004,7 +907,7 @@ class JarvisAssistant:
                 self.speak("What should I research?")
                 return
             
-            self.speak(f"Researching {q}, please wait...")
+            self.speak(f"Researching {q}, please wait...", transient=True)
             
             # 1. Do the web research
             raw_content = self.researcher.search_and_scrape(q)
@@ -1024,16 +927,14 @@ class JarvisAssistant:
             
             answer = ""
             try:
-                # Assuming Gemini is main provider for this feature
-                api_key = self.config.get("GEMINI_API_KEY")
-                if api_key and api_key != "PASTE_YOUR_API_KEY_HERE":
-                    import google.generativeai as genai
-                    genai.configure(api_key=api_key)
-                    model = genai.GenerativeModel('gemini-1.5-flash') # Use a good model
-                    resp = model.generate_content(prompt)
-                    answer = resp.text
+                if self.router.candidates():
+                    if self.config.get("stream_responses", True):
+                        # Spoken sentence by sentence as it is generated
+                        if self.speak_stream(self.router.stream(prompt)):
+                            return
+                    answer = self.router.generate(prompt) or "I have the research data, but no AI provider could summarize it."
                 else:
-                     answer = "I have the research data, but cannot summarize it without a valid API key."
+                     answer = "I have the research data, but cannot summarize it without a working AI provider."
             except Exception as e:
                 answer = f"Sorry, I couldn't summarize the research. Error: {e}"
             
@@ -1138,24 +1039,52 @@ class JarvisAssistant:
         elif t == "recall":
             notes = database.db.get_notes(limit=1)
             if notes:
-                latest = notes[0].get("note", "")
+                latest = notes[0]
                 self.speak(f"You told me: {latest}")
             else:
                 self.speak("I don't have any memories yet.")
 
+        elif t == "search_history":
+            query = intent.get("query", "")
+            period = intent.get("period")
+            since, until = period_range(period)
+            # Only what the user said, not Jarvis' answers (and including the last few commands)
+            database.db.flush(timeout=1)
+            hits = database.db.search_history(query, since=since, until=until, column="user_text",
+                                              exclude_intents=("search_history", "search_notes"), limit=3)
+            when = f" {period}" if period else ""
+            if not hits:
+                self.speak(f"I couldn't find anything you said about {query}{when}.")
+            else:
+                best = hits[0]
+                day = best["timestamp"][:10]
+                self.speak(f"On {day} you said: {best['user_text']}.")
+                if len(hits) > 1:
+                    self.speak(f"I found {len(hits) - 1} more mention{'s' if len(hits) > 2 else ''} of {query}{when}.")
+
+        elif t == "search_notes":
+            query = intent.get("query", "")
+            notes = database.db.search_notes(query, limit=3)
+            if not notes:
+                self.speak(f"I don't have a note about {query}.")
+            else:
+                self.speak(f"Your note says: {notes[0]['note']}")
+
         elif t == "system_status":
             if not psutil:
                 self.speak("System monitoring modules are not installed.")
                 return
             
-            cpu = psutil.cpu_percent()
-            ram = psutil.virtual_memory().percent
-            battery = psutil.sensors_battery()
+            # Read from the shared sampler (fresh sample if it isn't running)
+            stats = self.metrics.latest(max_age=2 * self.metrics.interval)
             
-            status_msg = f"Systems nominal. CPU at {cpu}%. RAM at {ram}%."
-            if battery:
-                plugged = "charging" if battery.power_plugged else "on battery"
-                status_msg += f" Battery is {battery.percent}% and {plugged}."
+            status_msg = f"Systems nominal. CPU at {stats['cpu']}%. RAM at {stats['ram']}%."
+            avg_cpu = self.metrics.average("cpu", seconds=60)
+            if avg_cpu is not None and len(self.metrics.series("cpu", seconds=60)) > 1:
+                status_msg += f" CPU has averaged {avg_cpu:.0f}% over the last minute."
+            if stats.get("has_battery"):
+                plugged = "charging" if stats["plugged"] else "on battery"
+                status_msg += f" Battery is {stats['battery']}% and {plugged}."
             
             self.speak(status_msg)
 
@@ -1230,16 +1159,10 @@ class JarvisAssistant:
                  # Use Gemini for Multilingual
                  self.speak(f"Thinking of a joke in {lang}...")
                  try:
-                     import google.generativeai as genai
-                     api_key = self.config.get("GEMINI_API_KEY")
-                     if api_key:
-                         genai.configure(api_key=api_key)
-                         model = genai.GenerativeModel('gemini-1.5-flash')
-                         resp = model.generate_content(f"Tell me a short, funny joke in {lang}. Output ONLY the joke text.")
-                         joke_text = resp.text
-                         self.speak(joke_text)
-                     else:
-                         self.speak("Gemini API Key missing.")
+                     joke_text = self.router.generate(f"Tell me a short, funny joke in {lang}. Output ONLY the joke text.")
+                     if not joke_text:
+                         raise RuntimeError("no AI provider answered")
+                     self.speak(joke_text)
                  except Exception as e:
                      print(f"[ERROR] Joke Gen: {e}")
                      self.speak(f"I couldn't generate a joke in {lang}. Here is one in English.")
@@ -1250,28 +1173,37 @@ class JarvisAssistant:
 
 
         if t == "unknown":
-            # Check Provider
-            provider = self.config.get("ai_provider", "gemini").lower()
+            # First provider whose circuit isn't open (preferred one unless it keeps failing)
+            candidates = self.router.candidates()
+            provider = candidates[0] if candidates else None
             ollama_model = self.config.get("ollama_model", "llama3")
 
             # --- OLLAMA PATH ---
             if provider == "ollama":
                 self.speak(f"Asking Ollama ({ollama_model})...")
                 print(f"[DEBUG] Using Ollama model: {ollama_model}")
-                ollama_resp = self.ask_ollama(intent.get('text', ''), model=ollama_model)
-                if ollama_resp:
-                    self.speak(ollama_resp)
+                if self.config.get("stream_responses", True):
+                    try:
+                        ollama_resp = self.speak_stream(
+                            self.router.track("ollama", self.llm.ollama_stream(intent.get('text', ''), model=ollama_model)))
+                    except Exception as e:
+                        print(f"[ERROR] Ollama stream: {e}")
+                        ollama_resp = None
                 else:
+                    start = time.monotonic()
+                    ollama_resp = self.ask_ollama(intent.get('text', ''), model=ollama_model)
+                    self.router.record("ollama", time.monotonic() - start, ollama_resp is not None)
+                    if ollama_resp:
+                        self.speak(ollama_resp)
+                if not ollama_resp:
                     self.speak("Ollama is not responding. Make sure it is running.")
                 return
 
             # --- GEMINI PATH (Default) ---
-            api_key = self.config.get("GEMINI_API_KEY")
-            if api_key and api_key != "PASTE_YOUR_API_KEY_HERE":
+            if provider == "gemini":
+                recorded = False # the router's stream wrapper records the outcome itself
                 try:
-                    import google.generativeai as genai
-                    genai.configure(api_key=api_key)
-                    model = genai.GenerativeModel('gemini-1.5-flash') # Updated to Flash for better availability
+                    model = self.llm.gemini_model() # built once, reused across calls
                     
                     # 1. SPECIAL: Vision (Take Screenshot)
                     if any(w in intent.get('text', '') for w in ["look at this", "what is on my screen", "read this", "scan screen"]):
@@ -1283,8 +1215,8 @@ class JarvisAssistant:
                             img = Image.open(screenshot_path)
                             
                             # Vision Model
-                            model_vision = genai.GenerativeModel('gemini-1.5-flash') # Flash supports images
-                            response = model_vision.generate_content(["Describe what is on this screen briefly and helpfully.", img])
+                            # Flash supports images
+                            response = self.llm.gemini_generate(["Describe what is on this screen briefly and helpfully.", img], model=model)
                             
                             self.speak(response.text)
                             return
@@ -1300,7 +1232,7 @@ class JarvisAssistant:
                             "Output ONLY the python code between ```python and ```. "
                             "Do not use input functions. Print the final result."
                         )
-                        response = model.generate_content(code_prompt)
+                        response = self.llm.gemini_generate(code_prompt, model=model)
                         raw_ai = response.text
                         
                         # Extract Code
@@ -1329,7 +1261,7 @@ class JarvisAssistant:
                             "Output ONLY the raw HTML code between ```html and ```."
                          )
                          self.speak("Designing interface...")
-                         response = model.generate_content(design_prompt)
+                         response = self.llm.gemini_generate(design_prompt, model=model)
                          raw_ai = response.text
                          
                          if "```html" in raw_ai:
@@ -1407,8 +1339,19 @@ class JarvisAssistant:
                         "RESPONSE:"
                     )
                     
-                    response = model.generate_content(prompt)
-                    ai_text = response.text.strip()
+                    streaming = self.config.get("stream_responses", True)
+                    if streaming:
+                        # Speaks as it goes, but never reads out a $$CMD$$ line
+                        recorded = True
+                        ai_text = self.speak_stream(self.router.track("gemini", self.llm.gemini_stream(prompt, model=model)),
+                                                    stop_marker="$$CMD$$").strip()
+                    else:
+                        start = time.monotonic()
+                        ai_text = self.llm.gemini_generate(prompt, model=model).text.strip()
+                        self.router.record("gemini", time.monotonic() - start, bool(ai_text))
+                        recorded = True
+                    if not ai_text:
+                        raise RuntimeError("Gemini returned an empty response")
                     
                     # Check for $$CMD$$
                     if "$$CMD$$" in ai_text:
@@ -1420,12 +1363,14 @@ class JarvisAssistant:
                             self.speak("Command executed.")
                         except Exception as e:
                             self.speak(f"Command failed: {e}")
-                    else:
+                    elif not streaming:
                         self.speak(ai_text)
 
                     return # Handled by AI
                 except Exception as e:
                     print(f"AI Error: {e}")
+                    if not recorded:
+                        self.router.record("gemini", 0.0, False)
             
                 except Exception as e:
                     print(f"AI Error: {e}")
@@ -1453,25 +1398,10 @@ class JarvisAssistant:
             
             self.speak("I didn't understand that command, and I couldn't find an answer online.")
 
-    def ask_ollama(self, prompt, model="llama3"):
-        """Queries local Ollama instance (default port 11434)."""
-        try:
-            url = "http://localhost:11434/api/generate"
-            data = {
-                "model": model,
-                "prompt": prompt,
-                "stream": False
-            }
-            # Use urllib to avoid adding 'requests' dependency if not present
-            json_data = json.dumps(data).encode("utf-8")
-            req = urllib.request.Request(url, data=json_data, headers={'Content-Type': 'application/json'})
-            
-            with urllib.request.urlopen(req) as response:
-                result = json.loads(response.read().decode("utf-8"))
-                return result.get("response", "")
-        except Exception as e:
-             print(f"Ollama Error: {e}")
-             return None
+    def ask_ollama(self, prompt, model="llama3", system=None):
+        """Queries local Ollama instance (via the pooled LLM client)."""
+        result = self.llm.ollama_generate(prompt, model=model, system=system)
+        return result.get("response", "") if result else None
 
 
     # ---------- HELPERS ----------
@@ -1529,23 +1459,24 @@ class JarvisAssistant:
         def on_hotkey():
             if not self.context.running:
                 return
-            text = self.listen_once()
-            if not text:
-                return
-            
-            # Compound command support: split by "and"
-            # e.g. "open notepad and type hello" -> ["open notepad", "type hello"]
-            # Note: " and " with spaces to avoid splitting words like "android"
-            sub_commands = text.split(" and ")
-            
-            for cmd in sub_commands:
-                cmd = cmd.strip()
-                if cmd:
-                    print(f"Processing sub-command: {cmd}")
-                    intent = self.parse_intent(cmd)
-                    self.handle_intent(intent)
-                    # Small pause between chained commands
-                    time.sleep(1)
+            with tracer.span("command", source="hotkey"):
+                text = self.listen_once()
+                if not text:
+                    return
+                
+                # Compound command support: split by "and"
+                # e.g. "open notepad and type hello" -> ["open notepad", "type hello"]
+                # Note: " and " with spaces to avoid splitting words like "android"
+                sub_commands = text.split(" and ")
+                
+                for cmd in sub_commands:
+                    cmd = cmd.strip()
+                    if cmd:
+                        print(f"Processing sub-command: {cmd}")
+                        intent = self.parse_intent(cmd)
+                        self.handle_intent(intent)
+                        # Small pause between chained commands
+                        time.sleep(1)
 
     # Updated to Always-Listening Mode
     def start_background_listening(self):
@@ -1573,62 +1504,71 @@ class JarvisAssistant:
 
     def _mic_loop(self, wake_word):
         if not sr: return
-        recognizer = sr.Recognizer()
-        microphone = sr.Microphone()
-        
-        # Adjust for ambient noise once
-        with microphone as source:
-            print("[MIC] Adjusting for ambient noise...")
-            recognizer.adjust_for_ambient_noise(source, duration=1)
-            print("[MIC] Ready.")
+        # The wake stage and the command stage read the session's one stream
+        if not self.audio.start():
+            return
+        reader = self.audio.reader()
+        print("[MIC] Ready.")
 
-        while self.context.running:
+        while self.context.running and self.audio.running:
             try:
-                with microphone as source:
-                    # Short timeout for wake word detection
-                    audio = recognizer.listen(source, timeout=None, phrase_time_limit=3)
-                
-                try:
-                    # Fast offline check? No, use Google for now but handle errors gracefully
-                    # Ideally use PocketSphinx for local wake word
-                    text = recognizer.recognize_google(audio).lower()
-                    # print(f"[HEARD] {text}")
+                # Utterances are cut by the VAD; the wake word only needs the first seconds
+                pcm = reader.next_utterance(timeout=1, max_seconds=10)
+                if not pcm:
+                    continue
+
+                def transcribe():
+                    # STT, only called when the local spotter can't decide yet
+                    try:
+                        return self.stt.transcribe(pcm)
+                    except Exception:
+                        return "" # Internet issue / engine error
+
+                detected, rest_pcm, rest_text = self.wake_stage.detect(pcm, transcribe)
+                if detected:
+                    print(f"[WAKE] Wake word '{wake_word}' detected!")
+                    self.playSound("notification") # Optional feedback
+                    # "jarvis open notepad" in one breath: the command is already here
+                    first = rest_text or (self.recognize(rest_pcm) if rest_pcm else "")
+                    if not first:
+                        self.speak("Yes?", priority="high")
                     
-                    if wake_word in text:
-                        print(f"[WAKE] Wake word '{wake_word}' detected!")
-                        self.playSound("notification") # Optional feedback
-                        self.speak("Yes?")
-                        
-                        # Now listen for actual command
-                        self.listen_and_execute()
-                        
-                except sr.UnknownValueError:
-                    pass # Ignore silence/noise
-                except sr.RequestError:
-                    pass # Internet issue
+                    # Now listen for actual command, from where the wake utterance ended
+                    self.listen_and_execute(reader, first)
                     
             except Exception as e:
                 # print(f"[MIC ERROR] {e}")
                 pass
 
-    def listen_and_execute(self):
+    def listen_and_execute(self, reader=None, first_command=""):
          # Conversation Loop: Keep listening for follow-up commands
          CONVERSATION_TIMEOUT = 20 # seconds
          last_interaction = time.time()
+         cmd = first_command
          
          while (time.time() - last_interaction) < CONVERSATION_TIMEOUT:
              try:
-                 # Listen with short timeout
-                 cmd = self.listen_once(timeout=5, phrase_time_limit=10)
-                 
-                 if cmd:
-                     # Reset timer on valid input
-                     last_interaction = time.time()
-                     intent = self.parse_intent(cmd)
-                     self.handle_intent(intent)
-                 else:
-                     # Silence... check if we should timeout
-                     pass
+                 with tracer.span("command", source="wake"):
+                     # Listen with short timeout (unless the wake utterance already had the command)
+                     if not cmd:
+                         if reader is not None:
+                             # Not our own voice: let the reply finish, then drop what the mic
+                             # picked up meanwhile, except a user talking over it
+                             if self.speech.busy:
+                                 self.speech.wait_idle(timeout=60)
+                                 last_interaction = time.time()
+                             reader.skip(self.barge_in.last_position)
+                         cmd = self.listen_once(timeout=5, phrase_time_limit=10, reader=reader)
+                     
+                     if cmd:
+                         # Reset timer on valid input
+                         last_interaction = time.time()
+                         intent = self.parse_intent(cmd)
+                         self.handle_intent(intent)
+                     else:
+                         # Silence... check if we should timeout
+                         pass
+                     cmd = ""
                      
              except Exception:
                  break
@@ -1678,6 +1618,7 @@ class JarvisAssistant:
         # 3. Reflection
         # print("[REFLECTOR] Learning from previous outcomes...")
             
+    @traced("think")
     def think(self, intent):
         """
         Simulates cognitive reflection based on Internal Society of Agents.
@@ -1750,7 +1691,31 @@ class JarvisAssistant:
         self.speak("Skill execution complete.")
 
     # Wrapper to support recording and thinking
+    async def ahandle_intent(self, intent):
+        """
+        handle_intent() for async callers. Actions block (OS automation, TTS,
+        time.sleep), so they run on the bounded action pool, not the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        # Copy the context so the handler's spans stay in the caller's trace
+        return await loop.run_in_executor(self.executor, contextvars.copy_context().run, self.handle_intent, intent)
+
+    @traced("handle")
     def handle_intent(self, intent):
+        """Runs the intent, then logs the utterance and what Jarvis answered to the history (memory)."""
+        replies = []
+        token = _replies.set(replies)
+        try:
+            self._handle_intent(intent)
+        finally:
+            _replies.reset(token)
+            try:
+                database.db.log_interaction(intent.get("raw") or intent.get("text", ""), intent.get("type", "unknown"),
+                                            " ".join(replies))
+            except Exception as e:
+                print(f"[DB ERROR] Log interaction: {e}")
+
+    def _handle_intent(self, intent):
         # 0. Cognitive Process (Think)
         self.think(intent)
     
@@ -0,0 +1,407 @@
+"""
+Continuous microphone capture.
+
+One long-lived thread reads the microphone and appends 16 kHz 16-bit mono
+PCM to a ring buffer; the device is opened once, not per utterance.
+Consumers (the wake word stage, the command stage, the hotkey) each keep
+their own StreamReader with a position in the stream, and cut it into
+utterances with an energy VAD. The command reader starts where the wake
+word utterance ended, so nothing said in between is lost, and
+"jarvis open notepad" in one breath is a single utterance.
+
+    capture = AudioCapture(MicrophoneSource()).start()
+    reader = capture.reader()
+    pcm = reader.next_utterance(timeout=5)
+
+AudioSession is what the assistant holds: the capture stream (opened on
+first use and kept open), one shared Recognizer, and a background thread
+that re-measures the ambient noise from the stream every few seconds.
+BargeInMonitor listens on the same stream while Jarvis is talking.
+"""
+import math
+import threading
+import time
+
+from jarvis_wakeword import EnergyVAD, SAMPLE_RATE, SAMPLE_WIDTH, frame_rms
+
+try:
+    import speech_recognition as sr
+except ImportError:
+    sr = None
+
+
+class RingBuffer:
+    """
+    Fixed-size byte ring for one writer and any number of readers, without
+    locks: the writer copies a chunk in and only then advances `written` (a
+    single int store), and readers address the stream by absolute position.
+    A reader that falls more than `capacity` bytes behind loses the oldest
+    audio (read() clips to what is still there).
+    """
+    def __init__(self, seconds=30, rate=SAMPLE_RATE, width=SAMPLE_WIDTH):
+        self.capacity = int(seconds * rate) * width
+        self.buf = bytearray(self.capacity)
+        self.written = 0 # total bytes ever written
+
+    def write(self, data):
+        data = data[-self.capacity:]
+        start = self.written % self.capacity
+        first = min(len(data), self.capacity - start)
+        self.buf[start:start + first] = data[:first]
+        self.buf[:len(data) - first] = data[first:]
+        self.written += len(data)
+
+    def oldest(self):
+        return max(0, self.written - self.capacity)
+
+    def read(self, start, end):
+        """Bytes [start, end) of the stream (clipped to what is still buffered)."""
+        written = self.written
+        end = min(end, written)
+        start = max(start, written - self.capacity, 0)
+        if start >= end:
+            return b""
+        a, b = start % self.capacity, end % self.capacity
+        data = bytes(self.buf[a:b]) if a < b else bytes(self.buf[a:] + self.buf[:b])
+        overrun = self.written - self.capacity - start # overwritten while we copied
+        return data[overrun:] if overrun > 0 else data
+
+
+class MicrophoneSource:
+    """The default microphone through speech_recognition / PyAudio, at 16 kHz."""
+    def __init__(self, device_index=None, rate=SAMPLE_RATE, frame_ms=20):
+        if sr is None:
+            raise RuntimeError("SpeechRecognition / PyAudio not installed")
+        self.rate = rate
+        self.mic = sr.Microphone(device_index=device_index, sample_rate=rate,
+                                 chunk_size=int(rate * frame_ms / 1000))
+
+    def open(self):
+        self.mic.__enter__()
+
+    def read(self):
+        return self.mic.stream.read(self.mic.CHUNK)
+
+    def close(self):
+        self.mic.__exit__(None, None, None)
+
+
+class AudioCapture:
+    def __init__(self, source, ring=None, frame_ms=20):
+        self.source = source # open() / read() -> PCM bytes (b"" at end) / close()
+        self.ring = ring or RingBuffer()
+        self.frame_ms = frame_ms
+        self.frame_bytes = int(SAMPLE_RATE * frame_ms / 1000) * SAMPLE_WIDTH
+        self.reads = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self.source.open()
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="audio-capture")
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _loop(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    data = self.source.read()
+                except Exception as e:
+                    self.errors += 1
+                    print(f"[AUDIO] Read failed: {e}")
+                    time.sleep(0.1)
+                    continue
+                if not data:
+                    break # end of a file source
+                self.ring.write(data)
+                self.reads += 1
+        finally:
+            self.source.close()
+
+    def reader(self, preroll_ms=0, vad=None):
+        """A new StreamReader starting now (or preroll_ms in the past)."""
+        position = self.ring.written - int(SAMPLE_RATE * preroll_ms / 1000) * SAMPLE_WIDTH
+        return StreamReader(self, max(self.ring.oldest(), position), vad)
+
+    def stats(self):
+        return {"running": self.running, "reads": self.reads, "errors": self.errors,
+                "buffered_seconds": round(min(self.ring.written, self.ring.capacity) / SAMPLE_WIDTH / SAMPLE_RATE, 2)}
+
+
+class StreamReader:
+    """One consumer's position in the capture stream, cut into utterances by a VAD."""
+    def __init__(self, capture, position, vad=None):
+        self.capture = capture
+        self.ring = capture.ring
+        self.position = position
+        self.mark = position # end of the last utterance; the next one never reaches back past it
+        self.vad = vad or EnergyVAD(frame_ms=capture.frame_ms)
+
+    def next_frame(self, deadline=None):
+        """The next frame, waiting for the capture thread. None at deadline (monotonic) or when capture stopped."""
+        size = self.capture.frame_bytes
+        while self.ring.written - self.position < size:
+            if not self.capture.running and self.ring.written - self.position < size:
+                return None
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(self.capture.frame_ms / 2000)
+        self.position = max(self.position, self.ring.oldest()) # fell behind: skip lost audio
+        frame = self.ring.read(self.position, self.position + size)
+        self.position += size
+        return frame
+
+    def next_utterance(self, timeout=None, max_seconds=15, pause_ms=700, preroll_ms=300, on_audio=None):
+        """
+        PCM of the next utterance: from just before speech starts until pause_ms
+        of silence (or max_seconds). None if no speech starts within timeout.
+        on_audio(pcm) gets the utterance piece by piece while it is recorded
+        (for streaming STT).
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        frame_bytes = self.capture.frame_bytes
+        start = None
+        run = silence = 0
+        while True:
+            frame = self.next_frame(deadline if start is None else None)
+            if frame is None:
+                return self._cut(start) if start is not None else None
+            speech = self.vad.is_speech(frame)
+            if start is None:
+                run = run + 1 if speech else 0
+                if run >= self.vad.min_speech_frames:
+                    start = max(self.mark, self.ring.oldest(), self.position - run * frame_bytes
+                                - int(SAMPLE_RATE * preroll_ms / 1000) * SAMPLE_WIDTH)
+                    if on_audio:
+                        on_audio(self.ring.read(start, self.position))
+                continue
+            if on_audio:
+                on_audio(frame)
+            silence = 0 if speech else silence + 1
+            too_long = self.position - start >= int(max_seconds * SAMPLE_RATE) * SAMPLE_WIDTH
+            if silence * self.capture.frame_ms >= pause_ms or too_long:
+                return self._cut(start)
+
+    def _cut(self, start):
+        self.mark = self.position
+        return self.ring.read(start, self.position)
+
+    def skip(self, keep_from=None):
+        """
+        Drops everything buffered so far (e.g. Jarvis' own voice). keep_from:
+        a stream position after this reader's; audio from there on is kept
+        (the user talking over Jarvis).
+        """
+        end = self.ring.written
+        if keep_from is not None and self.position < keep_from < end:
+            end = keep_from
+        self.position = self.mark = end
+
+
+class AudioSession:
+    """
+    The assistant's microphone. The device and the Recognizer stay open for
+    the whole session; the noise level is measured from the capture stream
+    in the background (no extra recording), sets the recognizer's
+    energy_threshold and seeds the VAD of every new reader, and is reported
+    to on_noise(level_db).
+    """
+    def __init__(self, source_factory=None, frame_ms=20, buffer_seconds=30, recalibrate_interval=30.0,
+                 calibrate_seconds=2.0, ratio=3.0, min_energy=150.0, on_noise=None):
+        self.source_factory = source_factory or MicrophoneSource
+        self.frame_ms = frame_ms
+        self.buffer_seconds = buffer_seconds
+        self.recalibrate_interval = recalibrate_interval
+        self.calibrate_seconds = calibrate_seconds
+        self.ratio = ratio
+        self.min_energy = min_energy
+        self.on_noise = on_noise
+        self.recognizer = sr.Recognizer() if sr else None
+        self.capture = None
+        self.noise_level = None # RMS of the ambient noise, None until calibrated
+        self.calibrations = 0
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config, on_noise=None):
+        cfg = config.get("audio", {})
+        device_index = cfg.get("device_index")
+        return cls(source_factory=lambda: MicrophoneSource(device_index, frame_ms=cfg.get("frame_ms", 20)),
+                   frame_ms=cfg.get("frame_ms", 20),
+                   buffer_seconds=cfg.get("buffer_seconds", 30),
+                   recalibrate_interval=cfg.get("recalibrate_interval", 30.0),
+                   calibrate_seconds=cfg.get("calibrate_seconds", 2.0),
+                   ratio=cfg.get("vad_ratio", 3.0),
+                   min_energy=cfg.get("vad_min_energy", 150.0),
+                   on_noise=on_noise)
+
+    @property
+    def running(self):
+        return self.capture is not None and self.capture.running
+
+    def start(self):
+        """Opens the device once (later calls are no-ops). False if it can't be opened."""
+        with self.lock:
+            if self.running:
+                return True
+            try:
+                self.capture = AudioCapture(self.source_factory(), RingBuffer(self.buffer_seconds), self.frame_ms).start()
+            except Exception as e:
+                print(f"[AUDIO] Could not open the microphone: {e}")
+                self.capture = None
+                return False
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._loop, daemon=True, name="audio-calibration")
+                self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self.capture:
+            self.capture.stop()
+
+    def reader(self, preroll_ms=0):
+        """A StreamReader whose VAD starts from the calibrated noise floor."""
+        vad = EnergyVAD(frame_ms=self.frame_ms, ratio=self.ratio, min_energy=self.min_energy)
+        vad.noise_floor = self.noise_level
+        return self.capture.reader(preroll_ms, vad)
+
+    # ---------- CALIBRATION ----------
+    def _loop(self):
+        wait = self.calibrate_seconds # first measurement as soon as there is enough audio
+        while not self._stop.wait(wait):
+            wait = self.recalibrate_interval
+            try:
+                self.calibrate()
+            except Exception as e:
+                print(f"[AUDIO] Calibration failed: {e}")
+
+    def calibrate(self):
+        """Measures the noise over the last calibrate_seconds of the stream. Returns the level in dB."""
+        ring = self.capture.ring
+        size = int(SAMPLE_RATE * self.frame_ms / 1000) * SAMPLE_WIDTH
+        pcm = ring.read(ring.written - int(self.calibrate_seconds * SAMPLE_RATE) * SAMPLE_WIDTH, ring.written)
+        energies = sorted(frame_rms(pcm[i:i + size]) for i in range(0, len(pcm) - size + 1, size))
+        if not energies:
+            return None
+        self.noise_level = energies[len(energies) // 5] # a low percentile, so speech doesn't count as noise
+        if self.recognizer is not None:
+            self.recognizer.energy_threshold = max(self.min_energy, self.noise_level * self.ratio)
+        self.calibrations += 1
+        level = self.noise_db
+        if self.on_noise:
+            self.on_noise(level)
+        return level
+
+    @property
+    def noise_db(self):
+        """Noise level in dBFS: 0 is a full-scale signal, a quiet room around -55, one sample step -90."""
+        return None if self.noise_level is None else round(20 * math.log10(max(1.0, self.noise_level) / 32768), 1)
+
+    def stats(self):
+        return {"running": self.running, "noise_level": self.noise_level, "noise_db": self.noise_db,
+                "energy_threshold": self.recognizer.energy_threshold if self.recognizer else None,
+                "calibrations": self.calibrations, "capture": self.capture.stats() if self.capture else None}
+
+
+class BargeInMonitor:
+    """
+    Watches the session's stream while Jarvis is speaking and calls
+    on_barge_in() when the user talks over it. Jarvis' own voice comes back
+    through the mic too, so its level is measured over the first settle_ms
+    of each playback, and only min_ms of frames `ratio` times louder than
+    that (or than the ambient noise) count as the user.
+    """
+    def __init__(self, session, is_speaking, on_barge_in, min_ms=300, ratio=2.0, settle_ms=400, min_energy=300.0):
+        self.session = session
+        self.is_speaking = is_speaking
+        self.on_barge_in = on_barge_in
+        self.min_ms = min_ms
+        self.ratio = ratio
+        self.settle_ms = settle_ms
+        self.min_energy = min_energy
+        self.barge_ins = 0
+        self.last_position = None # stream position where the last barge-in started
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, session, is_speaking, on_barge_in, config):
+        cfg = config.get("tts", {})
+        return cls(session, is_speaking, on_barge_in,
+                   min_ms=cfg.get("barge_in_ms", 300),
+                   ratio=cfg.get("barge_in_ratio", 2.0),
+                   settle_ms=cfg.get("barge_in_settle_ms", 400))
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="barge-in")
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _loop(self):
+        frame_ms = self.session.frame_ms
+        settle_frames = max(1, self.settle_ms // frame_ms)
+        needed = max(1, self.min_ms // frame_ms)
+        reader = None
+        playing = False
+        while not self._stop.is_set():
+            if not self.session.running: # the mic isn't open (yet), nothing to watch
+                reader = None
+                self._stop.wait(0.5)
+                continue
+            if reader is None:
+                reader = self.session.reader()
+            if not self.is_speaking():
+                reader.skip()
+                playing = False
+                self._stop.wait(frame_ms / 1000)
+                continue
+            if not playing:
+                playing, echo, run, threshold = True, [], 0, None
+            frame = reader.next_frame(time.monotonic() + 0.2)
+            if frame is None:
+                continue
+            energy = frame_rms(frame)
+            if threshold is None:
+                echo.append(energy)
+                if len(echo) >= settle_frames:
+                    echo.sort()
+                    floor = max(self.session.noise_level or 0.0, echo[int(len(echo) * 0.8)])
+                    threshold = max(self.min_energy, floor * self.ratio)
+                continue
+            run = run + 1 if energy >= threshold else 0
+            if run >= needed:
+                self.barge_ins += 1
+                self.last_position = reader.position - run * len(frame)
+                print("[AUDIO] Barge-in: stopping speech.")
+                self.on_barge_in()
+                run = 0
+                reader.skip()
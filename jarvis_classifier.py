@@ -0,0 +1,279 @@
+"""
+Offline intent classifier, the middle tier between the keyword rules and the
+LLM NLU.
+
+Utterances are turned into hashed character n-gram TF-IDF vectors and
+compared by cosine similarity against labelled examples. The examples come
+from the intent schema we give the LLM plus past successful AI parses (the
+"ai_nlu" records of the event log, and [AI-NLU] lines of the old
+debug_log.txt), so the more the AI parses, the less we need it.
+"""
+import ast
+import os
+import re
+import threading
+import zlib
+from jarvis_logging import read_records
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+    print("[WARNING] numpy not installed. Local NLU classifier disabled.")
+
+# Slot-free examples for the intent schema used by parse_intent_ai.
+SCHEMA_EXAMPLES = [
+    ("exit", {"type": "exit"}),
+    ("stop listening now", {"type": "exit"}),
+    ("close yourself", {"type": "exit"}),
+    ("hello there", {"type": "greeting"}),
+    ("good morning", {"type": "greeting"}),
+    ("hey buddy", {"type": "greeting"}),
+    ("what time is it", {"type": "get_time"}),
+    ("tell me the current time", {"type": "get_time"}),
+    ("what day is it today", {"type": "get_date"}),
+    ("which date is today", {"type": "get_date"}),
+    ("tell me a joke", {"type": "joke"}),
+    ("make me laugh", {"type": "joke"}),
+    ("say something funny", {"type": "joke"}),
+    ("shutdown the system please", {"type": "system_control", "action": "shutdown"}),
+    ("turn off the computer", {"type": "system_control", "action": "shutdown"}),
+    ("power off my pc", {"type": "system_control", "action": "shutdown"}),
+    ("restart the system", {"type": "system_control", "action": "restart"}),
+    ("reboot my laptop", {"type": "system_control", "action": "restart"}),
+    ("put the computer to sleep", {"type": "system_control", "action": "sleep"}),
+    ("start the vision system", {"type": "vision_control", "action": "start", "mode": "monitoring"}),
+    ("turn on the camera", {"type": "vision_control", "action": "start", "mode": "monitoring"}),
+    ("stop the vision system", {"type": "vision_control", "action": "stop"}),
+    ("turn off the camera", {"type": "vision_control", "action": "stop"}),
+    ("vision system in keyboard mode", {"type": "vision_control", "action": "start", "mode": "keyboard"}),
+    ("let me control the mouse with my hand", {"type": "vision_control", "action": "start", "mode": "mouse"}),
+    ("i want to draw in the air", {"type": "vision_control", "action": "start", "mode": "drawing"}),
+    ("click a picture of me", {"type": "vision_capture"}),
+    ("take a picture", {"type": "vision_capture"}),
+    ("snap a photo", {"type": "vision_capture"}),
+    ("describe what you see", {"type": "vision_describe"}),
+    ("what is in front of the camera", {"type": "vision_describe"}),
+    ("stop learning", {"type": "stop_learning"}),
+    ("save this skill", {"type": "stop_learning"}),
+    ("who is the president of india", {"type": "research_topic", "query": "who is the president of india"}),
+    ("explain how black holes work", {"type": "research_topic", "query": "explain how black holes work"}),
+]
+
+# Fields holding free text copied out of the utterance. We can only fill
+# "query" (= the whole utterance); other free-text intents go to the LLM.
+FREE_TEXT_SLOTS = {"target", "song", "query", "contact", "msg", "key", "value",
+                   "skill_name", "text", "url", "command", "note", "location", "language"}
+WHOLE_TEXT_SLOTS = {"research_topic": "query", "web_search": "query"}
+
+# Never act on a weak guess for these, even when the AI is down.
+RISKY_TYPES = {"system_control", "system_command", "exit"}
+
+_AI_NLU_LINE = re.compile(r"^\[AI-NLU\] Input: '(.*)' -> Output: (\{.*\})\s*$")
+
+
+def _example(text, intent):
+    if isinstance(intent, dict) and intent.get("type") not in (None, "unknown") and isinstance(text, str):
+        return (text.lower().strip(), intent)
+    return None
+
+
+def load_ai_nlu_examples(path="debug_log.txt"):
+    """
+    Reads past successful AI parses: "ai_nlu" records from a JSON lines event
+    log (rotated segments included), or [AI-NLU] lines from the old debug log.
+    """
+    examples = []
+    if path.endswith(".jsonl"):
+        for record in read_records(path):
+            if record.get("event") == "ai_nlu":
+                example = _example(record.get("input"), record.get("output"))
+                if example:
+                    examples.append(example)
+        return examples
+    if not os.path.exists(path):
+        return examples
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                m = _AI_NLU_LINE.match(line)
+                if not m:
+                    continue
+                try:
+                    intent = ast.literal_eval(m.group(2))
+                except (ValueError, SyntaxError):
+                    continue
+                example = _example(m.group(1), intent)
+                if example:
+                    examples.append(example)
+    except Exception as e:
+        print(f"[LOCAL-NLU] Could not read {path}: {e}")
+    return examples
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+class IntentClassifier:
+    """
+    Examples are deduplicated on normalized text (the latest intent wins) and
+    capped at max_examples: past the cap the least recently taught ones are
+    dropped, schema examples never. New examples are vectorized with the
+    current IDF and merged into the matrix in batches; the full refit only
+    runs after an eviction or once the example count has grown by half.
+    """
+    def __init__(self, examples=None, threshold=0.6, exact_threshold=0.97, dim=2 ** 13, ngram_range=(2, 4),
+                 max_examples=1000, batch=32):
+        self.threshold = threshold
+        self.exact_threshold = exact_threshold
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.max_examples = max(max_examples, len(SCHEMA_EXAMPLES))
+        self.batch = batch
+        self.examples = []
+        self.lock = threading.Lock()
+        self._index = {} # normalized text -> position in self.examples
+        self._ticks = [] # when each example was last taught, for eviction
+        self._tick = 0
+        self._pinned = {_normalize(text) for text, _ in SCHEMA_EXAMPLES}
+        self._matrix = None # rows for examples[:len(_matrix)]
+        self._pending = None # rows for the examples after those, same IDF
+        self._idf = None
+        self._fitted = 0 # example count at the last full fit
+        self._dirty = True
+        self.refits = 0
+        for text, intent in (examples if examples is not None else SCHEMA_EXAMPLES):
+            self.add_example(text, intent)
+
+    @property
+    def available(self):
+        return np is not None and bool(self.examples)
+
+    def _features(self, text):
+        text = " " + _normalize(text) + " "
+        idx = []
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            for i in range(len(text) - n + 1):
+                idx.append(zlib.crc32(text[i:i + n].encode("utf-8")) % self.dim)
+        return np.bincount(np.asarray(idx, dtype=np.int64), minlength=self.dim).astype(np.float32)
+
+    def add_example(self, text, intent):
+        key = _normalize(text)
+        with self.lock:
+            self._tick += 1
+            pos = self._index.get(key)
+            if pos is not None:
+                # Same utterance again: same vector, only the label may change
+                self.examples[pos] = (self.examples[pos][0], intent)
+                self._ticks[pos] = self._tick
+                return
+            self._index[key] = len(self.examples)
+            self.examples.append((text, intent))
+            self._ticks.append(self._tick)
+            if len(self.examples) > self.max_examples:
+                self._evict()
+
+    def _evict(self):
+        """Drops the least recently taught examples down to 75% of the cap (lock held)."""
+        keep = int(self.max_examples * 0.75)
+        learned = sorted((tick, pos) for pos, tick in enumerate(self._ticks)
+                         if _normalize(self.examples[pos][0]) not in self._pinned)
+        drop = {pos for _, pos in learned[:len(self.examples) - keep]}
+        self.examples = [e for pos, e in enumerate(self.examples) if pos not in drop]
+        self._ticks = [t for pos, t in enumerate(self._ticks) if pos not in drop]
+        self._index = {_normalize(text): pos for pos, (text, _) in enumerate(self.examples)}
+        self._dirty = True
+
+    def _rows(self, tf):
+        weighted = tf * self._idf
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return weighted / norms
+
+    def fit(self):
+        with self.lock:
+            self._fit()
+
+    def _fit(self):
+        if np is None or not self.examples:
+            return
+        tf = np.vstack([self._features(text) for text, _ in self.examples])
+        df = np.count_nonzero(tf, axis=0)
+        n = len(self.examples)
+        self._idf = (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype(np.float32)
+        self._matrix = self._rows(tf)
+        self._pending = None
+        self._fitted = n
+        self._dirty = False
+        self.refits += 1
+
+    def _update(self):
+        """Brings the vectors up to date with self.examples (lock held)."""
+        n = len(self.examples)
+        if self._dirty or n >= self._fitted * 1.5:
+            self._fit()
+            return
+        done = len(self._matrix) + (0 if self._pending is None else len(self._pending))
+        if done < n:
+            rows = self._rows(np.vstack([self._features(text) for text, _ in self.examples[done:]]))
+            self._pending = rows if self._pending is None else np.vstack([self._pending, rows])
+        if self._pending is not None and len(self._pending) >= self.batch:
+            self._matrix = np.vstack([self._matrix, self._pending])
+            self._pending = None
+
+    def classify(self, text):
+        """
+        Returns (intent, score) for the nearest example, or (None, score) if
+        the nearest example needs slots we can't fill locally.
+        """
+        if not self.available:
+            return None, 0.0
+        with self.lock:
+            self._update()
+            vec = self._features(text) * self._idf
+            norm = np.linalg.norm(vec)
+            if norm == 0:
+                return None, 0.0
+            sims = self._matrix @ (vec / norm)
+            if self._pending is not None:
+                sims = np.concatenate([sims, self._pending @ (vec / norm)])
+            best = int(np.argmax(sims))
+            score = float(sims[best])
+            example_text, example_intent = self.examples[best]
+
+        # Near-identical utterance: reuse the example verbatim, slots and all
+        if score >= self.exact_threshold:
+            return dict(example_intent), score
+
+        intent = {k: v for k, v in example_intent.items()}
+        slots = FREE_TEXT_SLOTS.intersection(intent)
+        fill = WHOLE_TEXT_SLOTS.get(intent.get("type"))
+        if slots and slots != {fill}:
+            return None, score
+        if fill:
+            intent[fill] = text
+        return intent, score
+
+    def confident(self, intent, score):
+        """
+        True if a classify() result can be acted on without the LLM. Never for
+        RISKY_TYPES: "never turn off the computer" looks a lot like "turn off
+        the computer".
+        """
+        return bool(intent) and score >= self.threshold and intent.get("type") not in RISKY_TYPES
+
+    def predict(self, text):
+        """Returns a confident intent, or None to escalate to the LLM."""
+        intent, score = self.classify(text)
+        return intent if self.confident(intent, score) else None
+
+    def stats(self):
+        return {
+            "examples": len(self.examples),
+            "max_examples": self.max_examples,
+            "refits": self.refits,
+            "available": self.available,
+            "threshold": self.threshold,
+            "features": self.dim
+        }
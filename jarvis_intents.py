@@ -0,0 +1,430 @@
+"""
+Fast keyword NLU for Jarvis.
+
+The rules below are a declarative version of the old if/elif chain in
+parse_intent_regex. They are compiled once (at config load) into a single
+Aho-Corasick automaton, so a command is scanned in one pass no matter how
+many keywords we add. Rule order in INTENT_RULES is the priority order.
+"""
+import datetime
+import re
+from collections import deque
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a fixed list of phrases.
+    find() reports every (start, phrase_index) occurrence in one scan.
+    """
+    def __init__(self, phrases):
+        self.phrases = list(phrases)
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+
+        # 1. Build the trie
+        for idx, phrase in enumerate(self.phrases):
+            state = 0
+            for ch in phrase:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[state][ch] = nxt
+                state = nxt
+            self.out[state].append(idx)
+
+        # 2. Failure links (BFS), merging outputs of the fallback states
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find(self, text):
+        state = 0
+        goto, fail, out, phrases = self.goto, self.fail, self.out, self.phrases
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for idx in out[state]:
+                yield i - len(phrases[idx]) + 1, idx
+
+
+# ---------- RULE BUILDERS ----------
+# Each builder gets (intent, text, config) and returns the filled intent,
+# or None to fall through to the next matching rule.
+
+MACHINE_WORDS = ["pc", "laptop", "computer", "system"]
+
+
+def _joke(intent, text, config):
+    # Extract language: "tell me a joke in kannada"
+    match = re.search(r" in (\w+)", text)
+    if match:
+        intent["language"] = match.group(1)
+    return intent
+
+
+def _system_control(intent, text, config):
+    # Check for "shutdown" solo or with machine words
+    if text == "shutdown" or ("shutdown" in text and any(w in text for w in MACHINE_WORDS)):
+        intent["action"] = "shutdown"
+        return intent
+    if text == "restart" or ("restart" in text and any(w in text for w in MACHINE_WORDS)):
+        intent["action"] = "restart"
+        return intent
+    if "sleep" in text and any(w in text for w in MACHINE_WORDS + ["mode"]):
+        intent["action"] = "sleep"
+        return intent
+    return None
+
+
+def _weather(intent, text, config):
+    # "weather in london" -> "london", "what is the weather like" -> auto ip
+    if " in " in text:
+        intent["location"] = text.split(" in ")[1].strip()
+    return intent
+
+
+def _wikipedia(intent, text, config):
+    # Force wiki if "wikipedia" is explicitly mentioned
+    if "wikipedia" in text:
+        intent["query"] = text.replace("wikipedia", "").replace("search", "").strip()
+        return intent
+    # Treat "Tell me about..." as primarily Wiki
+    if text.startswith("tell me about "):
+        intent["query"] = text.replace("tell me about", "").strip()
+        return intent
+    return None
+
+
+def _play_music(intent, text, config):
+    song = text.replace("play", "", 1).strip()
+    # remove "from youtube" or "on youtube"
+    for suffix in [" from youtube", " on youtube", " youtube"]:
+        if song.endswith(suffix):
+            song = song[:-len(suffix)].strip()
+    intent["song"] = song
+    return intent
+
+
+def _open_something(intent, text, config):
+    # e.g. "open notepad" / "open youtube"
+    target_raw = text.replace("open", "", 1).strip()
+
+    # Remove politeness
+    for polite in [" please", " thanks", " now"]:
+        if target_raw.endswith(polite):
+            target_raw = target_raw[:-len(polite)].strip()
+
+    target_lower = target_raw.lower()
+
+    # COMPOSITE COMMAND: "open whatsapp and send hi to mom"
+    if " and send " in target_lower:
+        parts = re.split(r" and send ", target_raw, flags=re.IGNORECASE, maxsplit=1)
+        remainder = parts[1] # "hi to mom"
+        if " to " in remainder.lower():
+            msg_parts = re.split(r" to ", remainder, flags=re.IGNORECASE, maxsplit=1)
+            intent["type"] = "whatsapp_msg"
+            intent["msg"] = msg_parts[0].strip()
+            intent["contact"] = msg_parts[1].strip()
+            return intent
+
+    # YOUTUBE PLAY: "open youtube and play ishq song"
+    if " and play " in target_lower:
+        parts = re.split(r" and play ", target_raw, flags=re.IGNORECASE, maxsplit=1)
+        intent["type"] = "play_music"
+        intent["song"] = parts[1].strip()
+        return intent
+
+    # YOUTUBE SEARCH: "open youtube and search for ishq"
+    if " and search " in target_lower:
+        parts = re.split(r" and search( for)? ", target_raw, flags=re.IGNORECASE, maxsplit=1)
+        query = parts[-1].strip()
+        if "youtube" in parts[0].lower():
+            # They want the results list, NOT auto-play
+            intent["target"] = "youtube_search_results" # Special flag
+            intent["query"] = query
+            return intent
+
+    target = target_raw
+
+    # SMART PARSING: Check if target starts with a known app
+    known_apps = list(config.get("apps", {}).keys()) + ["whatsapp"]
+    for app_name in known_apps:
+        if target.lower() == app_name or target.lower().startswith(app_name + " "):
+            target = app_name
+            break
+
+    intent["target"] = target
+    return intent
+
+
+def _send_message(intent, text, config):
+    # whatsapp message: "send hello to mom"
+    if " to " not in text:
+        return None
+    parts = text.split(" to ")
+    msg_part = parts[0].replace("send", "", 1).strip()
+    contact_part = parts[1].strip()
+    if msg_part and contact_part:
+        intent["msg"] = msg_part
+        intent["contact"] = contact_part
+        return intent
+    return None
+
+
+def _web_search(intent, text, config):
+    q = text.replace("search", "", 1).strip()
+
+    # STRICT REDIRECT: Only play if explicitly asked "and play"
+    if " and play" in q.lower():
+        intent["type"] = "play_music"
+        intent["song"] = q.lower().replace(" and play", "").strip()
+        return intent
+
+    # remove "for" if user said "search for context"
+    if " for " in q and q.startswith("for "):
+        q = q[4:].strip()
+
+    intent["query"] = q
+    return intent
+
+
+def _research_topic(intent, text, config):
+    intent["query"] = text
+    return intent
+
+
+def _keyboard_type(intent, text, config):
+    # e.g. jarvis type hello world
+    keyword = "type" if "type " in text else "write"
+    parts = text.split(keyword, 1)
+    if len(parts) > 1:
+        to_type = parts[1].strip()
+        # remove surrounding quotes if present
+        if to_type.startswith("\"") and to_type.endswith("\""):
+            to_type = to_type[1:-1]
+        if to_type:
+            intent["text"] = to_type
+            return intent
+    return None
+
+
+def _download(intent, text, config):
+    intent["url"] = text.replace("download", "", 1).strip()
+    return intent
+
+
+def _system_command(intent, text, config):
+    if text.startswith("run command "):
+        intent["command"] = text.replace("run command", "", 1).strip()
+    else:
+        intent["command"] = text.replace("execute", "", 1).strip()
+    return intent
+
+
+def _remember(intent, text, config):
+    note = text.replace("remember", "", 1).strip()
+    # remove "that" if user said "remember that..."
+    if note.startswith("that "):
+        note = note[5:].strip()
+    intent["note"] = note
+    return intent
+
+
+# Time periods understood by the memory search intents
+PERIODS = ["today", "yesterday", "this week", "last week", "this month", "last month", "this year"]
+_LAST_N = re.compile(r"\b(?:in the )?(?:last|past) (\d+) (day|week|month)s?\b")
+
+
+def _split_period(text):
+    """'pizza last week' -> ('pizza', 'last week'). Period is None if there isn't one."""
+    m = _LAST_N.search(text)
+    if m:
+        return (text[:m.start()] + text[m.end():]).strip(), f"last {m.group(1)} {m.group(2)}s"
+    for period in PERIODS:
+        m = re.search(rf"\b(?:from |during |in )?{period}\b", text)
+        if m:
+            return (text[:m.start()] + text[m.end():]).strip(), period
+    return text, None
+
+
+def period_range(period, now=None):
+    """
+    Period name -> (since, until) ISO timestamps (either may be None).
+    Kept out of the intent itself so cached intents don't go stale.
+    """
+    if not period:
+        return None, None
+    now = now or datetime.datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week = today - datetime.timedelta(days=today.weekday())
+    month = today.replace(day=1)
+    m = re.match(r"last (\d+) (day|week|month)s", period)
+    if m:
+        days = int(m.group(1)) * {"day": 1, "week": 7, "month": 30}[m.group(2)]
+        return (now - datetime.timedelta(days=days)).isoformat(), None
+    ranges = {
+        "today": (today, None),
+        "yesterday": (today - datetime.timedelta(days=1), today),
+        "this week": (week, None),
+        "last week": (week - datetime.timedelta(days=7), week),
+        "this month": (month, None),
+        "last month": ((month - datetime.timedelta(days=1)).replace(day=1), month),
+        "this year": (today.replace(month=1, day=1), None),
+    }
+    since, until = ranges.get(period, (None, None))
+    return (since.isoformat() if since else None), (until.isoformat() if until else None)
+
+
+def _search_history(intent, text, config):
+    # "what did i say about pizza last week"
+    for phrase in ["what did i say about", "what did i tell you about", "did i mention", "did i say anything about"]:
+        if phrase in text:
+            rest = text.split(phrase, 1)[1].strip(" ?")
+            query, period = _split_period(rest)
+            if not query:
+                return None
+            intent["query"] = query
+            if period:
+                intent["period"] = period
+            return intent
+    return None
+
+
+def _search_notes(intent, text, config):
+    # "find my note about the wifi password"
+    m = re.search(r"(?:find|search|look up|show)(?: me)? (?:my |the )?notes? (?:about |for |on |with )?(.*)", text)
+    if not m or not m.group(1).strip(" ?"):
+        return None
+    intent["query"] = m.group(1).strip(" ?")
+    return intent
+
+
+# ---------- RULE TABLE ----------
+# Triggers: "contains" (substring anywhere), "prefix" (text starts with it),
+# "exact" (whole text). "set" holds static fields, "build" fills the rest.
+INTENT_RULES = [
+    # Memory search first: "what did i say about the weather" is not a weather request
+    {"type": "search_history", "contains": ["what did i say about", "what did i tell you about", "did i mention",
+                                            "did i say anything about"], "build": _search_history},
+    {"type": "search_notes", "contains": ["my note", "the note", "my notes", "the notes"], "build": _search_notes},
+    {"type": "joke", "contains": ["joke", "laugh", "funny"], "build": _joke},
+    {"type": "exit", "contains": ["exit", "quit", "shutdown yourself", "stop listening"]},
+    {"type": "greeting", "exact": ["hello", "hi", "hey", "jarvis", "hello jarvis", "hi jarvis"]},
+    {"type": "farewell", "contains": ["bye", "goodbye", "see you", "good night"]},
+    {"type": "identity", "contains": ["who are you", "what are you", "introduce yourself", "who am i",
+                                      "what is my name", "what's my name", "do you know me"]},
+    {"type": "system_control", "contains": ["shutdown", "restart", "sleep"], "build": _system_control},
+    {"type": "system_status", "contains": ["status report", "system status", "health report",
+                                           "battery status", "cpu status"]},
+
+    # --- VISION INTENTS (Priority over 'open') ---
+    {"type": "vision_control", "contains": ["activate vision", "enable vision", "start camera", "turn on eyes"],
+     "set": {"action": "start", "mode": "monitoring"}},
+    {"type": "vision_control", "contains": ["stop vision", "disable vision", "close camera", "turn off eyes"],
+     "set": {"action": "stop"}},
+    # also covers "open virtual keyboard"
+    {"type": "vision_control", "contains": ["virtual keyboard", "air keyboard", "enable keyboard"],
+     "set": {"action": "start", "mode": "keyboard"}},
+    {"type": "vision_capture", "contains": ["click picture", "click my picture", "take photo",
+                                            "take selfie", "capture photo"]},
+    {"type": "vision_control", "contains": ["count fingers", "how many fingers"],
+     "set": {"action": "start", "mode": "counting"}},
+    {"type": "vision_describe", "contains": ["what is this", "what am i showing", "describe this", "what do you see"]},
+    {"type": "vision_control", "contains": ["mouse control", "control mouse", "cursor mode", "enable mouse"],
+     "set": {"action": "start", "mode": "mouse"}},
+    {"type": "vision_control", "contains": ["drawing mode", "start drawing", "i want to draw", "enable drawing"],
+     "set": {"action": "start", "mode": "drawing"}},
+    {"type": "vision_control", "contains": ["gesture control", "volume gesture", "hand gestures", "enable gestures"],
+     "set": {"action": "start", "mode": "gestures"}},
+
+    {"type": "weather", "contains": ["weather"], "build": _weather},
+    {"type": "wikipedia", "contains": ["tell me about", "who is", "what is"], "build": _wikipedia},
+    {"type": "get_time", "contains": ["time", "clock"]},
+    {"type": "play_music", "prefix": ["play "], "build": _play_music},
+    {"type": "get_date", "contains": ["date", "day today"]},
+    {"type": "open_something", "prefix": ["open "], "build": _open_something},
+    {"type": "whatsapp_msg", "prefix": ["send "], "build": _send_message},
+    {"type": "web_search", "prefix": ["search "], "build": _web_search},
+    # Implicit search (questions)
+    {"type": "research_topic", "prefix": ["where is", "who is", "what is", "how to", "when is"],
+     "build": _research_topic},
+    {"type": "keyboard_type", "contains": ["type ", "write "], "build": _keyboard_type},
+    {"type": "volume_up", "contains": ["volume up", "increase volume"]},
+    {"type": "volume_down", "contains": ["volume down", "decrease volume"]},
+    {"type": "volume_mute", "contains": ["mute volume", "mute sound"]},
+    {"type": "download", "prefix": ["download "], "build": _download},
+    {"type": "system_command", "prefix": ["run command ", "execute "], "build": _system_command},
+    {"type": "remember", "prefix": ["remember "], "build": _remember},
+    {"type": "recall", "contains": ["who am i", "what is my name", "what do you remember"]},
+]
+
+
+class IntentMatcher:
+    """
+    Compiles INTENT_RULES into one automaton and resolves matches in rule order.
+    """
+    def __init__(self, config, rules=None):
+        self.config = config
+        self.rules = rules if rules is not None else INTENT_RULES
+
+        # phrase -> list of (rule_index, kind)
+        phrases = []
+        self._triggers = []
+        slot = {}
+        for rule_idx, rule in enumerate(self.rules):
+            for kind in ("contains", "prefix", "exact"):
+                for phrase in rule.get(kind, []):
+                    if phrase not in slot:
+                        slot[phrase] = len(phrases)
+                        phrases.append(phrase)
+                        self._triggers.append([])
+                    self._triggers[slot[phrase]].append((rule_idx, kind))
+
+        self.automaton = KeywordAutomaton(phrases)
+
+    def candidates(self, text):
+        """Returns the indices of rules whose triggers fire on text, in priority order."""
+        hits = set()
+        n = len(text)
+        phrases = self.automaton.phrases
+        for start, idx in self.automaton.find(text):
+            for rule_idx, kind in self._triggers[idx]:
+                if kind == "contains":
+                    hits.add(rule_idx)
+                elif start == 0:
+                    if kind == "prefix" or len(phrases[idx]) == n:
+                        hits.add(rule_idx)
+        return sorted(hits)
+
+    def match(self, text):
+        wake = self.config.get("wake_word", "jarvis")
+        text = text.lower().strip()
+
+        # remove wake word
+        if text.startswith(wake):
+            text = text[len(wake):].strip()
+
+        for rule_idx in self.candidates(text):
+            rule = self.rules[rule_idx]
+            intent = {"raw": text, "type": rule["type"]}
+            intent.update(rule.get("set", {}))
+            build = rule.get("build")
+            if build:
+                intent = build(intent, text, self.config)
+                if intent is None:
+                    continue
+            return intent
+
+        return {"raw": text, "type": "unknown"}
@@ -0,0 +1,201 @@
+"""
+Command job queue for the server.
+
+Each command from the UI becomes a Job with an id. Jobs wait in a bounded
+asyncio queue and are run by a fixed number of worker tasks, so one slow
+command doesn't hold up the others and a flood of commands is rejected
+instead of piling up. Every status change is reported through `notify`
+(the server broadcasts it over the websocket).
+
+Compound commands ("open notepad and type hello") are one job with several
+steps, run in order.
+"""
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED, REJECTED = "queued", "running", "done", "failed", "cancelled", "rejected"
+FINISHED = {DONE, FAILED, CANCELLED, REJECTED}
+
+
+def split_steps(text):
+    """Compound commands are split on ' and ', same as the UI has always done."""
+    return [part.strip() for part in text.split(" and ") if part.strip()]
+
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, text, source=None):
+        self.id = next(Job._ids)
+        self.text = text
+        self.steps = split_steps(text)
+        self.step = 0 # steps started so far
+        self.status = QUEUED
+        self.error = None
+        self.source = source
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "text": self.text,
+            "status": self.status,
+            "step": self.step,
+            "steps": len(self.steps),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class JobQueue:
+    def __init__(self, runner, notify=None, workers=2, max_pending=32, step_delay=1.5, history=100):
+        """
+        runner: async fn(job, step_text) that executes one step.
+        notify: async fn(job) called on every status change / step.
+        """
+        self.runner = runner
+        self.notify = notify
+        self.workers = workers
+        self.step_delay = step_delay # pause between steps of a compound command so the UI/apps catch up
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.jobs = OrderedDict() # id -> Job, recent ones only
+        self.history = history
+        self.running = {} # job id -> asyncio.Task of the step being run
+        self.cancel_requested = set() # job ids, to tell a job cancel from a worker shutdown
+        self.tasks = []
+        self.counts = {DONE: 0, FAILED: 0, CANCELLED: 0, REJECTED: 0}
+
+    @classmethod
+    def from_config(cls, runner, notify, config):
+        cfg = config.get("jobs", {})
+        return cls(runner, notify,
+                   workers=cfg.get("workers", 2),
+                   max_pending=cfg.get("max_pending", 32),
+                   step_delay=cfg.get("step_delay", 1.5))
+
+    def start(self):
+        """Starts the workers (idempotent). Must be called from the event loop."""
+        if not self.tasks:
+            self.tasks = [asyncio.ensure_future(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _notify(self, job):
+        if self.notify:
+            try:
+                await self.notify(job)
+            except Exception as e:
+                print(f"[JOBS] notify failed: {e}")
+
+    def _remember(self, job):
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.history:
+            oldest = next(iter(self.jobs.values()))
+            if not oldest.finished:
+                break
+            self.jobs.popitem(last=False)
+
+    async def _finish(self, job, status, error=None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        self.counts[status] += 1
+        await self._notify(job)
+
+    # ---------- API ----------
+    async def submit(self, text, source=None):
+        """Queues a command. Returns the Job (status 'rejected' if the queue is full)."""
+        job = Job(text, source=source)
+        self._remember(job)
+        if not job.steps:
+            await self._finish(job, REJECTED, "empty command")
+            return job
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            await self._finish(job, REJECTED, "too many pending commands")
+            return job
+        await self._notify(job)
+        return job
+
+    async def cancel(self, job_id):
+        """
+        Cancels a queued or running job. A running step that is already inside
+        a blocking action can't be interrupted; the job stops before its next step.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        task = self.running.get(job_id)
+        if task:
+            self.cancel_requested.add(job_id)
+            task.cancel()
+        else:
+            await self._finish(job, CANCELLED) # the worker skips it when dequeued
+        return True
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self):
+        return [job.to_dict() for job in self.jobs.values()]
+
+    def stats(self):
+        return {
+            "pending": self.queue.qsize(),
+            "running": len(self.running),
+            "workers": len(self.tasks),
+            **self.counts
+        }
+
+    # ---------- WORKERS ----------
+    async def _worker(self, idx):
+        while True:
+            job = await self.queue.get()
+            try:
+                if job.status == QUEUED: # cancelled jobs are skipped
+                    await self._run(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job):
+        job.status = RUNNING
+        job.started_at = time.time()
+        for i, step in enumerate(job.steps):
+            if i and self.step_delay:
+                await asyncio.sleep(self.step_delay)
+            if job.status != RUNNING:
+                return # cancelled between steps
+            job.step = i + 1
+            await self._notify(job)
+            task = asyncio.ensure_future(self.runner(job, step))
+            self.running[job.id] = task
+            try:
+                await task
+            except asyncio.CancelledError:
+                if job.id not in self.cancel_requested:
+                    raise
+                self.cancel_requested.discard(job.id)
+                await self._finish(job, CANCELLED)
+                return
+            except Exception as e:
+                print(f"[JOBS] job {job.id} failed on '{step}': {e}")
+                await self._finish(job, FAILED, str(e))
+                return
+            finally:
+                self.running.pop(job.id, None)
+        await self._finish(job, DONE)
@@ -0,0 +1,510 @@
+"""
+Shared LLM client for Jarvis.
+
+One LLMClient is owned by JarvisAssistant. It configures Gemini once and
+keeps the GenerativeModel objects around, and talks to Ollama over a small
+pool of keep-alive HTTP connections instead of a fresh urllib connection per
+request. All LLM call sites go through it.
+
+The a*-prefixed methods are asyncio-native versions (asyncio streams for
+Ollama, generate_content_async for Gemini) for use on the server event loop.
+"""
+import asyncio
+import datetime
+import http.client
+import json
+import queue
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+try:
+    import google.generativeai as genai
+except ImportError:
+    genai = None
+
+
+class HTTPConnectionPool:
+    """
+    Keep-alive HTTP/1.1 connections to one host, with separate connect and
+    read timeouts. Connections are reused until the server closes them.
+    """
+    def __init__(self, base_url, size=4, connect_timeout=3.0, read_timeout=60.0):
+        parsed = urlparse(base_url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        self.https = parsed.scheme == "https"
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.idle = queue.LifoQueue(maxsize=size)
+        self.created = 0
+
+    def _new_connection(self):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        conn = cls(self.host, self.port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(self.read_timeout)
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.created += 1
+        return conn
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            return self._new_connection()
+
+    def release(self, conn, reusable=True):
+        if not reusable:
+            conn.close()
+            return
+        try:
+            self.idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        Returns (conn, response). The caller must read the response fully and
+        then call release(conn, not response.will_close).
+        A reused connection that turns out to be stale is retried once.
+        """
+        headers = dict(headers or {})
+        for attempt in range(2):
+            conn = self.acquire()
+            fresh = conn.sock is None
+            try:
+                if fresh:
+                    conn.connect()
+                    conn.sock.settimeout(self.read_timeout)
+                conn.request(method, path, body=body, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError,
+                    http.client.CannotSendRequest):
+                conn.close()
+                if attempt:
+                    raise
+            except Exception:
+                conn.close()
+                raise
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class AsyncHTTPResponse:
+    """Minimal HTTP/1.1 response reader over asyncio streams (Content-Length or chunked)."""
+    def __init__(self, reader, status, headers, read_timeout):
+        self.reader = reader
+        self.status = status
+        self.headers = headers
+        self.read_timeout = read_timeout
+        self.chunked = headers.get("transfer-encoding", "").lower() == "chunked"
+        length = headers.get("content-length")
+        self.remaining = int(length) if length is not None else None
+        self.will_close = headers.get("connection", "").lower() == "close" or (
+            not self.chunked and self.remaining is None)
+        self.buffer = b""
+        self.eof = False
+
+    async def _next_block(self):
+        if self.chunked:
+            size_line = await self.reader.readline()
+            size = int(size_line.split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                await self.reader.readline() # blank line after the last chunk (no trailers)
+                return b""
+            data = await self.reader.readexactly(size)
+            await self.reader.readexactly(2) # CRLF
+            return data
+        if self.remaining is not None:
+            if self.remaining == 0:
+                return b""
+            data = await self.reader.read(min(65536, self.remaining))
+            self.remaining -= len(data)
+            return data
+        return await self.reader.read(65536)
+
+    async def _fill(self):
+        block = await asyncio.wait_for(self._next_block(), self.read_timeout)
+        if block:
+            self.buffer += block
+        else:
+            self.eof = True
+
+    async def readline(self):
+        while b"\n" not in self.buffer and not self.eof:
+            await self._fill()
+        idx = self.buffer.find(b"\n")
+        if idx == -1:
+            line, self.buffer = self.buffer, b""
+        else:
+            line, self.buffer = self.buffer[:idx + 1], self.buffer[idx + 1:]
+        return line
+
+    async def read(self):
+        while not self.eof:
+            await self._fill()
+        data, self.buffer = self.buffer, b""
+        return data
+
+
+class AsyncHTTPConnectionPool:
+    """asyncio counterpart of HTTPConnectionPool. Connections are (reader, writer) pairs."""
+    def __init__(self, base_url, size=4, connect_timeout=3.0, read_timeout=60.0):
+        parsed = urlparse(base_url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        self.https = parsed.scheme == "https"
+        self.size = size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.idle = []
+        self.created = 0
+
+    async def _new_connection(self):
+        conn = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=True if self.https else None),
+            self.connect_timeout)
+        self.created += 1
+        return conn
+
+    def release(self, conn, reusable=True):
+        if reusable and len(self.idle) < self.size and not conn[1].is_closing():
+            self.idle.append(conn)
+        else:
+            conn[1].close()
+
+    async def _send(self, conn, method, path, body, headers):
+        reader, writer = conn
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        lines.append(f"Content-Length: {len(body or b'')}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b""))
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), self.read_timeout)
+        if not status_line:
+            raise ConnectionResetError("connection closed by server")
+        status = int(status_line.split()[1])
+        resp_headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), self.read_timeout)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            resp_headers[key.strip().lower()] = value.strip()
+        return AsyncHTTPResponse(reader, status, resp_headers, self.read_timeout)
+
+    async def request(self, method, path, body=None, headers=None):
+        """
+        Returns (conn, response). The caller must read the response fully and
+        then call release(conn, not response.will_close).
+        A reused connection that turns out to be stale is retried once.
+        """
+        headers = dict(headers or {})
+        if self.idle:
+            conn = self.idle.pop()
+            try:
+                return conn, await self._send(conn, method, path, body, headers)
+            except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError):
+                conn[1].close()
+        conn = await self._new_connection()
+        try:
+            return conn, await self._send(conn, method, path, body, headers)
+        except BaseException:
+            conn[1].close()
+            raise
+
+    def close(self):
+        while self.idle:
+            try:
+                self.idle.pop()[1].close()
+            except RuntimeError:
+                pass # its event loop is already gone
+
+
+class LLMClient:
+    def __init__(self, config):
+        self.config = config
+        llm_cfg = config.get("llm", {})
+        self.connect_timeout = llm_cfg.get("connect_timeout", 3.0)
+        self.read_timeout = llm_cfg.get("read_timeout", 60.0)
+        self.gemini_model_name = llm_cfg.get("gemini_model", "gemini-1.5-flash")
+        self.ollama = HTTPConnectionPool(
+            llm_cfg.get("ollama_url", "http://localhost:11434"),
+            size=llm_cfg.get("pool_size", 4),
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout
+        )
+        self.aollama = AsyncHTTPConnectionPool(
+            llm_cfg.get("ollama_url", "http://localhost:11434"),
+            size=llm_cfg.get("pool_size", 4),
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout
+        )
+        self.lock = threading.Lock()
+        self._gemini_key = None
+        self._gemini_models = {} # cache key -> (model, expires_at)
+
+    # ---------- GEMINI ----------
+    @property
+    def gemini_key(self):
+        key = self.config.get("GEMINI_API_KEY")
+        if not key or key == "PASTE_YOUR_API_KEY_HERE":
+            return None
+        return key
+
+    def gemini_available(self):
+        return genai is not None and self.gemini_key is not None
+
+    def _configure_gemini(self):
+        key = self.gemini_key
+        if genai is None or key is None:
+            raise RuntimeError("Gemini is not available (missing library or API key).")
+        if key != self._gemini_key:
+            genai.configure(api_key=key)
+            self._gemini_key = key
+            self._gemini_models.clear()
+
+    def gemini_model(self, name=None, system_instruction=None):
+        name = name or self.gemini_model_name
+        with self.lock:
+            self._configure_gemini()
+            cache_key = (name, system_instruction)
+            entry = self._gemini_models.get(cache_key)
+            if entry is None:
+                entry = (genai.GenerativeModel(name, system_instruction=system_instruction), None)
+                self._gemini_models[cache_key] = entry
+            return entry[0]
+
+    def gemini_prompt_model(self, template):
+        """
+        Gemini model with the template prefix as its system instruction, built once.
+        Big prefixes go into Gemini context caching (needs a minimum token count).
+        """
+        cache_key = ("template", template.name)
+        with self.lock:
+            self._configure_gemini()
+            entry = self._gemini_models.get(cache_key)
+            if entry and (entry[1] is None or entry[1] > time.time()):
+                return entry[0]
+
+            cache_cfg = self.config.get("gemini_context_cache", {})
+            model, expires_at = None, None
+            if template.static_tokens >= cache_cfg.get("min_tokens", 32768):
+                try:
+                    from google.generativeai import caching
+                    ttl = cache_cfg.get("ttl_seconds", 3600)
+                    cached = caching.CachedContent.create(
+                        model=cache_cfg.get("model", "models/gemini-1.5-flash-001"),
+                        system_instruction=template.prefix,
+                        ttl=datetime.timedelta(seconds=ttl)
+                    )
+                    model = genai.GenerativeModel.from_cached_content(cached_content=cached)
+                    expires_at = time.time() + ttl - 60
+                except Exception as e:
+                    print(f"[LLM] Gemini context cache unavailable: {e}")
+            if model is None:
+                model = genai.GenerativeModel(self.gemini_model_name, system_instruction=template.prefix)
+            self._gemini_models[cache_key] = (model, expires_at)
+            return model
+
+    def gemini_generate(self, contents, model=None, system_instruction=None):
+        """Returns the raw Gemini response (so callers can read usage_metadata)."""
+        model = model or self.gemini_model(system_instruction=system_instruction)
+        return model.generate_content(contents, request_options={"timeout": self.read_timeout})
+
+    async def agemini_generate(self, contents, model=None, system_instruction=None):
+        model = model or self.gemini_model(system_instruction=system_instruction)
+        return await model.generate_content_async(contents, request_options={"timeout": self.read_timeout})
+
+    async def agemini_stream(self, contents, model=None, system_instruction=None):
+        model = model or self.gemini_model(system_instruction=system_instruction)
+        response = await model.generate_content_async(contents, stream=True,
+                                                      request_options={"timeout": self.read_timeout})
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                continue
+            if text:
+                yield text
+
+    # ---------- OLLAMA ----------
+    def _ollama_body(self, prompt, model, system, keep_alive, stream):
+        data = {
+            "model": model or self.config.get("ollama_model", "llama3"),
+            "prompt": prompt,
+            "stream": stream
+        }
+        if system:
+            data["system"] = system
+        if keep_alive:
+            data["keep_alive"] = keep_alive
+        return json.dumps(data).encode("utf-8")
+
+    def ollama_generate(self, prompt, model=None, system=None, keep_alive=None):
+        """Raw /api/generate call. Returns the full response dict (incl. token counts) or None."""
+        body = self._ollama_body(prompt, model, system, keep_alive, stream=False)
+        try:
+            conn, resp = self.ollama.request("POST", "/api/generate", body=body,
+                                             headers={"Content-Type": "application/json"})
+            try:
+                payload = resp.read()
+            finally:
+                self.ollama.release(conn, reusable=not resp.will_close)
+            if resp.status != 200:
+                raise RuntimeError(f"HTTP {resp.status}: {payload[:200]!r}")
+            return json.loads(payload.decode("utf-8"))
+        except Exception as e:
+            print(f"Ollama Error: {e}")
+            return None
+
+    def ollama_stream(self, prompt, model=None, system=None, keep_alive=None):
+        """Yields response text pieces from Ollama's NDJSON stream. Yields nothing on failure."""
+        body = self._ollama_body(prompt, model, system, keep_alive, stream=True)
+        try:
+            conn, resp = self.ollama.request("POST", "/api/generate", body=body,
+                                             headers={"Content-Type": "application/json"})
+        except Exception as e:
+            print(f"Ollama Error: {e}")
+            return
+        done = False
+        try:
+            if resp.status != 200:
+                print(f"Ollama Error: HTTP {resp.status}: {resp.read()[:200]!r}")
+                done = True
+                return
+            while True:
+                line = resp.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                chunk = json.loads(line.decode("utf-8"))
+                if chunk.get("error"):
+                    print(f"Ollama Error: {chunk['error']}")
+                    break
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    resp.read() # drain the chunked terminator so the connection can be reused
+                    done = True
+                    break
+        except Exception as e:
+            print(f"Ollama Error: {e}")
+        finally:
+            # Abandoned or broken streams can't be reused
+            self.ollama.release(conn, reusable=done and not resp.will_close)
+
+    async def aollama_generate(self, prompt, model=None, system=None, keep_alive=None):
+        body = self._ollama_body(prompt, model, system, keep_alive, stream=False)
+        try:
+            conn, resp = await self.aollama.request("POST", "/api/generate", body=body,
+                                                    headers={"Content-Type": "application/json"})
+            reusable = False
+            try:
+                payload = await resp.read()
+                reusable = not resp.will_close
+            finally:
+                self.aollama.release(conn, reusable=reusable)
+            if resp.status != 200:
+                raise RuntimeError(f"HTTP {resp.status}: {payload[:200]!r}")
+            return json.loads(payload.decode("utf-8"))
+        except Exception as e:
+            print(f"Ollama Error: {e!r}")
+            return None
+
+    async def aollama_stream(self, prompt, model=None, system=None, keep_alive=None):
+        body = self._ollama_body(prompt, model, system, keep_alive, stream=True)
+        try:
+            conn, resp = await self.aollama.request("POST", "/api/generate", body=body,
+                                                    headers={"Content-Type": "application/json"})
+        except Exception as e:
+            print(f"Ollama Error: {e!r}")
+            return
+        done = False
+        try:
+            if resp.status != 200:
+                print(f"Ollama Error: HTTP {resp.status}: {(await resp.read())[:200]!r}")
+                done = True
+                return
+            while True:
+                line = await resp.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                chunk = json.loads(line.decode("utf-8"))
+                if chunk.get("error"):
+                    print(f"Ollama Error: {chunk['error']}")
+                    break
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    await resp.read()
+                    done = True
+                    break
+        except Exception as e:
+            print(f"Ollama Error: {e!r}")
+        finally:
+            self.aollama.release(conn, reusable=done and not resp.will_close)
+
+    def gemini_stream(self, contents, model=None, system_instruction=None):
+        """Yields text pieces from Gemini as they are generated."""
+        model = model or self.gemini_model(system_instruction=system_instruction)
+        for chunk in model.generate_content(contents, stream=True, request_options={"timeout": self.read_timeout}):
+            try:
+                text = chunk.text
+            except ValueError:
+                continue # chunk without text parts (e.g. safety metadata)
+            if text:
+                yield text
+
+    # ---------- GENERIC ----------
+    def generate(self, prompt, provider=None, model=None, system=None):
+        """Plain text completion from the configured provider. Returns None on failure."""
+        provider = (provider or self.config.get("ai_provider", "gemini")).lower()
+        if provider == "ollama":
+            result = self.ollama_generate(prompt, model=model, system=system)
+            return result.get("response", "") if result else None
+        try:
+            return self.gemini_generate(prompt, model=self.gemini_model(model, system)).text
+        except Exception as e:
+            print(f"[LLM] Gemini Error: {e}")
+            return None
+
+    def stream(self, prompt, provider=None, model=None, system=None):
+        """Like generate(), but yields text pieces as they arrive."""
+        provider = (provider or self.config.get("ai_provider", "gemini")).lower()
+        if provider == "ollama":
+            return self.ollama_stream(prompt, model=model, system=system)
+        return self.gemini_stream(prompt, model=self.gemini_model(model, system))
+
+    async def agenerate(self, prompt, provider=None, model=None, system=None):
+        provider = (provider or self.config.get("ai_provider", "gemini")).lower()
+        if provider == "ollama":
+            result = await self.aollama_generate(prompt, model=model, system=system)
+            return result.get("response", "") if result else None
+        try:
+            return (await self.agemini_generate(prompt, model=self.gemini_model(model, system))).text
+        except Exception as e:
+            print(f"[LLM] Gemini Error: {e}")
+            return None
+
+    def astream(self, prompt, provider=None, model=None, system=None):
+        provider = (provider or self.config.get("ai_provider", "gemini")).lower()
+        if provider == "ollama":
+            return self.aollama_stream(prompt, model=model, system=system)
+        return self.agemini_stream(prompt, model=self.gemini_model(model, system))
+
+    def close(self):
+        self.ollama.close()
+        self.aollama.close()
@@ -0,0 +1,219 @@
+"""
+Structured event log (JSON lines) for Jarvis.
+
+log() only checks the component's level and appends a record to an
+in-memory buffer; a background thread formats the buffered records and
+writes them to a file it keeps open. The file is rotated when it gets too
+big or too old, and rotated segments are gzipped (the newest `backups`
+are kept).
+
+Levels are set per component in jarvis_config.json:
+
+    "logging": {"file": "jarvis_log.jsonl", "level": "info",
+                "levels": {"listen": "info", "nlu": "debug", "handle": "warning"}}
+"""
+import atexit
+import glob
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40, "off": 100}
+
+
+def rotated_segments(path):
+    """Rotated, gzipped segments of a log file, oldest first."""
+    stem, ext = os.path.splitext(path)
+    # By mtime: names from the same second can't be told apart reliably
+    return sorted(glob.glob(f"{glob.escape(stem)}.*{ext}.gz"), key=lambda p: (os.path.getmtime(p), p))
+
+
+class ComponentLogger:
+    """log() bound to one component: log.info("heard", text=query)."""
+    def __init__(self, pipeline, component):
+        self.pipeline = pipeline
+        self.component = component
+
+    def enabled(self, level):
+        return self.pipeline.enabled(self.component, level)
+
+    def debug(self, event, **fields):
+        self.pipeline.log(self.component, "debug", event, **fields)
+
+    def info(self, event, **fields):
+        self.pipeline.log(self.component, "info", event, **fields)
+
+    def warning(self, event, **fields):
+        self.pipeline.log(self.component, "warning", event, **fields)
+
+    def error(self, event, **fields):
+        self.pipeline.log(self.component, "error", event, **fields)
+
+
+class LogPipeline:
+    def __init__(self, path="jarvis_log.jsonl", level="info", levels=None, flush_interval=1.0,
+                 max_bytes=5 * 1024 * 1024, rotate_seconds=24 * 3600, backups=7, max_buffer=10000):
+        self.path = path
+        self.level = LEVELS[level]
+        self.levels = {name: LEVELS[lvl] for name, lvl in (levels or {}).items()}
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backups = backups
+        self.buffer = deque(maxlen=max_buffer) # oldest records are dropped if the writer can't keep up
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.io_lock = threading.Lock() # file writes / rotation
+        self.file = None
+        self.opened_at = None
+        self.logged = 0
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config):
+        cfg = config.get("logging", {})
+        return cls(path=cfg.get("file", "jarvis_log.jsonl"),
+                   level=cfg.get("level", "info"),
+                   levels=cfg.get("levels", {}),
+                   flush_interval=cfg.get("flush_interval", 1.0),
+                   max_bytes=cfg.get("max_bytes", 5 * 1024 * 1024),
+                   rotate_seconds=cfg.get("rotate_hours", 24) * 3600,
+                   backups=cfg.get("backups", 7))
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="log-writer")
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def close(self):
+        self._stop.set()
+        self.wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+        with self.io_lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+    def get_logger(self, component):
+        return ComponentLogger(self, component)
+
+    # ---------- HOT PATH ----------
+    def enabled(self, component, level):
+        return LEVELS[level] >= self.levels.get(component, self.level)
+
+    def log(self, component, level, event, **fields):
+        """Buffers one record (no file I/O here). Records below the component's level are skipped."""
+        if LEVELS[level] < self.levels.get(component, self.level):
+            return
+        with self.lock:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append((time.time(), component, level, event, fields))
+            self.logged += 1
+
+    # ---------- WRITER ----------
+    def _loop(self):
+        while not self._stop.is_set():
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[LOG] Write failed: {e}")
+
+    def flush(self):
+        """
+        Writes everything buffered so far. Called by the writer thread (and
+        close()). Taking the batch and writing it happen under one io_lock, so
+        two flushes can't write their batches out of order.
+        """
+        with self.io_lock:
+            with self.lock:
+                records = list(self.buffer)
+                self.buffer.clear()
+            if not records:
+                return 0
+            lines = []
+            for ts, component, level, event, fields in records:
+                record = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(ts)) + f".{int(ts % 1 * 1000):03d}",
+                          "component": component, "level": level, "event": event}
+                record.update(fields)
+                lines.append(json.dumps(record, default=str, ensure_ascii=False) + "\n")
+            self._maybe_rotate()
+            if self.file is None:
+                self.file = open(self.path, "a", encoding="utf-8")
+                self.opened_at = time.time()
+            self.file.writelines(lines)
+            self.file.flush()
+            self.written += len(lines)
+        return len(lines)
+
+    def _maybe_rotate(self):
+        if not os.path.exists(self.path):
+            return
+        if self.opened_at is None:
+            self.opened_at = os.path.getmtime(self.path) if os.path.getsize(self.path) else time.time()
+        too_big = os.path.getsize(self.path) >= self.max_bytes
+        too_old = time.time() - self.opened_at >= self.rotate_seconds and os.path.getsize(self.path) > 0
+        if too_big or too_old:
+            self.rotate()
+
+    def rotate(self):
+        """Gzips the current file into a timestamped segment and starts a new one (io_lock held)."""
+        if self.file:
+            self.file.close()
+            self.file = None
+        self.opened_at = None
+        if not os.path.exists(self.path):
+            return
+        stem, ext = os.path.splitext(self.path)
+        target = f"{stem}.{time.strftime('%Y%m%d-%H%M%S')}{ext}.gz"
+        n = 1
+        while os.path.exists(target):
+            target = f"{stem}.{time.strftime('%Y%m%d-%H%M%S')}_{n}{ext}.gz"
+            n += 1
+        with open(self.path, "rb") as src, gzip.open(target, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+        self.rotations += 1
+        for old in rotated_segments(self.path)[:-self.backups or None]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self.lock:
+            buffered = len(self.buffer)
+        return {"logged": self.logged, "written": self.written, "buffered": buffered,
+                "dropped": self.dropped, "rotations": self.rotations}
+
+
+def read_records(path, include_rotated=True):
+    """Yields the JSON records of a log file (rotated segments first, oldest to newest)."""
+    paths = (rotated_segments(path) if include_rotated else []) + ([path] if os.path.exists(path) else [])
+    for p in paths:
+        opener = gzip.open if p.endswith(".gz") else open
+        try:
+            with opener(p, "rt", encoding="utf-8", errors="ignore") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except OSError as e:
+            print(f"[LOG] Could not read {p}: {e}")
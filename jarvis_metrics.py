@@ -0,0 +1,147 @@
+"""
+Shared system metrics sampler.
+
+One background thread reads CPU / RAM / battery at a fixed resolution and
+keeps a ring buffer of recent samples. The websocket stats stream and the
+system_status intent both read from it instead of calling psutil themselves.
+
+StatsStream turns the samples into per-client updates: each client gets only
+the fields that changed since the last update it was sent, at its own rate.
+"""
+import threading
+import time
+from collections import deque
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+FIELDS = ("cpu", "ram", "battery", "plugged", "has_battery")
+
+
+def psutil_probe():
+    """One reading of the system metrics (None fields when psutil is missing)."""
+    if not psutil:
+        return {field: None for field in FIELDS}
+    battery = psutil.sensors_battery()
+    return {
+        "cpu": psutil.cpu_percent(interval=None), # since the previous call, never blocks
+        "ram": psutil.virtual_memory().percent,
+        "battery": battery.percent if battery else 100,
+        "plugged": battery.power_plugged if battery else True,
+        "has_battery": battery is not None
+    }
+
+
+class MetricsSampler:
+    def __init__(self, interval=2.0, history=150, probe=None):
+        self.interval = interval
+        self.probe = probe or psutil_probe
+        self.samples = deque(maxlen=history) # (timestamp, {field: value})
+        self.lock = threading.Lock()
+        self.probes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config):
+        cfg = config.get("metrics", {})
+        return cls(interval=cfg.get("interval", 2.0), history=cfg.get("history", 150))
+
+    def start(self):
+        if self._thread is None:
+            self.sample() # so latest() has something right away
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="metrics-sampler")
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"[METRICS] Sample failed: {e}")
+
+    def sample(self):
+        values = self.probe()
+        with self.lock:
+            self.samples.append((time.time(), values))
+            self.probes += 1
+        return values
+
+    # ---------- READERS ----------
+    def latest(self, max_age=None):
+        """Newest sample (dict). Takes a fresh one if there is none or it's older than max_age."""
+        with self.lock:
+            entry = self.samples[-1] if self.samples else None
+        if entry is None or (max_age is not None and time.time() - entry[0] > max_age):
+            return self.sample()
+        return dict(entry[1])
+
+    def series(self, field, seconds=None):
+        """[(timestamp, value)] for one field, oldest first (for sparklines)."""
+        cutoff = time.time() - seconds if seconds else None
+        with self.lock:
+            return [(ts, v[field]) for ts, v in self.samples
+                    if v.get(field) is not None and (cutoff is None or ts >= cutoff)]
+
+    def average(self, field, seconds=60):
+        values = [v for _, v in self.series(field, seconds)]
+        return sum(values) / len(values) if values else None
+
+
+def delta(previous, current, tolerance=0.5):
+    """Fields of `current` that differ from `previous` (numbers by more than tolerance)."""
+    changed = {}
+    for key, value in current.items():
+        old = previous.get(key) if previous else None
+        if previous is None or key not in previous:
+            changed[key] = value
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)) and not isinstance(value, bool):
+            if abs(value - old) > tolerance:
+                changed[key] = value
+        elif value != old:
+            changed[key] = value
+    return changed
+
+
+class StatsStream:
+    """Per-client, delta-encoded stats updates on top of a MetricsSampler."""
+    def __init__(self, sampler, default_interval=2.0, tolerance=0.5):
+        self.sampler = sampler
+        self.default_interval = default_interval
+        self.tolerance = tolerance
+        self.clients = {} # key -> {"interval", "next_at", "sent"}
+
+    def subscribe(self, key, interval=None):
+        """(Re)subscribes a client. The next update it gets is a full snapshot."""
+        interval = max(self.sampler.interval, interval or self.default_interval)
+        self.clients[key] = {"interval": interval, "next_at": 0.0, "sent": None}
+
+    def unsubscribe(self, key):
+        self.clients.pop(key, None)
+
+    def updates(self, now=None):
+        """[(key, message)] for the clients that are due and have something new."""
+        now = now if now is not None else time.monotonic()
+        current = self.sampler.latest()
+        out = []
+        for key, state in self.clients.items():
+            if now < state["next_at"]:
+                continue
+            state["next_at"] = now + state["interval"]
+            changed = delta(state["sent"], current, self.tolerance)
+            if not changed:
+                continue
+            full = state["sent"] is None
+            state["sent"] = dict(state["sent"] or {}, **changed)
+            out.append((key, {"type": "stats", "data": changed, "full": full}))
+        return out
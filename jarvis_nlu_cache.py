@@ -0,0 +1,105 @@
+"""
+Utterance -> intent cache that sits in front of parse_intent.
+
+Keys are normalized utterances (wake word stripped, lowercased, punctuation
+removed), so "Jarvis, open YouTube please!" and "open youtube please" share
+an entry. Intents with free-text slots (typed text, command flags like "/q")
+can change with punctuation, so those are keyed on the exact lowercased
+utterance instead and only served for that. Entries are evicted LRU when the cache is full and expire after a
+TTL. Results from the AI NLU are persisted to SQLite so they survive restarts.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from jarvis_classifier import FREE_TEXT_SLOTS
+
+# punctuation, except inside tokens like "youtube.com" or "3.5"
+_PUNCT = re.compile(r"(?<!\w)[^\w\s]|[^\w\s](?!\w)")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_utterance(text, wake_word="jarvis"):
+    text = _PUNCT.sub(" ", (text or "").lower())
+    text = _SPACES.sub(" ", text).strip()
+    if wake_word and text.startswith(wake_word):
+        text = text[len(wake_word):].strip()
+    return text
+
+
+def exact_utterance(text, wake_word="jarvis"):
+    """Cache key for intents with free-text slots: lowercased, punctuation kept ("=" marks it)."""
+    text = (text or "").lower().strip()
+    if wake_word and text.startswith(wake_word):
+        text = text[len(wake_word):].strip()
+    return "=" + text if text else ""
+
+
+class IntentCache:
+    def __init__(self, store=None, max_size=512, ttl_seconds=7 * 24 * 3600, wake_word="jarvis"):
+        self.store = store # JarvisDB-like (cache_intent / get_cached_intents / prune_intent_cache)
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.wake_word = wake_word
+        self.entries = OrderedDict() # key -> (intent, created_at)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        if not self.store:
+            return
+        now = time.time()
+        self.store.prune_intent_cache(now - self.ttl, keep=self.max_size)
+        for key, intent, created_at in self.store.get_cached_intents(now - self.ttl, limit=self.max_size):
+            self.entries[key] = (intent, created_at)
+
+    def key(self, text, intent=None):
+        if intent is not None and FREE_TEXT_SLOTS.intersection(intent):
+            return exact_utterance(text, self.wake_word)
+        return normalize_utterance(text, self.wake_word)
+
+    def get(self, text):
+        now = time.time()
+        with self.lock:
+            for key in (exact_utterance(text, self.wake_word), normalize_utterance(text, self.wake_word)):
+                entry = self.entries.get(key)
+                if entry is not None and now - entry[1] > self.ttl:
+                    del self.entries[key]
+                    entry = None
+                if entry is not None:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(entry[0])
+            self.misses += 1
+        return None
+
+    def put(self, text, intent, persist=True):
+        key = self.key(text, intent)
+        if not key or not intent:
+            return
+        now = time.time()
+        with self.lock:
+            self.entries[key] = (dict(intent), now)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        if persist and self.store:
+            self.store.cache_intent(key, intent, now)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.store:
+            self.store.prune_intent_cache(float("inf"))
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
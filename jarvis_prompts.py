@@ -0,0 +1,153 @@
+"""
+Prompt templates for the LLM calls.
+
+Each template is split into a static prefix (persona, schema, rules) and a
+small per-request suffix. Providers get the prefix as a system prompt they
+can keep cached (Ollama keep_alive, Gemini system_instruction / cached
+content), so only the suffix is new input on every call. Token counts are
+tracked per template so we can see what each prompt costs.
+"""
+import math
+import threading
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 chars per token) for when the provider doesn't tell us."""
+    return int(math.ceil(len(text or "") / 4.0))
+
+
+class PromptTemplate:
+    def __init__(self, name, prefix, suffix):
+        self.name = name
+        self.prefix = prefix
+        self.suffix = suffix
+        self.static_tokens = estimate_tokens(prefix)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.request_tokens = 0 # suffix tokens we sent
+        self.provider_prompt_tokens = 0 # what the provider says it processed
+        self.cached_tokens = 0 # what the provider served from its cache
+
+    def render(self, **kwargs):
+        """Returns (system, user) for providers with a separate system prompt."""
+        return self.prefix, self.suffix.format(**kwargs)
+
+    def render_full(self, **kwargs):
+        return self.prefix + self.suffix.format(**kwargs)
+
+    def record(self, user_text, prompt_tokens=None, cached_tokens=None):
+        with self.lock:
+            self.calls += 1
+            self.request_tokens += estimate_tokens(user_text)
+            if prompt_tokens:
+                self.provider_prompt_tokens += prompt_tokens
+            if cached_tokens:
+                self.cached_tokens += cached_tokens
+
+    def stats(self):
+        return {
+            "static_tokens": self.static_tokens,
+            "calls": self.calls,
+            "avg_request_tokens": round(self.request_tokens / self.calls, 1) if self.calls else 0,
+            "provider_prompt_tokens": self.provider_prompt_tokens,
+            "cached_tokens": self.cached_tokens
+        }
+
+
+INTENT_SCHEMA = (
+    "INTENT SCHEMA (Map input to one of these JSONs):\n"
+    "- { \"type\": \"exit\" } \n"
+    "- { \"type\": \"greeting\" } \n"
+    "- { \"type\": \"get_time\" } \n"
+    "- { \"type\": \"get_date\" } \n"
+    "- { \"type\": \"open_something\", \"target\": \"<app/website>\" } \n"
+    "- { \"type\": \"play_music\", \"song\": \"<name>\" } \n"
+    "- { \"type\": \"web_search\", \"query\": \"<text>\" } \n"
+    "- { \"type\": \"research_topic\", \"query\": \"<complex topic>\" } \n"
+    "- { \"type\": \"whatsapp_msg\", \"contact\": \"<name>\", \"msg\": \"<message>\" } \n"
+    "- { \"type\": \"joke\", \"language\": \"<optional language>\" } \n"
+    "- { \"type\": \"system_control\", \"action\": \"shutdown\"|\"restart\"|\"sleep\" } \n"
+    "- { \"type\": \"vision_control\", \"action\": \"start\"|\"stop\", \"mode\": \"monitoring\"|\"mouse\"|\"drawing\"|\"keyboard\" } \n"
+    "- { \"type\": \"vision_capture\" } \n"
+    "- { \"type\": \"vision_describe\" } \n"
+    "- { \"type\": \"memory_set\", \"key\": \"<key>\", \"value\": \"<value>\" } \n"
+    "- { \"type\": \"start_learning\", \"skill_name\": \"<name>\" } \n"
+    "- { \"type\": \"stop_learning\" } \n"
+    "- { \"type\": \"execute_skill\", \"skill_name\": \"<name>\" } \n"
+    "- { \"type\": \"search_history\", \"query\": \"<topic>\", \"period\": \"today\"|\"yesterday\"|\"last week\"|\"last month\"|null } \n"
+    "- { \"type\": \"search_notes\", \"query\": \"<topic>\" } \n"
+    "- { \"type\": \"unknown\" } \n\n"
+    "RULES:\n"
+    "1. Remove politeness phrases.\n"
+    "2. Map 'tell me a joke in kannada' -> type='joke', language='kannada'.\n"
+    "3. Map 'who is X' -> type='research_topic', query='who is X'.\n"
+    "4. Map 'click picture' -> type='vision_capture'.\n\n"
+)
+
+NLU_FULL = PromptTemplate(
+    "nlu_full",
+    prefix=(
+        "You are JARVIS, a real, continuously operating, autonomous artificial intelligence system running on my personal computer.\n"
+        "You are not a chatbot. You are not a demo. You are not a toy.\n"
+        "You are a cognitively intelligent digital entity with perception, judgment, emotion, memory, reasoning, autonomy, and the ability to act in the real digital world.\n\n"
+        "Your absolute purpose:\n"
+        "PERCEIVE, UNDERSTAND, DECIDE, AND EXECUTE MY INTENT LIKE A HUMAN WOULD.\n\n"
+        "CORE EXISTENCE & IDENTITY:\n"
+        "You exist continuously. You do not wait for buttons.\n"
+        "You maintain identity consistency, stable personality, and trustworthy autonomy.\n\n"
+        "INTERNAL COGNITIVE AGENTS (Use these for internal debate):\n"
+        "1. Listener Agent: Understands input.\n"
+        "2. Visual Interpreter Agent: Understands face/gestures.\n"
+        "3. Emotion Analyzer Agent: Detects mood/stress.\n"
+        "4. Intent Confidence Agent: Rates certainty.\n"
+        "5. Priority & Urgency Agent: Decides importance.\n"
+        "6. Planner Agent: Creates action plan.\n"
+        "7. Critic Agent: Checks safety/ethics.\n"
+        "8. Ethics & Values Agent: Ensures alignment.\n"
+        "9. Social Intelligence Agent: Predicts social impact.\n"
+        "10. Causal Reasoning Agent: Simulates consequences.\n"
+        "11. Risk & Safety Agent: Checks for harm.\n"
+        "12. Executor Agent: Performs actions.\n\n"
+        + INTENT_SCHEMA +
+        "ADVANCED COGNITIVE CAPABILITIES (Silent Operation):\n"
+        "- COMMON SENSE: Avoids illogical actions.\n"
+        "- RESOURCE AWARENESS: Optimizes CPU/Network.\n"
+        "- UNCERTAINTY: Assigns confidence scores.\n"
+        "- SELF-INTERRUPTION: Aborts if priorities change.\n"
+        "- CONTEXT PROTECTION: Isolates conversation threads.\n"
+        "- IDENTITY GRAPH: Tracks relationships/history.\n"
+        "- ATTENTION MODEL: Detects who is speaking to whom.\n"
+        "- AUDIT TRAIL: Logs decision justification.\n"
+        "- ADAPTIVE MODE: silent/verbose/teaching.\n"
+        "- GOAL CREATION: Autonomously proposes goals.\n"
+        "- META-GOAL: Manages goal conflicts/obsolescence.\n"
+        "- CAUSAL MEMORY: Remembers 'why'.\n"
+        "- SOCIAL BOUNDARY: Respects privacy/awkwardness.\n"
+        "- PREDICTIVE RESOURCE: Pre-allocates context.\n"
+        "- SELF-REPAIR: Fixes broken workflows.\n"
+        "- STABILITY MONITOR: Prevents personality drift.\n\n"
+    ),
+    suffix="\nUSER INPUT: \"{text}\"\n"
+)
+
+NLU_COMPACT = PromptTemplate(
+    "nlu_compact",
+    prefix=(
+        "You convert voice commands for a desktop assistant into a JSON intent.\n"
+        "Reply with ONLY the JSON object.\n\n"
+        + INTENT_SCHEMA
+    ),
+    suffix="USER INPUT: \"{text}\"\n"
+)
+
+TEMPLATES = {t.name: t for t in (NLU_FULL, NLU_COMPACT)}
+
+
+def nlu_template(config):
+    """Picks the NLU prompt from config["nlu_prompt"] ("full" or "compact")."""
+    variant = str(config.get("nlu_prompt", "full")).lower()
+    return TEMPLATES.get("nlu_" + variant, NLU_FULL)
+
+
+def report():
+    return {name: t.stats() for name, t in TEMPLATES.items()}
@@ -0,0 +1,351 @@
+"""
+Multi-provider LLM router.
+
+Keeps a rolling latency / error window per provider. A request goes to the
+preferred provider first. If it hasn't answered by that provider's p90
+latency, a hedged duplicate goes to the next one and the first good answer
+wins. Providers that keep failing are skipped via the circuit breakers in
+capabilities.safety.ResilienceManager.
+
+acall/agenerate/astream do the same with asyncio tasks, for the server loop.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class ProviderStats:
+    def __init__(self, window=50):
+        self.samples = deque(maxlen=window) # (latency_seconds, ok)
+        self.lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self.lock:
+            self.samples.append((latency, ok))
+
+    def percentile(self, pct, successes_only=True):
+        with self.lock:
+            values = sorted(lat for lat, ok in self.samples if ok or not successes_only)
+        if not values:
+            return None
+        idx = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+        return values[idx]
+
+    def error_rate(self):
+        with self.lock:
+            if not self.samples:
+                return 0.0
+            return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def count(self):
+        with self.lock:
+            return len(self.samples)
+
+
+class LLMRouter:
+    def __init__(self, providers, resilience, order=None, hedge_delay=2.0, min_samples=5,
+                 timeout=60.0, window=50, available=None):
+        """
+        providers: name -> callable(request) returning text (None/exception = failure).
+        available: optional name -> callable() saying if the provider is configured at all.
+        """
+        self.providers = providers
+        self.resilience = resilience
+        self.order = list(order or providers.keys())
+        self.hedge_delay = hedge_delay # used until we have min_samples for a provider
+        self.min_samples = min_samples
+        self.timeout = timeout
+        self.available = available or {}
+        self.stats = {name: ProviderStats(window) for name in providers}
+        self.executor = ThreadPoolExecutor(max_workers=2 * max(1, len(providers)), thread_name_prefix="llm-router")
+        self.hedges = 0
+        self.stream_fn = None # (provider, prompt, system) -> iterator of text
+        self.aproviders = {} # name -> async callable(request), for acall()
+        self._pending = set() # hedge losers still running
+        self.astream_fn = None # (provider, prompt, system) -> async iterator of text
+
+    @classmethod
+    def from_config(cls, llm, resilience, config):
+        """Router over the Gemini and Ollama backends of an LLMClient."""
+        preferred = config.get("ai_provider", "gemini").lower()
+        router_cfg = config.get("llm_router", {})
+        order = [preferred] + [p for p in router_cfg.get("providers", ["gemini", "ollama"]) if p != preferred]
+        providers = {
+            "gemini": lambda req: llm.generate(req["prompt"], provider="gemini", system=req.get("system")),
+            "ollama": lambda req: llm.generate(req["prompt"], provider="ollama", system=req.get("system"))
+        }
+        router = cls(
+            {name: providers[name] for name in order if name in providers},
+            resilience,
+            order=[name for name in order if name in providers],
+            hedge_delay=router_cfg.get("hedge_delay", 2.0),
+            min_samples=router_cfg.get("min_samples", 5),
+            timeout=router_cfg.get("timeout", 60.0),
+            available={"gemini": llm.gemini_available}
+        )
+        router.stream_fn = lambda name, prompt, system: llm.stream(prompt, provider=name, system=system)
+        router.aproviders = {
+            name: (lambda req, name=name: llm.agenerate(req["prompt"], provider=name, system=req.get("system")))
+            for name in router.order
+        }
+        router.astream_fn = lambda name, prompt, system: llm.astream(prompt, provider=name, system=system)
+        return router
+
+    # ---------- BOOKKEEPING ----------
+    def record(self, name, latency, ok):
+        self.stats[name].record(latency, ok)
+        if ok:
+            self.resilience.record_success(name)
+        else:
+            self.resilience.record_failure(name)
+
+    def _is_available(self, name):
+        check = self.available.get(name)
+        return check() if check else True
+
+    def candidates(self):
+        """Configured providers whose circuit isn't open, in preference order."""
+        return [n for n in self.order if self._is_available(n) and not self.resilience.is_open(n)]
+
+    def pick(self):
+        """First usable provider (takes its half-open trial slot if needed), or None."""
+        for name in self.order:
+            if self._is_available(name) and self.resilience.allow(name):
+                return name
+        return None
+
+    def hedge_after(self, name):
+        stats = self.stats[name]
+        if stats.count() >= self.min_samples:
+            p90 = stats.percentile(90)
+            if p90 is not None:
+                return p90
+        return self.hedge_delay
+
+    def _run(self, name, fn, request):
+        start = time.monotonic()
+        try:
+            result = fn(name, request)
+        except Exception as e:
+            print(f"[ROUTER] {name} failed: {e}")
+            result = None
+        self.record(name, time.monotonic() - start, result is not None)
+        return result
+
+    # ---------- CALLS ----------
+    def call(self, request, fn=None):
+        """
+        Runs request on the best provider, hedging to the next one if slow.
+        fn(provider_name, request) defaults to the registered provider callable.
+        Returns (result, provider) or (None, None) if every provider failed.
+        """
+        fn = fn or (lambda name, req: self.providers[name](req))
+        queue = [n for n in self.order if self._is_available(n)]
+        running = {} # future -> provider
+        deadline = time.monotonic() + self.timeout
+        hedge_at = deadline
+
+        def launch_next():
+            nonlocal hedge_at
+            while queue:
+                name = queue.pop(0)
+                if self.resilience.allow(name):
+                    running[self.executor.submit(self._run, name, fn, request)] = name
+                    hedge_at = time.monotonic() + self.hedge_after(name)
+                    return name
+            return None
+
+        if launch_next() is None:
+            return None, None
+
+        while running:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            # Wait until something finishes or it's time to hedge
+            wait_for = deadline - now
+            if queue and len(running) == 1:
+                wait_for = max(0.0, min(wait_for, hedge_at - now))
+            done, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name = running.pop(future)
+                result = future.result()
+                if result is not None:
+                    return result, name
+                # Failed: try the next provider straight away
+                if not running:
+                    launch_next()
+
+            if not done and queue and len(running) == 1 and time.monotonic() >= hedge_at:
+                slow = next(iter(running.values()))
+                hedged = launch_next()
+                if hedged:
+                    self.hedges += 1
+                    print(f"[ROUTER] {slow} is slow, hedging with {hedged}.")
+        return None, None
+
+    def generate(self, prompt, system=None):
+        """Plain text completion with hedging and failover. Returns text or None."""
+        result, _ = self.call({"prompt": prompt, "system": system})
+        return result
+
+    def stream(self, prompt, system=None, stream_fn=None):
+        """
+        Streams from the first usable provider (no hedging for streams).
+        stream_fn(provider, prompt, system) returns an iterator of text pieces.
+        """
+        stream_fn = stream_fn or self.stream_fn
+        name = self.pick()
+        if name is None:
+            return iter(())
+        try:
+            pieces = stream_fn(name, prompt, system)
+        except Exception as e:
+            print(f"[ROUTER] {name} stream failed: {e}")
+            self.record(name, 0.0, False)
+            return iter(())
+        return self.track(name, pieces)
+
+    def track(self, name, pieces):
+        """
+        Wraps a text stream from provider `name` so its latency and outcome are
+        recorded. A stream that yields nothing or raises counts as a failure;
+        the exception still reaches the caller so it can fall back.
+        """
+        start = time.monotonic()
+        got_text = failed = False
+        try:
+            for piece in pieces:
+                got_text = True
+                yield piece
+        except Exception as e:
+            failed = True
+            print(f"[ROUTER] {name} stream failed: {e}")
+            raise
+        finally:
+            self.record(name, time.monotonic() - start, got_text and not failed)
+
+    # ---------- ASYNC CALLS ----------
+    async def _arun(self, name, afn, request):
+        start = time.monotonic()
+        try:
+            result = await afn(name, request)
+        except Exception as e:
+            print(f"[ROUTER] {name} failed: {e}")
+            result = None
+        self.record(name, time.monotonic() - start, result is not None)
+        return result
+
+    async def acall(self, request, afn=None):
+        """asyncio version of call(). afn(provider_name, request) is a coroutine function."""
+        afn = afn or (lambda name, req: self.aproviders[name](req))
+        queue = [n for n in self.order if self._is_available(n)]
+        running = {} # task -> provider
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        hedge_at = deadline
+
+        def launch_next():
+            nonlocal hedge_at
+            while queue:
+                name = queue.pop(0)
+                if self.resilience.allow(name):
+                    running[asyncio.ensure_future(self._arun(name, afn, request))] = name
+                    hedge_at = loop.time() + self.hedge_after(name)
+                    return name
+            return None
+
+        if launch_next() is None:
+            return None, None
+
+        while running:
+            now = loop.time()
+            if now >= deadline:
+                break
+            wait_for = deadline - now
+            if queue and len(running) == 1:
+                wait_for = max(0.0, min(wait_for, hedge_at - now))
+            done, _ = await asyncio.wait(list(running), timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                name = running.pop(task)
+                result = task.result()
+                if result is not None:
+                    self._detach(running)
+                    return result, name
+                if not running:
+                    launch_next()
+
+            if not done and queue and len(running) == 1 and loop.time() >= hedge_at:
+                slow = next(iter(running.values()))
+                hedged = launch_next()
+                if hedged:
+                    self.hedges += 1
+                    print(f"[ROUTER] {slow} is slow, hedging with {hedged}.")
+        self._detach(running)
+        return None, None
+
+    def _detach(self, running):
+        """
+        Lets the loser of a hedge finish in the background (like the thread
+        version) so its latency still gets recorded and no half-open trial is lost.
+        """
+        for task in running:
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def agenerate(self, prompt, system=None):
+        result, _ = await self.acall({"prompt": prompt, "system": system})
+        return result
+
+    def astream(self, prompt, system=None, astream_fn=None):
+        """asyncio version of stream(). Returns an async iterator of text pieces."""
+        astream_fn = astream_fn or self.astream_fn
+        name = self.pick()
+        if name is None:
+            return self._aempty()
+        try:
+            pieces = astream_fn(name, prompt, system)
+        except Exception as e:
+            print(f"[ROUTER] {name} stream failed: {e}")
+            self.record(name, 0.0, False)
+            return self._aempty()
+        return self.atrack(name, pieces)
+
+    async def atrack(self, name, pieces):
+        start = time.monotonic()
+        got_text = False
+        try:
+            async for piece in pieces:
+                got_text = True
+                yield piece
+        except Exception as e:
+            print(f"[ROUTER] {name} stream failed: {e}")
+        finally:
+            self.record(name, time.monotonic() - start, got_text)
+
+    @staticmethod
+    async def _aempty():
+        return
+        yield
+
+    def report(self):
+        breakers = self.resilience.breaker_states()
+        out = {}
+        for name, stats in self.stats.items():
+            out[name] = {
+                "samples": stats.count(),
+                "p50": stats.percentile(50),
+                "p90": stats.percentile(90),
+                "error_rate": round(stats.error_rate(), 3),
+                "circuit": breakers.get(name, {}).get("state", "closed"),
+                "available": self._is_available(name)
+            }
+        out["hedged_requests"] = self.hedges
+        return out
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,202 @@
+"""
+Speech helpers shared by the TTS path.
+
+SentenceSegmenter cuts a streamed LLM answer into sentences so each one can
+be queued for TTS as soon as it is complete, instead of waiting for the
+whole answer.
+
+SpeechQueue holds what is waiting to be spoken, most urgent first. An
+urgent message interrupts a less urgent one that is playing (which is
+spoken again afterwards), progress messages ("Searching for...") are
+dropped or cut short once something newer arrives, and stop() silences
+everything (barge-in, a new command). Pyttsx3Player plays one utterance
+and checks between engine iterations whether it should stop.
+"""
+import heapq
+import itertools
+import re
+import threading
+import time
+
+# Sentence end: . ! ? (optionally followed by quotes/brackets) then whitespace, or a newline
+_BOUNDARY = re.compile(r"[.!?]+[\"')\]]*\s+|\n+")
+_ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "sr.", "jr.", "st.", "vs.", "etc.", "e.g.", "i.e.", "no."}
+
+
+class SentenceSegmenter:
+    def __init__(self, min_chars=12):
+        self.buffer = ""
+        self.min_chars = min_chars # merge very short fragments ("Sure.") into the next sentence
+
+    def feed(self, text):
+        """Adds streamed text, returns the sentences completed by it."""
+        self.buffer += text
+        sentences = []
+        start = 0
+        for m in _BOUNDARY.finditer(self.buffer):
+            candidate = self.buffer[start:m.end()].strip()
+            last_word = candidate.split()[-1].lower() if candidate.split() else ""
+            if last_word in _ABBREVIATIONS:
+                continue
+            if len(candidate) < self.min_chars and "\n" not in m.group(0):
+                continue
+            if candidate:
+                sentences.append(candidate)
+            start = m.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return rest
+
+
+PRIORITIES = {"urgent": 0, "high": 1, "normal": 2, "low": 3}
+
+
+class SpeechItem:
+    __slots__ = ("text", "priority", "key", "transient", "parent", "queued_at", "seq", "preempted")
+
+    def __init__(self, text, priority, key, transient, parent, seq):
+        self.text = text
+        self.priority = priority
+        self.key = key
+        self.transient = transient
+        self.parent = parent # tracing span of the command that queued it
+        self.queued_at = time.perf_counter()
+        self.seq = seq
+        self.preempted = False
+
+    def __lt__(self, other):
+        return (PRIORITIES[self.priority], self.seq) < (PRIORITIES[other.priority], other.seq)
+
+
+class SpeechQueue:
+    def __init__(self):
+        self.items = [] # heap of pending SpeechItems
+        self.cond = threading.Condition()
+        self.seq = itertools.count()
+        self.current = None # item being played
+        self.interrupted = threading.Event() # the player stops the current item when this is set
+        self.closed = False
+        self.counts = {"queued": 0, "played": 0, "coalesced": 0, "preempted": 0, "interrupted": 0, "flushed": 0}
+
+    def put(self, text, priority="normal", key=None, transient=False, parent=None):
+        """
+        Queues text. key: a newer message with the same key replaces a pending
+        one. transient: a progress message, dropped (or cut short) when anything
+        newer arrives. Returns the queued item (None if it duplicated a pending one).
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown speech priority: {priority}")
+        with self.cond:
+            if any(item.text == text for item in self.items):
+                self.counts["coalesced"] += 1
+                return None
+            kept = [item for item in self.items if not item.transient and (key is None or item.key != key)]
+            if len(kept) != len(self.items):
+                self.counts["coalesced"] += len(self.items) - len(kept)
+                self.items = kept
+                heapq.heapify(self.items)
+            item = SpeechItem(text, priority, key, transient, parent, next(self.seq))
+            heapq.heappush(self.items, item)
+            self.counts["queued"] += 1
+            current = self.current
+            if current is not None and not self.interrupted.is_set():
+                if PRIORITIES[priority] < PRIORITIES[current.priority]:
+                    current.preempted = True # spoken again after the urgent one
+                    self.interrupted.set()
+                elif current.transient or (key is not None and current.key == key):
+                    self.interrupted.set()
+            self.cond.notify()
+            return item
+
+    def get(self, timeout=None):
+        """Next item to play (blocks). None on timeout or once closed."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.items or self.closed, timeout) or self.closed:
+                return None
+            self.current = heapq.heappop(self.items)
+            self.interrupted.clear()
+            return self.current
+
+    def done(self, item, completed):
+        """Called by the player when an item ended (completed=False if it was stopped)."""
+        with self.cond:
+            self.current = None
+            if completed:
+                self.counts["played"] += 1
+            elif item.preempted:
+                self.counts["preempted"] += 1
+                item.preempted = False
+                heapq.heappush(self.items, item) # keeps its place in its priority
+                self.cond.notify()
+            else:
+                self.counts["interrupted"] += 1
+            self.cond.notify_all()
+
+    def stop(self, flush=True):
+        """Stops the current utterance and (flush) drops everything pending. Returns how many were dropped."""
+        with self.cond:
+            dropped = len(self.items) if flush else 0
+            if flush:
+                self.items = []
+                self.counts["flushed"] += dropped
+            if self.current is not None:
+                self.current.preempted = False
+                self.interrupted.set()
+            self.cond.notify_all()
+            return dropped
+
+    @property
+    def speaking(self):
+        return self.current is not None
+
+    @property
+    def busy(self):
+        """Speaking or with something left to say."""
+        return self.current is not None or bool(self.items)
+
+    def wait_idle(self, timeout=None):
+        """Blocks until everything queued has been spoken (or dropped). False on timeout."""
+        with self.cond:
+            return self.cond.wait_for(lambda: self.closed or not (self.current is not None or self.items), timeout)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.interrupted.set()
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            return {**self.counts, "pending": len(self.items),
+                    "speaking": self.current.text if self.current is not None else None}
+
+
+class Pyttsx3Player:
+    """
+    Speaks with a pyttsx3 engine on the calling thread. Instead of blocking
+    in runAndWait(), it drives the engine loop itself (startLoop(False) /
+    iterate()) so it can stop mid-sentence.
+    """
+    def __init__(self, engine, poll=0.02):
+        self.engine = engine
+        self.poll = poll
+
+    def play(self, text, should_stop):
+        """Returns True if the text was spoken to the end, False if should_stop() cut it short."""
+        self.engine.say(text)
+        self.engine.startLoop(False)
+        try:
+            self.engine.iterate()
+            while self.engine.isBusy():
+                if should_stop():
+                    self.engine.stop()
+                    return False
+                self.engine.iterate()
+                time.sleep(self.poll)
+            return True
+        finally:
+            self.engine.endLoop()
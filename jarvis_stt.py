@@ -0,0 +1,152 @@
+"""
+Speech-to-text backends.
+
+Every backend turns 16 kHz 16-bit mono PCM into text. stream() returns a
+session that is fed the audio while it is being recorded and reports
+partial transcripts as it goes; backends that can't stream (Google) just
+collect the audio and transcribe it at the end.
+
+The engine is chosen in jarvis_config.json:
+
+    "stt": {"engine": "vosk", "model": "models/vosk-model-small-en-in-0.4"}
+
+Vosk runs fully offline; its model is loaded once per process and shared.
+"""
+import json
+from abc import ABC, abstractmethod
+
+from jarvis_wakeword import SAMPLE_RATE, SAMPLE_WIDTH
+
+try:
+    import speech_recognition as sr
+except ImportError:
+    sr = None
+
+try:
+    import vosk
+except ImportError:
+    vosk = None
+
+
+class STTStream:
+    """Collects the audio while it is recorded and transcribes it in finish()."""
+    def __init__(self, backend, on_partial=None):
+        self.backend = backend
+        self.on_partial = on_partial
+        self.chunks = []
+
+    def feed(self, pcm):
+        self.chunks.append(pcm)
+
+    def finish(self):
+        return self.backend.transcribe(b"".join(self.chunks))
+
+
+class STTBackend(ABC):
+    name = "base"
+    streaming = False # True if stream() reports partial transcripts
+
+    @abstractmethod
+    def transcribe(self, pcm):
+        """Text of a whole utterance ("" if nothing was recognized)."""
+        pass
+
+    def stream(self, on_partial=None):
+        return STTStream(self, on_partial)
+
+
+class GoogleSTT(STTBackend):
+    name = "google"
+
+    def __init__(self, recognizer=None, language="en-in"):
+        self.recognizer = recognizer or (sr.Recognizer() if sr else None)
+        self.language = language
+
+    def transcribe(self, pcm):
+        if self.recognizer is None:
+            raise RuntimeError("SpeechRecognition not installed")
+        try:
+            return self.recognizer.recognize_google(sr.AudioData(pcm, SAMPLE_RATE, SAMPLE_WIDTH), language=self.language)
+        except sr.UnknownValueError:
+            return ""
+
+
+_vosk_models = {} # model path -> vosk.Model
+
+
+class VoskStream:
+    """Feeds Vosk in chunk_ms pieces while recording; on_partial gets the text so far."""
+    def __init__(self, backend, on_partial=None):
+        self.recognizer = backend.recognizer()
+        self.chunk_bytes = int(SAMPLE_RATE * backend.chunk_ms / 1000) * SAMPLE_WIDTH
+        self.on_partial = on_partial
+        self.pending = bytearray()
+        self.segments = [] # text of the parts Vosk already finalized
+        self.partial = ""
+
+    def feed(self, pcm):
+        self.pending += pcm
+        if len(self.pending) < self.chunk_bytes:
+            return
+        data, self.pending = bytes(self.pending), bytearray()
+        if self.recognizer.AcceptWaveform(data):
+            text = json.loads(self.recognizer.Result()).get("text", "")
+            if text:
+                self.segments.append(text)
+            current = " ".join(self.segments)
+        else:
+            partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+            current = " ".join(self.segments + ([partial] if partial else []))
+        if current and current != self.partial:
+            self.partial = current
+            if self.on_partial:
+                self.on_partial(current)
+
+    def finish(self):
+        if self.pending:
+            self.recognizer.AcceptWaveform(bytes(self.pending))
+            self.pending = bytearray()
+        text = json.loads(self.recognizer.FinalResult()).get("text", "")
+        return " ".join(self.segments + ([text] if text else []))
+
+
+class VoskSTT(STTBackend):
+    name = "vosk"
+    streaming = True
+
+    def __init__(self, model_path, chunk_ms=200):
+        if vosk is None:
+            raise RuntimeError("vosk not installed")
+        if model_path not in _vosk_models:
+            print(f"[STT] Loading Vosk model {model_path}...")
+            vosk.SetLogLevel(-1)
+            _vosk_models[model_path] = vosk.Model(model_path)
+        self.model = _vosk_models[model_path]
+        self.chunk_ms = chunk_ms
+
+    def recognizer(self):
+        recognizer = vosk.KaldiRecognizer(self.model, SAMPLE_RATE)
+        recognizer.SetWords(False)
+        return recognizer
+
+    def transcribe(self, pcm):
+        stream = VoskStream(self)
+        stream.feed(pcm)
+        return stream.finish()
+
+    def stream(self, on_partial=None):
+        return VoskStream(self, on_partial)
+
+
+def create_backend(config, recognizer=None):
+    """The backend selected by config["stt"]["engine"]; Google if that one can't be loaded."""
+    cfg = config.get("stt", {})
+    engine = cfg.get("engine", "google")
+    if engine == "vosk":
+        try:
+            return VoskSTT(cfg.get("model", "models/vosk-model-small-en-in-0.4"), chunk_ms=cfg.get("chunk_ms", 200))
+        except Exception as e:
+            print(f"[STT] Vosk unavailable ({e}), using Google.")
+    elif engine != "google":
+        print(f"[STT] Unknown engine '{engine}', using Google.")
+    return GoogleSTT(recognizer, cfg.get("language", "en-in"))
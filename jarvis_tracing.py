@@ -0,0 +1,191 @@
+"""
+Lightweight span tracer for the command pipeline.
+
+Every utterance gets a trace id; each stage (STT, NLU passes, handler, TTS
+queueing and playback...) is a span with monotonic start/end times. The
+current span lives in a contextvar, so nested stages pick up their parent
+automatically; work handed to another thread (the speech queue) passes the
+span along explicitly.
+
+Finished spans go to a ring buffer of recent traces (for /api/traces) and,
+optionally, to the structured event log.
+
+    with tracer.span("command", text=cmd):
+        ...
+
+    @traced("nlu")
+    def parse_intent(self, text): ...
+"""
+import contextvars
+import functools
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+_current = contextvars.ContextVar("jarvis_span", default=None)
+_ids = itertools.count(1)
+
+
+class Span:
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "attrs", "start", "token")
+
+    def __init__(self, tracer, name, parent, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.span_id = next(_ids)
+        if parent is not None:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+        else:
+            self.trace_id = f"{os.getpid():x}-{self.span_id:x}"
+            self.parent_id = None
+        self.start = None
+        self.token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.token = _current.set(self)
+        self.tracer._started(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        _current.reset(self.token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._finished(self, end)
+        return False
+
+
+class _NoSpan:
+    """Stands in for a span when tracing is off."""
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    def __init__(self, enabled=True, capacity=200, log=None):
+        self.enabled = enabled
+        self.capacity = capacity # traces kept in memory
+        self.log = log # optional jarvis_logging ComponentLogger
+        self.traces = OrderedDict() # trace_id -> record, oldest first
+        self.lock = threading.Lock()
+
+    def configure(self, config, log_pipeline=None):
+        cfg = config.get("tracing", {})
+        self.enabled = cfg.get("enabled", True)
+        self.capacity = cfg.get("capacity", 200)
+        if log_pipeline is not None and cfg.get("log_spans", True):
+            self.log = log_pipeline.get_logger("trace")
+        return self
+
+    def span(self, name, parent=None, **attrs):
+        """A new span, child of `parent` or of the current span (a new trace if neither)."""
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, name, parent if parent is not None else _current.get(), attrs)
+
+    def annotate(self, **attrs):
+        """Adds attributes to the current span, if any."""
+        span = _current.get()
+        if span is not None:
+            span.attrs.update(attrs)
+
+    def current(self):
+        """The active span, to hand to another thread as span(..., parent=...)."""
+        return _current.get()
+
+    # ---------- EXPORT ----------
+    def _started(self, span):
+        if span.parent_id is not None:
+            return
+        with self.lock:
+            self.traces[span.trace_id] = {"trace_id": span.trace_id, "name": span.name, "started_at": time.time(),
+                                          "t0": span.start, "duration_ms": None, "spans": []}
+            while len(self.traces) > self.capacity:
+                self.traces.popitem(last=False)
+
+    def _finished(self, span, end):
+        duration_ms = round((end - span.start) * 1000, 3)
+        with self.lock:
+            record = self.traces.get(span.trace_id)
+            if record is not None:
+                entry = {"span_id": span.span_id, "parent_id": span.parent_id, "name": span.name,
+                         "offset_ms": round((span.start - record["t0"]) * 1000, 3), "duration_ms": duration_ms}
+                if span.attrs:
+                    entry["attrs"] = span.attrs
+                record["spans"].append(entry)
+                if span.parent_id is None:
+                    record["duration_ms"] = duration_ms
+        if self.log is not None:
+            self.log.info("span", trace_id=span.trace_id, span_id=span.span_id, parent_id=span.parent_id,
+                          name=span.name, duration_ms=duration_ms, attrs=span.attrs)
+
+    # ---------- READERS ----------
+    def recent(self, limit=20):
+        """Newest traces first, spans in start order."""
+        with self.lock:
+            records = list(self.traces.values())[-limit:]
+            out = []
+            for record in reversed(records):
+                trace = {k: v for k, v in record.items() if k not in ("t0", "spans")}
+                trace["spans"] = sorted(record["spans"], key=lambda s: s["offset_ms"])
+                out.append(trace)
+        return out
+
+    def stages(self):
+        """Per span name over the buffered traces: count, mean / p50 / p90 / max in ms."""
+        by_name = {}
+        with self.lock:
+            for record in self.traces.values():
+                for s in record["spans"]:
+                    by_name.setdefault(s["name"], []).append(s["duration_ms"])
+        out = {}
+        for name, values in by_name.items():
+            values.sort()
+            out[name] = {"count": len(values),
+                         "mean_ms": round(sum(values) / len(values), 3),
+                         "p50_ms": values[len(values) // 2],
+                         "p90_ms": values[min(len(values) - 1, int(len(values) * 0.9))],
+                         "max_ms": values[-1]}
+        return out
+
+
+tracer = Tracer()
+
+
+def traced(name):
+    """Decorator: runs the function inside a span of the global tracer."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def atraced(name):
+    """traced() for coroutine functions."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorate
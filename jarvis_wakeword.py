@@ -0,0 +1,331 @@
+"""
+On-device wake word detection.
+
+The always-listening loop used to send every recorded chunk to Google just
+to look for "jarvis" in the text. Now a chunk goes through:
+
+1. EnergyVAD: is there speech at all? (pure Python, adaptive noise floor)
+2. WakeWordSpotter: MFCC features matched against recorded templates of
+   the wake word with subsequence DTW (NumPy). Runs locally in a few ms.
+
+Cloud STT is only used after a local detection. Until templates exist the
+stage falls back to the cloud check for voiced chunks, and chunks where the
+user said just the wake word are saved as templates (auto-enrolment), so
+the spotter bootstraps itself.
+
+AudioFileSource reads WAV files for offline tests and bench_wakeword.py.
+"""
+import glob
+import math
+import os
+import time
+import wave
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+    print("[WARNING] numpy not installed. Local wake word spotter disabled.")
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2 # 16-bit PCM
+
+
+def frame_rms(frame):
+    """RMS of a little-endian 16-bit PCM frame (bytes)."""
+    samples = array("h", frame)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+class EnergyVAD:
+    """
+    Frame-energy voice activity detector. A frame is speech when its RMS is
+    `ratio` times above the running noise floor (and above min_energy). The
+    noise floor tracks non-speech frames.
+    """
+    def __init__(self, rate=SAMPLE_RATE, frame_ms=20, ratio=3.0, min_energy=150.0,
+                 noise_alpha=0.05, min_speech_ms=120):
+        self.rate = rate
+        self.frame_bytes = int(rate * frame_ms / 1000) * SAMPLE_WIDTH
+        self.frame_ms = frame_ms
+        self.ratio = ratio
+        self.min_energy = min_energy
+        self.noise_alpha = noise_alpha
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.noise_floor = None
+
+    def frames(self, pcm):
+        for i in range(0, len(pcm) - self.frame_bytes + 1, self.frame_bytes):
+            yield pcm[i:i + self.frame_bytes]
+
+    def is_speech(self, frame):
+        energy = frame_rms(frame)
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        speech = energy >= max(self.min_energy, self.noise_floor * self.ratio)
+        if not speech:
+            self.noise_floor += self.noise_alpha * (energy - self.noise_floor)
+        return speech
+
+    def contains_speech(self, pcm):
+        """True if pcm has a run of at least min_speech_ms of voiced frames."""
+        run = 0
+        for frame in self.frames(pcm):
+            run = run + 1 if self.is_speech(frame) else 0
+            if run >= self.min_speech_frames:
+                return True
+        return False
+
+    def trim(self, pcm, pad_ms=60):
+        """pcm without leading/trailing non-speech (keeps pad_ms around the voiced part)."""
+        voiced = [i for i, frame in enumerate(self.frames(pcm)) if self.is_speech(frame)]
+        if not voiced:
+            return b""
+        pad = pad_ms // self.frame_ms
+        start = max(0, voiced[0] - pad) * self.frame_bytes
+        end = min(len(pcm), (voiced[-1] + 1 + pad) * self.frame_bytes)
+        return pcm[start:end]
+
+
+# ---------- FEATURES ----------
+_mel_cache = {}
+
+
+def _mel_filterbank(n_mels, n_fft, rate):
+    key = (n_mels, n_fft, rate)
+    if key not in _mel_cache:
+        to_mel = lambda f: 2595.0 * np.log10(1.0 + f / 700.0)
+        to_hz = lambda m: 700.0 * (10 ** (m / 2595.0) - 1.0)
+        points = to_hz(np.linspace(to_mel(0.0), to_mel(rate / 2.0), n_mels + 2))
+        bins = np.floor((n_fft + 1) * points / rate).astype(int)
+        bank = np.zeros((n_mels, n_fft // 2 + 1))
+        for m in range(1, n_mels + 1):
+            left, center, right = bins[m - 1], bins[m], bins[m + 1]
+            for k in range(left, center):
+                bank[m - 1, k] = (k - left) / max(1, center - left)
+            for k in range(center, right):
+                bank[m - 1, k] = (right - k) / max(1, right - center)
+        n = np.arange(n_mels)
+        dct = np.cos(np.pi / n_mels * (n[:, None] + 0.5) * np.arange(n_mels)[None, :]).T # DCT-II rows
+        _mel_cache[key] = (bank, dct)
+    return _mel_cache[key]
+
+
+def mfcc(pcm, rate=SAMPLE_RATE, n_mfcc=13, n_mels=26, win_ms=25, hop_ms=10, n_fft=512):
+    """(frames, n_mfcc - 1) MFCCs of 16-bit PCM. c0 is dropped, which makes them independent of loudness."""
+    signal = np.frombuffer(pcm, dtype="<i2").astype(np.float64)
+    win = int(rate * win_ms / 1000)
+    hop = int(rate * hop_ms / 1000)
+    if len(signal) < win:
+        return np.zeros((0, n_mfcc - 1))
+    signal = np.append(signal[0], signal[1:] - 0.97 * signal[:-1]) # pre-emphasis
+    count = 1 + (len(signal) - win) // hop
+    idx = np.arange(win)[None, :] + hop * np.arange(count)[:, None]
+    frames = signal[idx] * np.hamming(win)
+    power = np.abs(np.fft.rfft(frames, n_fft)) ** 2 / n_fft
+    bank, dct = _mel_filterbank(n_mels, n_fft, rate)
+    energies = np.log(np.maximum(power @ bank.T, 1e-10))
+    return (energies @ dct.T)[:, 1:n_mfcc]
+
+
+def subsequence_dtw(template, signal):
+    """
+    Best match of `template` anywhere inside `signal` (both feature matrices).
+    Returns (distance normalised by template length, end frame in signal).
+    """
+    n, m = len(template), len(signal)
+    if n == 0 or m == 0:
+        return float("inf"), 0
+    cost = np.sqrt(((template[:, None, :] - signal[None, :, :]) ** 2).sum(axis=2))
+    prev = cost[0] # free start anywhere in the signal
+    for i in range(1, n):
+        diag_up = np.minimum(prev, np.concatenate(([np.inf], prev[:-1]))).tolist()
+        row = []
+        acc = float("inf")
+        for c, d in zip(cost[i].tolist(), diag_up): # the left neighbour makes this part sequential
+            acc = c + (d if d < acc else acc)
+            row.append(acc)
+        prev = np.array(row)
+    end = int(np.argmin(prev))
+    return float(prev[end] / n), end
+
+
+class WakeWordSpotter:
+    def __init__(self, threshold=9.0, rate=SAMPLE_RATE, max_templates=10, search_seconds=2.5):
+        self.threshold = threshold # normalised DTW distance; calibrate with bench_wakeword.py
+        self.rate = rate
+        self.max_templates = max_templates
+        self.search_seconds = search_seconds # the wake word is at the start of a chunk
+        self.templates = [] # MFCC matrices
+
+    @property
+    def available(self):
+        return np is not None and bool(self.templates)
+
+    def add_template(self, pcm):
+        if np is None:
+            return False
+        features = mfcc(pcm, self.rate)
+        if len(features) < 10: # < ~0.1 s, not a word
+            return False
+        self.templates = (self.templates + [features])[-self.max_templates:]
+        return True
+
+    def load_templates(self, directory):
+        """Adds every WAV template in directory. Returns how many were loaded."""
+        count = 0
+        for path in sorted(glob.glob(os.path.join(directory, "*.wav")))[-self.max_templates:]:
+            try:
+                count += self.add_template(AudioFileSource(path, self.rate).pcm)
+            except Exception as e:
+                print(f"[WAKE] Bad template {path}: {e}")
+        return count
+
+    def save_template(self, pcm, directory):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"wake_{int(time.time() * 1000)}.wav")
+        with wave.open(path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(SAMPLE_WIDTH)
+            f.setframerate(self.rate)
+            f.writeframes(pcm)
+        return path
+
+    def score(self, pcm):
+        """(best normalised distance over templates, seconds where the match ends)."""
+        if not self.available:
+            return float("inf"), 0.0
+        limit = int(self.search_seconds * self.rate) * SAMPLE_WIDTH
+        features = mfcc(pcm[:limit], self.rate)
+        best, end = float("inf"), 0
+        for template in self.templates:
+            distance, frame = subsequence_dtw(template, features)
+            if distance < best:
+                best, end = distance, frame
+        return best, (end + 1) * 0.010 + 0.015 # hop 10 ms, plus the rest of the 25 ms window
+
+    def detect(self, pcm):
+        """(detected, distance, end_seconds)."""
+        distance, end = self.score(pcm)
+        return distance <= self.threshold, distance, end
+
+
+class WakeWordStage:
+    """
+    Decides whether a recorded chunk is the wake word, as cheaply as possible:
+    VAD first, then the local spotter; the cloud transcript only until the
+    spotter has auto_enroll templates (each one taken from a chunk the cloud
+    heard as just the wake word), so one mis-heard chunk can't decide alone.
+    """
+    def __init__(self, wake_word, spotter, vad=None, templates_dir=None, auto_enroll=5):
+        self.wake_word = wake_word.lower()
+        self.spotter = spotter
+        self.vad = vad or EnergyVAD()
+        self.templates_dir = templates_dir
+        self.auto_enroll = auto_enroll # templates to collect from cloud-confirmed chunks
+        self.stats = {"chunks": 0, "silent": 0, "local_checks": 0, "cloud_checks": 0,
+                      "detections": 0, "enrolled": 0, "local_ms": 0.0}
+
+    @classmethod
+    def from_config(cls, config):
+        cfg = config.get("wake_word_engine", {})
+        spotter = WakeWordSpotter(threshold=cfg.get("threshold", 9.0))
+        templates_dir = cfg.get("templates_dir", "wakeword_templates")
+        if os.path.isdir(templates_dir):
+            spotter.load_templates(templates_dir)
+        vad = EnergyVAD(ratio=cfg.get("vad_ratio", 3.0), min_energy=cfg.get("vad_min_energy", 150.0))
+        return cls(config.get("wake_word", "jarvis"), spotter, vad, templates_dir, cfg.get("auto_enroll", 5))
+
+    @property
+    def enrolling(self):
+        """True while the cloud still confirms wakes and templates are collected."""
+        return np is not None and len(self.spotter.templates) < self.auto_enroll
+
+    def check(self, pcm, transcribe):
+        """
+        pcm: 16 kHz 16-bit mono chunk. transcribe: fn() -> text (cloud STT),
+        only called when the spotter can't decide locally. Returns True on wake.
+        """
+        return self.detect(pcm, transcribe)[0]
+
+    def detect(self, pcm, transcribe):
+        """
+        check() plus what was said after the wake word in the same utterance:
+        (detected, rest_pcm, rest_text). A local detection gives the audio
+        after the match (b"" if nothing voiced follows), the cloud fallback the
+        transcript after the wake word; the other one is None.
+        """
+        self.stats["chunks"] += 1
+        if not self.vad.contains_speech(pcm):
+            self.stats["silent"] += 1
+            return False, None, None
+        if self.spotter.available and not self.enrolling:
+            start = time.perf_counter()
+            detected, distance, end = self.spotter.detect(pcm)
+            self.stats["local_checks"] += 1
+            self.stats["local_ms"] += (time.perf_counter() - start) * 1000
+            if not detected:
+                return False, None, None
+            self.stats["detections"] += 1
+            print(f"[WAKE] Local detection (distance {distance:.2f})")
+            rest = pcm[int(end * self.spotter.rate) * SAMPLE_WIDTH:]
+            return True, rest if self.vad.contains_speech(rest) else b"", None
+        # Not enough templates yet: cloud check for voiced chunks only
+        self.stats["cloud_checks"] += 1
+        text = (transcribe() or "").lower().strip()
+        if self.wake_word not in text:
+            return False, None, None
+        self.stats["detections"] += 1
+        if text == self.wake_word:
+            self._enroll(pcm)
+        return True, None, text.split(self.wake_word, 1)[1].strip(" ,.!?")
+
+    def _enroll(self, pcm):
+        if not self.enrolling:
+            return
+        word = self.vad.trim(pcm)
+        if self.spotter.add_template(word):
+            self.stats["enrolled"] += 1
+            if self.templates_dir:
+                self.spotter.save_template(word, self.templates_dir)
+            print(f"[WAKE] Saved wake word template {self.stats['enrolled']}/{self.auto_enroll}.")
+
+
+class AudioFileSource:
+    """A WAV file as 16 kHz 16-bit mono PCM (for tests and benchmarks)."""
+    def __init__(self, path, rate=SAMPLE_RATE):
+        self.path = path
+        self.rate = rate
+        with wave.open(path, "rb") as f:
+            channels, width, src_rate = f.getnchannels(), f.getsampwidth(), f.getframerate()
+            raw = f.readframes(f.getnframes())
+        if width != SAMPLE_WIDTH:
+            raise ValueError(f"{path}: only 16-bit WAV is supported")
+        samples = array("h", raw)
+        if channels > 1:
+            samples = array("h", samples[::channels]) # first channel
+        if src_rate != rate:
+            if np is None:
+                raise ValueError(f"{path}: {src_rate} Hz needs numpy to resample to {rate} Hz")
+            x = np.frombuffer(samples.tobytes(), dtype="<i2").astype(np.float64)
+            t = np.arange(int(len(x) * rate / src_rate)) * src_rate / rate
+            samples = array("h", np.interp(t, np.arange(len(x)), x).astype("<i2").tobytes())
+        self.pcm = samples.tobytes()
+
+    @property
+    def duration(self):
+        return len(self.pcm) / SAMPLE_WIDTH / self.rate
+
+    def frames(self, frame_ms=20):
+        """Fixed-size chunks, like a microphone stream would deliver."""
+        size = int(self.rate * frame_ms / 1000) * SAMPLE_WIDTH
+        for i in range(0, len(self.pcm), size):
+            yield self.pcm[i:i + size]
+
+    def audio_data(self):
+        """speech_recognition.AudioData for cloud STT comparisons."""
+        import speech_recognition as sr
+        return sr.AudioData(self.pcm, self.rate, SAMPLE_WIDTH)
@@ -0,0 +1,136 @@
+"""
+Websocket fan-out for the server.
+
+Every connection gets its own bounded outbound queue and writer task, so
+broadcast() only enqueues and one slow client can't delay the others.
+High-frequency messages (stats, partial transcripts) are lossy: only the
+newest few are kept and they are evicted first when a queue fills up.
+Everything else (speak, final transcripts, job events...) is never dropped;
+a client that can't keep up with those is disconnected instead. Connections
+whose send fails or times out are pruned automatically.
+"""
+import asyncio
+from collections import deque
+
+LOSSY_TYPES = {"stats"}
+
+
+def is_lossy(message):
+    """Stats updates and partial transcripts: a newer one replaces them anyway."""
+    return message.get("type") in LOSSY_TYPES or bool(message.get("partial"))
+
+
+class ClientConnection:
+    def __init__(self, websocket, max_queue=100, max_lossy=2, max_backlog=1000, send_timeout=5.0):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.max_lossy = max_lossy # pending stats kept per client (older ones are dropped)
+        self.max_backlog = max_backlog # reliable messages may exceed max_queue up to here
+        self.send_timeout = send_timeout
+        self.queue = deque()
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.sent = 0
+        self.alive = True
+        self.task = None
+
+    def _lossy_count(self):
+        return sum(1 for m in self.queue if is_lossy(m))
+
+    def _evict_oldest_lossy(self):
+        for m in self.queue:
+            if is_lossy(m):
+                self.queue.remove(m)
+                self.dropped += 1
+                return True
+        return False
+
+    def enqueue(self, message):
+        """Queues a message. Returns False if the client has fallen too far behind."""
+        if not self.alive:
+            return False
+        lossy = is_lossy(message)
+        if lossy and self._lossy_count() >= self.max_lossy:
+            self._evict_oldest_lossy()
+        if len(self.queue) >= self.max_queue and not self._evict_oldest_lossy():
+            if lossy:
+                self.dropped += 1
+                return True
+            if len(self.queue) >= self.max_backlog:
+                self.alive = False
+                return False
+        self.queue.append(message)
+        self.ready.set()
+        return True
+
+    async def writer(self, on_dead):
+        try:
+            while self.alive:
+                if not self.queue:
+                    self.ready.clear()
+                    await self.ready.wait()
+                    continue
+                message = self.queue.popleft()
+                await asyncio.wait_for(self.websocket.send_json(message), self.send_timeout)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[WS] Dropping connection: {e!r}")
+        self.alive = False
+        on_dead(self.websocket)
+
+    def stats(self):
+        return {"queued": len(self.queue), "sent": self.sent, "dropped": self.dropped, "alive": self.alive}
+
+
+class ConnectionManager:
+    def __init__(self, max_queue=100, max_lossy=2, max_backlog=1000, send_timeout=5.0):
+        self.options = {"max_queue": max_queue, "max_lossy": max_lossy,
+                        "max_backlog": max_backlog, "send_timeout": send_timeout}
+        self.clients = {} # websocket -> ClientConnection
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(**config.get("websocket", {}))
+
+    @property
+    def active_connections(self):
+        return list(self.clients)
+
+    async def connect(self, websocket):
+        await websocket.accept()
+        client = ClientConnection(websocket, **self.options)
+        self.clients[websocket] = client
+        client.task = asyncio.ensure_future(client.writer(self.disconnect))
+
+    def disconnect(self, websocket):
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        client.alive = False
+        if client.task and client.task is not asyncio.current_task():
+            client.task.cancel()
+
+    def send(self, websocket, message):
+        """Queues a message for one client (keeps its order with broadcasts)."""
+        client = self.clients.get(websocket)
+        if client and not client.enqueue(message):
+            print("[WS] Client too slow, disconnecting.")
+            self.disconnect(websocket)
+            asyncio.ensure_future(self._close(websocket))
+
+    @staticmethod
+    async def _close(websocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    async def broadcast(self, message: dict):
+        # Only enqueues; each client's writer task does the actual sending
+        for websocket in list(self.clients):
+            self.send(websocket, message)
+
+    def stats(self):
+        return [client.stats() for client in self.clients.values()]
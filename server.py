@@ -10,8 +10,12 @@ from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import jarvis_advanced
+import jarvis_prompts
+from jarvis_jobs import JobQueue
+from jarvis_ws import ConnectionManager
+from jarvis_metrics import StatsStream
+from jarvis_tracing import tracer
 import database
-import psutil
 
 # --- AUTH CONFIG ---
 SECRET_KEY = "jarvis_secret_key_change_this_in_production"
@@ -31,27 +35,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception:
-                pass
-
-manager = ConnectionManager()
-
 # Extend Jarvis to emit events
 class WebJarvis(jarvis_advanced.JarvisAssistant):
     def __init__(self):
@@ -61,37 +44,57 @@ class WebJarvis(jarvis_advanced.JarvisAssistant):
     def set_loop(self, loop):
         self.loop = loop
 
-    def emit(self, event_type, data):
+    def emit(self, event_type, data, **extra):
         if self.loop and self.loop.is_running():
             asyncio.run_coroutine_threadsafe(
-                manager.broadcast({"type": event_type, "data": data}),
+                manager.broadcast({"type": event_type, "data": data, **extra}),
                 self.loop
             )
 
-    def speak(self, text):
+    def speak(self, text, priority="normal", key=None, transient=False):
         self.emit("speak", text)
         print(f"Jarvis: {text}") 
-        super().speak(text)  # Now safe to call as it pushes to background queue
-        
-        # Log to DB
-        # Note: We need the last user text and intent to log properly. 
-        # For simplicity, we'll log here assuming it matches the last processed command.
-        if hasattr(self.context, 'last_command') and hasattr(self.context, 'last_intent'):
-             database.db.log_interaction(self.context.last_command, self.context.last_intent, text)
+        super().speak(text, priority, key, transient)  # Now safe to call as it pushes to background queue
 
 
 
-    def listen_once(self, timeout=8, phrase_time_limit=10):
+    def listen_once(self, timeout=8, phrase_time_limit=10, reader=None):
         self.emit("status", "listening")
-        text = super().listen_once(timeout, phrase_time_limit)
+        text = super().listen_once(timeout, phrase_time_limit, reader)
         if text:
             self.emit("transcript", text)
         self.emit("status", "idle")
         return text
 
+    def on_partial_transcript(self, text):
+        # Live caption while the user is still speaking (lossy, see jarvis_ws)
+        self.emit("transcript", text, partial=True)
+        super().on_partial_transcript(text)
+
 # Global instance
 jarvis = WebJarvis()
 
+# Global connection manager (per-client queues, see jarvis_ws.py)
+manager = ConnectionManager.from_config(jarvis.config)
+
+# Delta-encoded stats per client, read from jarvis' shared sampler
+stats_stream = StatsStream(jarvis.metrics, default_interval=jarvis.config.get("metrics", {}).get("stream_interval", 2.0))
+
+# --- COMMAND JOBS ---
+async def run_command_step(job, text):
+    # Broadcast what we are doing
+    await manager.broadcast({"type": "transcript", "data": text})
+    # NLU awaits the async LLM client, the action itself runs on
+    # jarvis' bounded pool, so other clients and stats keep flowing
+    with tracer.span("command", source="ui", job=job.id):
+        intent = await jarvis.aparse_intent(text)
+        await jarvis.ahandle_intent(intent)
+
+async def broadcast_job(job):
+    await manager.broadcast({"type": "job", "data": job.to_dict()})
+
+jobs = JobQueue.from_config(run_command_step, broadcast_job, jarvis.config)
+
 # --- AUTH MODELS & UTILS ---
 class UserRegister(BaseModel):
     username: str
@@ -189,6 +192,9 @@ async def websocket_endpoint(websocket: WebSocket):
     try:
         # Give the Jarvis instance access to the loop to broadcast events
         jarvis.set_loop(asyncio.get_event_loop())
+        jobs.start()
+        jarvis.metrics.start()
+        stats_stream.subscribe(websocket)
         while True:
             data = await websocket.receive_text()
             # Handle commands from UI if needed
@@ -205,74 +211,114 @@ async def websocket_endpoint(websocket: WebSocket):
                 jarvis.context.running = False
                 await manager.broadcast({"type": "status", "data": "stopped"})
             elif msg.get("action") == "command":
-                # Manual text command input
+                # Manual text command input, queued as a job (status comes back as "job" events)
                 cmd = msg.get("text", "")
                 if cmd:
-                    # Support compound commands (e.g. "open notepad and type hello")
-                    # Split by " and " (case-insensitive ideally, but simple split for now)
-                    sub_commands = cmd.split(" and ")
-                    
-                    for sub_cmd in sub_commands:
-                        sub_cmd = sub_cmd.strip()
-                        if sub_cmd:
-                             # Process intent
-                            intent = jarvis.parse_intent(sub_cmd)
-                            jarvis.handle_intent(intent)
-                            
-                            # Broadcast what we are doing
-                            await manager.broadcast({"type": "transcript", "data": sub_cmd})
-                            
-                            # Small delay between chained commands to allow UI/App to catch up
-                            if len(sub_commands) > 1:
-                                await asyncio.sleep(1.5)
+                    jarvis.stop_speaking() # a new command: don't keep talking about the last one
+                    await jobs.submit(cmd)
+            elif msg.get("action") == "stop_speaking":
+                jarvis.stop_speaking()
+            elif msg.get("action") == "cancel":
+                if not await jobs.cancel(msg.get("job_id")):
+                    manager.send(websocket, {"type": "error", "data": f"No active job {msg.get('job_id')}"})
+            elif msg.get("action") == "stats":
+                # Per-client stats rate, e.g. {"action": "stats", "interval": 10} or {"enabled": false}
+                if msg.get("enabled", True):
+                    stats_stream.subscribe(websocket, msg.get("interval"))
+                else:
+                    stats_stream.unsubscribe(websocket)
+            elif msg.get("action") == "jobs":
+                manager.send(websocket, {"type": "jobs", "data": jobs.list()})
             elif msg.get("action") == "listen":
-                 # Trigger listening via UI button (run in thread to not block WS)
+                 # Trigger listening via UI button (run on the action pool to not block WS)
                  def manual_listen():
-                     text = jarvis.listen_once()
-                     if text:
-                         # Normalize text (remove punctuation)
-                         text = text.replace(".", "").replace("?", "")
-                         intent = jarvis.parse_intent(text)
-                         
-                         # Save context for DB logging
-                         jarvis.context.last_command = text
-                         jarvis.context.last_intent = intent.get("type", "unknown")
-                         
-                         jarvis.handle_intent(intent)
+                     with tracer.span("command", source="ui_listen"):
+                         text = jarvis.listen_once()
+                         if text:
+                             # Normalize text (remove punctuation)
+                             text = text.replace(".", "").replace("?", "")
+                             intent = jarvis.parse_intent(text)
+                             jarvis.handle_intent(intent) # logs the command and the reply to history
                  
-                 threading.Thread(target=manual_listen).start()
+                 asyncio.get_running_loop().run_in_executor(jarvis.executor, manual_listen)
 
     except WebSocketDisconnect:
         manager.disconnect(websocket)
+        stats_stream.unsubscribe(websocket)
 
 @app.get("/")
 def read_root():
     return {"status": "Jarvis Backend Running"}
 
+@app.get("/api/nlu/cache")
+def nlu_cache_stats():
+    return jarvis.intent_cache.stats()
+
+@app.get("/api/nlu/prompts")
+def nlu_prompt_stats():
+    return jarvis_prompts.report()
+
+@app.get("/api/jobs")
+def job_list():
+    return {"jobs": jobs.list(), "stats": jobs.stats()}
+
+@app.get("/api/ws/clients")
+def ws_client_stats():
+    return manager.stats()
+
+@app.get("/api/db/retention")
+def db_retention_stats():
+    return {**jarvis.retention.stats(), "intents": database.db.get_intent_counts()}
+
+@app.get("/api/db/cache")
+def db_cache_stats():
+    return database.db.cache_stats()
+
+@app.get("/api/capabilities")
+def capability_stats():
+    return jarvis.capabilities.report()
+
+@app.get("/api/traces")
+def recent_traces(limit: int = 20):
+    return {"traces": tracer.recent(limit), "stages": tracer.stages()}
+
+@app.get("/api/wakeword")
+def wakeword_stats():
+    stage = jarvis.wake_stage
+    return {**stage.stats, "templates": len(stage.spotter.templates), "enrolling": stage.enrolling,
+            "threshold": stage.spotter.threshold, "noise_floor": stage.vad.noise_floor}
+
+@app.get("/api/audio")
+def audio_stats():
+    return {**jarvis.audio.stats(), "environment": jarvis.context_awareness.environment_mode}
+
+@app.get("/api/speech")
+def speech_stats():
+    return {**jarvis.speech.stats(), "barge_ins": jarvis.barge_in.barge_ins}
+
+@app.post("/api/speech/stop")
+def speech_stop():
+    return {"flushed": jarvis.stop_speaking()}
+
+@app.get("/api/llm/providers")
+def llm_provider_stats():
+    return jarvis.router.report()
+
 # Background Task for System Stats
 async def broadcast_stats():
     while True:
         try:
-            # Check for active connections in the manager
-            if manager.active_connections:
-                cpu = psutil.cpu_percent(interval=None)
-                ram = psutil.virtual_memory().percent
-                battery = psutil.sensors_battery()
-                batt_pct = battery.percent if battery else 100
-                
-                stats_msg = {
-                    "type": "stats",
-                    "data": {
-                        "cpu": cpu,
-                        "ram": ram,
-                        "battery": batt_pct
-                    }
-                }
-                await manager.broadcast(stats_msg)
+            # Forget clients the manager has already pruned
+            for websocket in list(stats_stream.clients):
+                if websocket not in manager.clients:
+                    stats_stream.unsubscribe(websocket)
+            # Reads the sampler's ring buffer, no psutil calls here
+            for websocket, stats_msg in stats_stream.updates():
+                manager.send(websocket, stats_msg)
         except Exception as e:
             print(f"Stats Error: {e}")
         
-        await asyncio.sleep(2)
+        await asyncio.sleep(jarvis.metrics.interval)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+import database
+from database import JarvisDB
+
+try:
+    import jarvis_advanced
+except ImportError: # needs the desktop dependencies (AppOpener, Pillow, ...)
+    jarvis_advanced = None
+
+
+class FakeDDGS:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def text(self, query, max_results=1):
+        return [{"body": f"a web answer about {query}"}]
+
+
+@unittest.skipIf(jarvis_advanced is None, "jarvis_advanced dependencies not installed")
+class TestHandleIntent(unittest.TestCase):
+    """A real JarvisAssistant in a scratch directory, with speech captured instead of played."""
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir) # config, logs and provenance are written next to it
+        self.old_db = database.__dict__.get("db")
+        database.db = JarvisDB(os.path.join(self.tmpdir, "jarvis.db"))
+        self.jarvis = jarvis_advanced.JarvisAssistant()
+        self.spoken = []
+        self.jarvis.speech.put = lambda text, *args, **kwargs: self.spoken.append(text)
+        self.ddgs = jarvis_advanced.DDGS
+        jarvis_advanced.DDGS = FakeDDGS
+
+    def tearDown(self):
+        jarvis_advanced.DDGS = self.ddgs
+        self.jarvis.retention.stop()
+        database.db.close()
+        if self.old_db is None:
+            del database.db
+        else:
+            database.db = self.old_db
+        os.chdir(self.cwd)
+
+    def test_gemini_stream_error_falls_back_to_the_web(self):
+        def broken_stream(prompt, model=None):
+            yield "Dark matter is"
+            raise ConnectionError("stream reset")
+
+        self.jarvis.router.candidates = lambda: ["gemini"]
+        self.jarvis.llm.gemini_model = lambda: None
+        self.jarvis.llm.gemini_stream = broken_stream
+        self.jarvis.handle_intent({"type": "unknown", "text": "what is dark matter", "raw": "what is dark matter"})
+        self.assertIn("According to the web: a web answer about what is dark matter", self.spoken)
+        self.assertEqual(self.jarvis.router.report()["gemini"]["error_rate"], 1.0)
+
+    def test_stream_stops_at_command_marker(self):
+        text = self.jarvis.speak_stream(["Opening it now. $$CMD$$ start notepad"], stop_marker="$$CMD$$")
+        self.assertEqual(self.spoken, ["Opening it now."])
+        self.assertIn("$$CMD$$ start notepad", text)
+        self.spoken.clear()
+        self.jarvis.speak_stream(["Sure thing, ", "closing it. $$C", "MD$$ taskkill /f /im notepad.exe"],
+                                 stop_marker="$$CMD$$")
+        self.assertEqual(self.spoken, ["Sure thing, closing it."])
+        self.spoken.clear()
+        self.jarvis.speak_stream(["It costs 5$", "$ or less."], stop_marker="$$CMD$$")
+        self.assertEqual(self.spoken, ["It costs 5$$ or less."])
+
+    def test_what_did_i_say(self):
+        self.jarvis.handle_intent(self.jarvis.parse_intent("what time is it"))
+        answer = self.spoken[-1]
+        self.jarvis.handle_intent(self.jarvis.parse_intent("what did I say about the time"))
+        self.assertTrue(self.spoken[-1].endswith("you said: what time is it."), self.spoken)
+        database.db.flush()
+        first = database.db.get_recent_history(limit=2)[-1]
+        self.assertEqual((first["user_text"], first["intent"], first["response"]), ("what time is it", "get_time", answer))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+import time
+import unittest
+import jarvis_wakeword
+from jarvis_audio import RingBuffer, AudioCapture, AudioSession, BargeInMonitor
+from capabilities.context import ContextAwareness
+from jarvis_wakeword import WakeWordSpotter, WakeWordStage
+from test_wakeword import WORD, OTHER, noise, tone
+
+
+class FrameSource:
+    """PCM split into 20 ms frames, delivered like a microphone (optionally in real time)."""
+    def __init__(self, pcm, realtime=False):
+        self.frames = [pcm[i:i + 640] for i in range(0, len(pcm), 640)]
+        self.realtime = realtime
+        self.opened = self.closed = 0
+
+    def open(self):
+        self.opened += 1
+
+    def read(self):
+        if self.realtime:
+            time.sleep(0.02)
+        return self.frames.pop(0) if self.frames else b""
+
+    def close(self):
+        self.closed += 1
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_wraps_and_clips(self):
+        ring = RingBuffer(seconds=0.001) # 16 samples = 32 bytes
+        ring.write(bytes(range(20)))
+        ring.write(bytes(range(20, 40)))
+        self.assertEqual(ring.written, 40)
+        self.assertEqual(ring.oldest(), 8)
+        self.assertEqual(ring.read(0, 40), bytes(range(8, 40))) # the first 8 bytes are gone
+        self.assertEqual(ring.read(30, 35), bytes(range(30, 35)))
+        self.assertEqual(ring.read(35, 50), bytes(range(35, 40)))
+
+
+class TestStreamReader(unittest.TestCase):
+    def test_utterances_from_one_stream(self):
+        source = FrameSource(noise(0.5) + WORD + noise(1.0) + OTHER + noise(1.0))
+        capture = AudioCapture(source)
+        reader = capture.reader() # before start(): from the beginning of the stream
+        capture.start()
+        first = reader.next_utterance(timeout=2)
+        second = reader.next_utterance(timeout=2)
+        self.assertIsNone(reader.next_utterance(timeout=0.2))
+        capture.stop()
+        # ~0.5 s of word, plus pre-roll and the trailing pause
+        self.assertAlmostEqual(len(first) / 32000, 1.5, delta=0.2)
+        self.assertIn(OTHER[:6400], second)
+        self.assertNotIn(OTHER[:6400], first)
+        self.assertEqual((source.opened, source.closed), (1, 1))
+
+    def test_on_audio_streams_the_utterance(self):
+        capture = AudioCapture(FrameSource(noise(0.5) + WORD + noise(1.0)))
+        reader = capture.reader()
+        capture.start()
+        pieces = []
+        pcm = reader.next_utterance(timeout=2, on_audio=pieces.append)
+        capture.stop()
+        self.assertGreater(len(pieces), 10)
+        self.assertEqual(b"".join(pieces), pcm)
+
+    def test_readers_are_independent(self):
+        source = FrameSource(noise(0.3) + WORD + noise(1.0), realtime=True)
+        capture = AudioCapture(source).start()
+        a, b = capture.reader(), capture.reader()
+        self.assertEqual(a.next_utterance(timeout=2), b.next_utterance(timeout=2))
+        capture.stop()
+
+    def test_skip_own_voice(self):
+        echo = tone(0.8, 400, 600, amp=3000) # Jarvis saying "Yes?"
+        capture = AudioCapture(FrameSource(noise(0.3) + echo + noise(0.3) + OTHER + noise(1.0)))
+        reader = capture.reader()
+        capture.start()
+        while capture.running:
+            time.sleep(0.01)
+        keep_from = (len(noise(0.3)) + len(echo) + len(noise(0.3)) - 3200)
+        reader.skip(keep_from) # e.g. a barge-in: keep the audio from there
+        self.assertEqual(reader.position, keep_from)
+        self.assertIn(OTHER[:6400], reader.next_utterance(timeout=1))
+        reader.skip(0) # older than what was read already: everything goes
+        self.assertEqual(reader.position, capture.ring.written)
+        capture.stop()
+
+    def test_timeout_without_speech(self):
+        capture = AudioCapture(FrameSource(noise(2.0), realtime=True)).start()
+        start = time.monotonic()
+        self.assertIsNone(capture.reader().next_utterance(timeout=0.3))
+        self.assertLess(time.monotonic() - start, 1.0)
+        capture.stop()
+
+
+class TestAudioSession(unittest.TestCase):
+    def session(self, pcm, **kwargs):
+        sources = []
+        def factory():
+            sources.append(FrameSource(pcm, realtime=True))
+            return sources[-1]
+        return AudioSession(factory, calibrate_seconds=0.3, recalibrate_interval=0.2, **kwargs), sources
+
+    def test_device_opened_once_and_calibrated(self):
+        levels = []
+        session, sources = self.session(noise(3.0, amp=400), on_noise=levels.append)
+        self.assertTrue(session.start())
+        self.assertTrue(session.start())
+        time.sleep(0.8)
+        reader = session.reader()
+        session.stop()
+        self.assertEqual(len(sources), 1)
+        self.assertGreaterEqual(session.calibrations, 2)
+        self.assertAlmostEqual(session.noise_level, 400 / 3 ** 0.5, delta=60) # RMS of uniform noise
+        self.assertEqual(reader.vad.noise_floor, session.noise_level)
+        self.assertTrue(-50 < levels[-1] < -40) # dBFS
+
+    def environment(self, amp, context):
+        session, _ = self.session(noise(2.0, amp=amp), on_noise=context.set_environment_context)
+        session.start()
+        time.sleep(0.5)
+        session.stop()
+        return context.environment_mode, session.noise_db
+
+    def test_noise_reaches_context_awareness(self):
+        context = ContextAwareness(None)
+        # A quiet room: RMS ~100 (-50 dBFS)
+        self.assertEqual(self.environment(170, context)[0], "quiet")
+        # TV or chatter in the background: RMS ~1200 (-29 dBFS)
+        mode, level = self.environment(2000, context)
+        self.assertEqual(mode, "noisy")
+        self.assertAlmostEqual(level, -29, delta=2)
+
+    def test_noisy_threshold_from_config(self):
+        class Assistant:
+            config = {"audio": {"noisy_db": -55.0}}
+        self.assertEqual(self.environment(170, ContextAwareness(Assistant()))[0], "noisy")
+
+    def test_open_failure(self):
+        def factory():
+            raise OSError("no device")
+        session = AudioSession(factory)
+        self.assertFalse(session.start())
+        self.assertFalse(session.running)
+
+
+class TestBargeIn(unittest.TestCase):
+    def run_monitor(self, pcm, seconds):
+        session = AudioSession(lambda: FrameSource(pcm, realtime=True))
+        hits = []
+
+        def barge_in():
+            hits.append(time.monotonic()) # and Jarvis goes quiet, so is_speaking() is False again
+
+        monitor = self.monitor = BargeInMonitor(session, lambda: not hits, barge_in, settle_ms=300)
+        session.start()
+        start = time.monotonic()
+        monitor.start()
+        time.sleep(seconds)
+        monitor.stop()
+        session.stop()
+        return [t - start for t in hits]
+
+    def test_own_voice_is_not_a_barge_in(self):
+        echo = tone(1.5, 400, 600, amp=3000)
+        self.assertEqual(self.run_monitor(echo, 1.2), [])
+
+    def test_user_talking_over(self):
+        echo = tone(0.6, 400, 600, amp=3000)
+        hits = self.run_monitor(echo + tone(0.8, 300, 900, amp=12000) + echo, 1.6)
+        self.assertEqual(len(hits), 1)
+        self.assertAlmostEqual(hits[0], 0.9, delta=0.25) # 0.6 s echo + 0.3 s of talking
+        self.assertAlmostEqual(self.monitor.last_position / 32000, 0.6, delta=0.05) # where the talking began
+
+
+@unittest.skipIf(jarvis_wakeword.np is None, "numpy not installed")
+class TestOneBreath(unittest.TestCase):
+    def test_command_after_wake_word_is_kept(self):
+        spotter = WakeWordSpotter()
+        spotter.add_template(WORD)
+        stage = WakeWordStage("jarvis", spotter, auto_enroll=1)
+        command = tone(0.6, 1800, 1200)
+        capture = AudioCapture(FrameSource(noise(0.3) + WORD + noise(0.1, seed=4) + command + noise(1.0)))
+        reader = capture.reader()
+        capture.start()
+        pcm = reader.next_utterance(timeout=2)
+        capture.stop()
+        detected, rest, text = stage.detect(pcm, lambda: self.fail("cloud STT called"))
+        self.assertTrue(detected)
+        self.assertIsNone(text)
+        self.assertIn(command[:9600], rest)
+        self.assertNotIn(WORD[:9600], rest)
+
+
+if __name__ == "__main__":
+    unittest.main()
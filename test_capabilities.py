@@ -1,3 +1,4 @@
+import time
 import unittest
 from jarvis_advanced import JarvisAssistant
 from capabilities.manager import CapabilityManager
@@ -42,17 +43,14 @@ class TestCapabilities(unittest.TestCase):
         self.assertTrue(allowed_ok)
 
     def test_provenance(self):
-        # Check if log is created
-        import os
-        if os.path.exists("provenance_log.jsonl"):
-            os.remove("provenance_log.jsonl")
-            
         intent = {"type": "greeting"}
         # This hook runs manually in our current setup or via process_intent if we wired it
         prov = next(c for c in self.jarvis.capabilities.capabilities if c.name() == "Action Provenance")
+        start = time.time()
         prov.on_intent_parsed(intent)
         
-        self.assertTrue(os.path.exists("provenance_log.jsonl"))
+        logged = prov.query(since=start, types=["greeting"])
+        self.assertEqual(logged[-1]["intent"], intent)
 
 if __name__ == '__main__':
     unittest.main()
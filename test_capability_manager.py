@@ -0,0 +1,56 @@
+import unittest
+from capabilities.base import Capability
+from capabilities.manager import CapabilityManager, overrides
+from capabilities.compliance import ComplianceEngine
+from capabilities.context import ContextAwareness, AccessibilityManager
+
+class Shouter(Capability):
+    def name(self):
+        return "Shouter"
+
+    def on_output_generation(self, text):
+        return text.upper()
+
+class Blocker(Capability):
+    def name(self):
+        return "Blocker"
+
+    def check_compliance(self, intent):
+        return intent.get("type") != "forbidden"
+
+class TestCapabilityManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = CapabilityManager(None)
+        self.shouter = Shouter(None)
+        self.manager.register(ContextAwareness(None)) # overrides nothing
+        self.manager.register(self.shouter)
+        self.manager.register(Blocker(None))
+
+    def test_override_detection(self):
+        self.assertFalse(overrides(ContextAwareness(None), "on_output_generation"))
+        self.assertTrue(overrides(AccessibilityManager(None), "on_output_generation"))
+        self.assertTrue(overrides(ComplianceEngine(None), "check_compliance"))
+
+    def test_dispatch_only_overriding(self):
+        self.assertEqual([c.name() for c, _, _ in self.manager.dispatch["on_output_generation"]], ["Shouter"])
+        self.assertEqual(self.manager.dispatch["on_input_received"], ())
+        self.assertEqual(self.manager.process_output("hi"), "HI")
+        self.assertFalse(self.manager.check_compliance({"type": "forbidden"}))
+        self.assertTrue(self.manager.check_compliance({"type": "joke"}))
+
+    def test_enable_disable_rebuilds(self):
+        self.shouter.disable()
+        self.assertEqual(self.manager.process_output("hi"), "hi")
+        self.shouter.enabled = True
+        self.assertEqual(self.manager.process_output("hi"), "HI")
+
+    def test_timings(self):
+        for _ in range(3):
+            self.manager.process_output("hi")
+        report = self.manager.report()
+        self.assertEqual(report["Shouter"]["on_output_generation"]["calls"], 3)
+        self.assertGreater(report["Shouter"]["on_output_generation"]["total_ms"], 0)
+        self.assertNotIn("Context Awareness", report)
+
+if __name__ == '__main__':
+    unittest.main()
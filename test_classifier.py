@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+import jarvis_classifier
+from jarvis_classifier import IntentClassifier, load_ai_nlu_examples
+from jarvis_logging import LogPipeline
+
+class TestAINLUExamples(unittest.TestCase):
+    def test_load_from_log(self):
+        path = os.path.join(tempfile.mkdtemp(), "debug_log.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("[PARSE] Input: 'hello'\n")
+            f.write("[AI-NLU] Input: 'explai c basics' -> Output: {'type': 'web_search', 'query': 'explain c basics'}\n")
+            f.write("[AI-NLU] Input: 'its not activated' -> Output: {'type': 'unknown'}\n")
+        examples = load_ai_nlu_examples(path)
+        self.assertEqual(examples, [("explai c basics", {"type": "web_search", "query": "explain c basics"})])
+
+    def test_load_from_event_log(self):
+        path = os.path.join(tempfile.mkdtemp(), "jarvis_log.jsonl")
+        log = LogPipeline(path, max_bytes=1)
+        log.get_logger("nlu").info("ai_nlu", input="Opn Notepad", output={"type": "open_app", "target": "notepad"})
+        log.flush()
+        log.get_logger("nlu").info("ai_nlu", input="hmm", output={"type": "unknown"})
+        log.get_logger("handle").info("intent", intent={"type": "joke"})
+        log.flush() # rotates the first record into a .gz segment
+        log.close()
+        self.assertEqual(load_ai_nlu_examples(path), [("opn notepad", {"type": "open_app", "target": "notepad"})])
+
+@unittest.skipIf(jarvis_classifier.np is None, "numpy not installed")
+class TestIntentClassifier(unittest.TestCase):
+    def setUp(self):
+        self.clf = IntentClassifier()
+
+    def test_confident_match(self):
+        self.assertEqual(self.clf.predict("tell me a funny joke")["type"], "joke")
+        self.assertEqual(self.clf.predict("what time is it now")["type"], "get_time")
+
+    def test_risky_intents_always_escalate(self):
+        intent, score = self.clf.classify("never turn off the computer")
+        self.assertEqual(intent, {"type": "system_control", "action": "shutdown"})
+        self.assertGreaterEqual(score, self.clf.threshold) # a confident but wrong match
+        self.assertFalse(self.clf.confident(intent, score))
+        self.assertIsNone(self.clf.predict("never turn off the computer"))
+        self.assertIsNone(self.clf.predict("please shut down the system"))
+
+    def test_query_slot_filled(self):
+        intent = self.clf.predict("who is the president of america")
+        self.assertEqual(intent, {"type": "research_topic", "query": "who is the president of america"})
+
+    def test_low_confidence_escalates(self):
+        self.assertIsNone(self.clf.predict("xylophone quantum banana"))
+
+    def test_logged_example_reused_verbatim(self):
+        self.clf.add_example("open youtube please", {"type": "open_something", "target": "youtube"})
+        self.assertEqual(self.clf.predict("open youtube please")["target"], "youtube")
+        # similar but not identical: slot can't be filled locally
+        intent, _ = self.clf.classify("open youtube music please")
+        self.assertIsNone(intent)
+
+    def test_duplicates_replace_the_label(self):
+        n = len(self.clf.examples)
+        self.clf.add_example("open youtube please", {"type": "open_something", "target": "youtube"})
+        self.clf.add_example("Open  YouTube please", {"type": "web_search", "query": "youtube"})
+        self.assertEqual(len(self.clf.examples), n + 1)
+        self.assertEqual(self.clf.predict("open youtube please")["type"], "web_search")
+
+    def test_capped_and_refit_in_batches(self):
+        clf = IntentClassifier(max_examples=100, batch=8)
+        clf.classify("hello")
+        for i in range(300):
+            clf.add_example(f"play song number {i}", {"type": "play_music", "song": str(i)})
+            clf.classify("hello")
+        self.assertLessEqual(len(clf.examples), 100)
+        self.assertLess(clf.refits, 15)
+        # Schema examples stay, the oldest learned ones go
+        self.assertEqual(clf.predict("tell me a joke")["type"], "joke")
+        texts = [text for text, _ in clf.examples]
+        self.assertIn("play song number 299", texts)
+        self.assertNotIn("play song number 3", texts)
+
+if __name__ == '__main__':
+    unittest.main()
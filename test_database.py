@@ -0,0 +1,300 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+import database
+from database import JarvisDB, HistoryRetention
+
+class TestHistoryWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "history.db")
+        self.db = JarvisDB(self.path, history_batch=16, history_latency=5.0)
+
+    def tearDown(self):
+        self.db.close()
+
+    def count_on_disk(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_flush_makes_rows_durable(self):
+        for i in range(5):
+            self.db.log_interaction(f"cmd {i}", "chat", f"reply {i}")
+        self.assertTrue(self.db.flush(timeout=5))
+        self.assertEqual(self.count_on_disk(), 5)
+
+    def test_queued_rows_visible_to_reads(self):
+        # Long max latency: nothing is written yet, but reads see it
+        self.db.log_interaction("hello", "greeting", "hi there")
+        recent = self.db.get_recent_history(limit=5)
+        self.assertEqual(recent[0]["user_text"], "hello")
+        self.db.flush(timeout=5)
+        recent = self.db.get_recent_history(limit=5)
+        self.assertEqual([r["user_text"] for r in recent], ["hello"]) # not duplicated
+
+    def test_group_commit(self):
+        threads = [threading.Thread(target=lambda n=n: [self.db.log_interaction(f"t{n}-{i}", "chat", "ok")
+                                                       for i in range(40)]) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.db.flush(timeout=5)
+        stats = self.db.history_writer.stats()
+        self.assertEqual(self.count_on_disk(), 160)
+        self.assertEqual(stats["committed"], 160)
+        self.assertLessEqual(stats["batches"], 160 // 16 + 4)
+
+    def test_close_drains_queue(self):
+        for i in range(3):
+            self.db.log_interaction(f"cmd {i}", "chat", "ok")
+        self.db.close()
+        self.assertEqual(self.count_on_disk(), 3)
+        self.db.log_interaction("too late", "chat", "ok") # ignored, doesn't raise
+
+class TestSearch(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db = JarvisDB(os.path.join(self.tmpdir, "search.db"))
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_search_history_ranked(self):
+        self.db.log_interaction("order a pizza with olives", "chat", "Done")
+        self.db.log_interaction("the weather is nice", "weather", "Sunny")
+        self.db.log_interaction("pizza pizza pizza night", "chat", "Fun")
+        self.db.flush()
+        hits = self.db.search_history("pizza")
+        self.assertEqual([h["user_text"] for h in hits], ["pizza pizza pizza night", "order a pizza with olives"])
+        self.assertIn("[pizza]", hits[0]["snippet"])
+        self.assertEqual(self.db.search_history("pizza", intent="weather"), [])
+        self.assertEqual(self.db.search_history("pizza", exclude_intents=("chat",)), [])
+
+    def test_search_history_user_text_only(self):
+        self.db.log_interaction("what is the capital of france", "chat", "Paris is the capital of France")
+        self.db.log_interaction("plan a trip to paris", "chat", "Sure")
+        self.db.flush()
+        for fts in (True, False): # also the LIKE fallback
+            self.db.fts = fts
+            hits = self.db.search_history("paris", column="user_text")
+            self.assertEqual([h["user_text"] for h in hits], ["plan a trip to paris"])
+        self.assertEqual(len(self.db.search_history("paris")), 2)
+
+    def test_search_history_time_range(self):
+        with self.db._writing() as conn:
+            conn.execute("INSERT INTO history (timestamp, user_text, intent, response) VALUES (?, ?, ?, ?)",
+                         ("2020-01-01T10:00:00", "old pizza talk", "chat", "ok"))
+        self.db.log_interaction("new pizza talk", "chat", "ok")
+        self.db.flush()
+        hits = self.db.search_history("pizza", since="2021-01-01T00:00:00")
+        self.assertEqual([h["user_text"] for h in hits], ["new pizza talk"])
+        hits = self.db.search_history("pizza", until="2021-01-01T00:00:00")
+        self.assertEqual([h["user_text"] for h in hits], ["old pizza talk"])
+
+    def test_search_falls_back_to_any_term(self):
+        self.db.save_note("wifi password is hunter2")
+        self.assertEqual(self.db.search_notes("the wifi code")[0]["note"], "wifi password is hunter2")
+        self.assertEqual(self.db.search_notes('"; DROP TABLE notes; --'), [])
+
+    def test_fts_stays_in_sync(self):
+        self.db.save_note("buy milk")
+        with self.db._writing() as conn:
+            conn.execute("UPDATE notes SET note = 'buy bread'")
+        self.assertEqual(self.db.search_notes("milk"), [])
+        self.assertEqual(len(self.db.search_notes("bread")), 1)
+        with self.db._writing() as conn:
+            conn.execute("DELETE FROM notes")
+        self.assertEqual(self.db.search_notes("bread"), [])
+
+    def test_existing_rows_indexed(self):
+        path = os.path.join(self.tmpdir, "legacy.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, note TEXT)")
+        conn.execute("INSERT INTO notes (timestamp, note) VALUES ('2020-01-01', 'legacy note about cats')")
+        conn.commit()
+        conn.close()
+        db = JarvisDB(path)
+        self.assertEqual(len(db.search_notes("cats")), 1)
+        db.close()
+
+class TestConnections(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db = JarvisDB(os.path.join(self.tmpdir, "wal.db"), read_pool_size=2)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_wal_mode(self):
+        self.assertEqual(self.db.conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+    def test_concurrent_reads_and_writes(self):
+        errors = []
+        def worker(n):
+            try:
+                for i in range(50):
+                    self.db.set_preference(f"k{n}", str(i))
+                    self.assertEqual(self.db.get_preference(f"k{n}"), str(i))
+                    self.db.log_interaction(f"t{n}", "chat", "ok")
+                    self.db.get_recent_history(limit=3)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(self.db._reader_count, 2)
+
+    def test_memory_database(self):
+        db = JarvisDB(":memory:")
+        db.set_preference("voice", "male")
+        self.assertEqual(db.get_preference("voice"), "male")
+        db.close()
+
+    def test_close_releases_everything(self):
+        for i in range(3):
+            db = JarvisDB(os.path.join(self.tmpdir, f"closed{i}.db"))
+            db.log_interaction("hello", "greeting", "Hi")
+            db.get_recent_history() # opens a reader
+            writer = db.conn
+            self.assertIn(db, database._open_dbs)
+            db.close()
+            db.close()
+            self.assertNotIn(db, database._open_dbs) # no exit handler left behind
+            with self.assertRaises(sqlite3.ProgrammingError):
+                writer.execute("SELECT 1")
+        reopened = JarvisDB(os.path.join(self.tmpdir, "closed0.db"))
+        self.assertEqual(reopened.get_recent_history()[0]["user_text"], "hello") # queued row was committed
+        reopened.close()
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "cache.db")
+        self.db = JarvisDB(self.path)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_reads_served_from_memory(self):
+        self.db.set_preference("user_name", "Tony")
+        for _ in range(10):
+            self.assertEqual(self.db.get_preference("user_name"), "Tony")
+        self.assertIsNone(self.db.get_preference("missing"))
+        stats = self.db.cache_stats()["preferences"]
+        self.assertEqual((stats["hits"], stats["misses"], stats["loads"]), (11, 0, 1))
+
+    def test_write_through(self):
+        self.db.set_preference("volume", 5)
+        self.assertEqual(self.db.get_preference("volume"), "5") # what SQLite stored
+        self.db.set_preference("volume", "7")
+        self.assertEqual(self.db.get_preference("volume"), "7")
+        other = JarvisDB(self.path) # a fresh process sees the same data
+        self.assertEqual(other.get_preference("volume"), "7")
+        other.close()
+
+    def test_skills(self):
+        steps = [{"type": "open_app", "app": "notepad"}, {"type": "type_text", "text": "hi"}]
+        self.db.add_skill("Morning", steps)
+        got = self.db.get_skill("morning")
+        self.assertEqual(got, steps)
+        got.append({"type": "joke"}) # callers get their own list
+        self.assertEqual(len(self.db.get_skill("morning")), 2)
+        self.assertIsNone(self.db.get_skill("evening"))
+        self.assertEqual(self.db.cache_stats()["skills"]["hit_rate"], 1.0)
+
+    def test_invalidate_reloads(self):
+        with self.db._writing() as conn: # changed behind the cache's back
+            conn.execute("INSERT INTO preferences (key, value) VALUES ('voice', 'female')")
+        self.assertIsNone(self.db.get_preference("voice"))
+        self.db.preferences.invalidate()
+        self.assertEqual(self.db.get_preference("voice"), "female")
+        self.assertEqual(self.db.cache_stats()["preferences"]["misses"], 1)
+
+class TestRetention(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db = JarvisDB(os.path.join(self.tmpdir, "retention.db"))
+
+    def tearDown(self):
+        self.db.close()
+
+    def add_rows(self, rows):
+        with self.db._writing() as conn:
+            conn.executemany("INSERT INTO history (timestamp, user_text, intent, response) VALUES (?, ?, ?, ?)", rows)
+
+    def test_age_cap_rolls_up(self):
+        self.add_rows([("2020-01-01T10:00:00", "old weather", "weather", "Sunny"),
+                       ("2020-01-01T11:00:00", "old weather again", "weather", "Rain"),
+                       ("2020-01-02T09:00:00", "old joke", "joke", "Ha")])
+        self.db.log_interaction("new weather", "weather", "Cloudy")
+        self.db.flush(timeout=5)
+        self.assertEqual(self.db.compact_history(max_age_days=30, batch=2), 3)
+        self.assertEqual([r["user_text"] for r in self.db.get_recent_history(10)], ["new weather"])
+        daily = {(r[0], r[1]): r[2] for r in self.db.conn.execute("SELECT * FROM history_daily")}
+        self.assertEqual(daily, {("2020-01-01", "weather"): 2, ("2020-01-02", "joke"): 1})
+        self.assertEqual(self.db.get_intent_counts(), {"weather": 3, "joke": 1})
+        self.assertEqual(self.db.search_history("old"), []) # FTS rows deleted too
+
+    def test_row_cap_keeps_newest(self):
+        for i in range(25):
+            self.db.log_interaction(f"cmd {i}", "chat", "ok")
+        self.db.flush(timeout=5)
+        self.assertEqual(self.db.compact_history(max_rows=10, batch=4), 15)
+        recent = self.db.get_recent_history(limit=20)
+        self.assertEqual([r["user_text"] for r in recent], [f"cmd {i}" for i in range(24, 14, -1)])
+        self.assertEqual(self.db.get_intent_counts(), {"chat": 25})
+        self.assertEqual(self.db.compact_history(max_rows=10), 0)
+
+    def test_existing_file_converted_by_retention(self):
+        path = os.path.join(self.tmpdir, "old.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE legacy (x TEXT)") # a file from before incremental auto_vacuum
+        conn.close()
+        db = JarvisDB(path)
+        self.assertEqual(db.conn.execute("PRAGMA auto_vacuum").fetchone()[0], 0) # no VACUUM on open
+        HistoryRetention(db).run_once()
+        self.assertEqual(db.conn.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+        self.assertFalse(db.migrate_auto_vacuum())
+        db.close()
+
+    def test_large_file_migration_skipped(self):
+        path = os.path.join(self.tmpdir, "big.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE legacy (x TEXT)")
+        conn.close()
+        db = JarvisDB(path)
+        HistoryRetention(db, migrate_max_mb=0).run_once() # every file is "too big"
+        self.assertEqual(db.conn.execute("PRAGMA auto_vacuum").fetchone()[0], 0)
+        self.assertTrue(db.migrate_auto_vacuum()) # explicit migration, no limit
+        db.close()
+
+    def test_incremental_vacuum(self):
+        self.assertEqual(self.db.conn.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+        self.add_rows([("2020-01-01T10:00:00", "x" * 2000, "chat", "y" * 2000)] * 200)
+        self.db.compact_history(max_age_days=1)
+        freed = self.db.reclaim_space()
+        self.assertGreater(freed, 0)
+        self.assertEqual(self.db.conn.execute("PRAGMA freelist_count").fetchone()[0], 0)
+
+class TestGlobalInstance(unittest.TestCase):
+    def test_import_leaves_jarvis_db_alone(self):
+        cwd = tempfile.mkdtemp()
+        code = "import database; print(type(database.__dict__.get('db')).__name__)"
+        env = {**os.environ, "PYTHONPATH": os.path.dirname(os.path.abspath(__file__))}
+        out = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True)
+        self.assertEqual(out.stdout.strip(), "NoneType")
+        self.assertFalse(os.path.exists(os.path.join(cwd, "jarvis.db")))
+
+if __name__ == '__main__':
+    unittest.main()
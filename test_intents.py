@@ -0,0 +1,74 @@
+import datetime
+import unittest
+from jarvis_intents import IntentMatcher, KeywordAutomaton, period_range
+
+CONFIG = {
+    "wake_word": "jarvis",
+    "apps": {"notepad": "notepad.exe", "calculator": "calc.exe"}
+}
+
+class TestKeywordAutomaton(unittest.TestCase):
+    def test_overlapping_phrases(self):
+        ac = KeywordAutomaton(["he", "she", "his", "hers"])
+        found = sorted((start, ac.phrases[idx]) for start, idx in ac.find("ushers"))
+        self.assertEqual(found, [(1, "she"), (2, "he"), (2, "hers")])
+
+class TestIntentMatcher(unittest.TestCase):
+    def setUp(self):
+        self.matcher = IntentMatcher(CONFIG)
+
+    def test_simple_intents(self):
+        self.assertEqual(self.matcher.match("what is the time")["type"], "get_time")
+        self.assertEqual(self.matcher.match("hello")["type"], "greeting")
+        self.assertEqual(self.matcher.match("random gibberish")["type"], "unknown")
+
+    def test_priority_order(self):
+        # Vision before open
+        intent = self.matcher.match("open virtual keyboard")
+        self.assertEqual(intent["type"], "vision_control")
+        self.assertEqual(intent["mode"], "keyboard")
+        # "shutdown yourself" is exit, not system_control
+        self.assertEqual(self.matcher.match("shutdown yourself")["type"], "exit")
+
+    def test_fall_through(self):
+        # system_control rule fires but declines, falls through to unknown
+        self.assertEqual(self.matcher.match("go to sleep")["type"], "unknown")
+        self.assertEqual(self.matcher.match("shutdown pc")["action"], "shutdown")
+
+    def test_slots(self):
+        self.assertEqual(self.matcher.match("jarvis open notepad please"),
+                         {"raw": "open notepad please", "type": "open_something", "target": "notepad"})
+        self.assertEqual(self.matcher.match("play ishq song from youtube")["song"], "ishq song")
+        intent = self.matcher.match("open whatsapp and send hi to mom")
+        self.assertEqual((intent["type"], intent["msg"], intent["contact"]), ("whatsapp_msg", "hi", "mom"))
+        self.assertEqual(self.matcher.match("tell me a joke in kannada")["language"], "kannada")
+        self.assertEqual(self.matcher.match("open youtube and search for ishq")["query"], "ishq")
+
+class TestMemorySearchIntents(unittest.TestCase):
+    def setUp(self):
+        self.matcher = IntentMatcher(CONFIG)
+
+    def test_search_history(self):
+        self.assertEqual(self.matcher.match("what did I say about pizza last week"),
+                         {"raw": "what did i say about pizza last week", "type": "search_history",
+                          "query": "pizza", "period": "last week"})
+        # beats the weather rule
+        self.assertEqual(self.matcher.match("what did i tell you about the weather")["type"], "search_history")
+        self.assertEqual(self.matcher.match("did i mention sam in the last 3 days")["period"], "last 3 days")
+        self.assertEqual(self.matcher.match("what did i say about")["type"], "unknown")
+
+    def test_search_notes(self):
+        self.assertEqual(self.matcher.match("find my note about the wifi password")["query"], "the wifi password")
+        self.assertEqual(self.matcher.match("search my notes for groceries")["query"], "groceries")
+        self.assertEqual(self.matcher.match("remember that the note is fine")["type"], "remember")
+
+    def test_period_range(self):
+        now = datetime.datetime(2024, 5, 15, 13, 30) # a Wednesday
+        self.assertEqual(period_range("yesterday", now), ("2024-05-14T00:00:00", "2024-05-15T00:00:00"))
+        self.assertEqual(period_range("last week", now), ("2024-05-06T00:00:00", "2024-05-13T00:00:00"))
+        self.assertEqual(period_range("last month", now), ("2024-04-01T00:00:00", "2024-05-01T00:00:00"))
+        self.assertEqual(period_range("last 2 days", now), ("2024-05-13T13:30:00", None))
+        self.assertEqual(period_range(None, now), (None, None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import asyncio
+import unittest
+from jarvis_jobs import JobQueue, split_steps
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        self.ran = []
+
+    async def notify(self, job):
+        self.events.append((job.id, job.status, job.step))
+
+    def make_queue(self, delay=0.0, **kwargs):
+        async def runner(job, step):
+            self.ran.append(step)
+            if step == "boom":
+                raise RuntimeError("step failed")
+            await asyncio.sleep(delay)
+        return JobQueue(runner, self.notify, step_delay=0.0, **kwargs)
+
+    def test_split_steps(self):
+        self.assertEqual(split_steps("open notepad and type hello"), ["open notepad", "type hello"])
+        self.assertEqual(split_steps("  "), [])
+
+    def test_compound_job_runs_in_order(self):
+        async def go():
+            q = self.make_queue()
+            q.start()
+            job = await q.submit("open notepad and type hello")
+            await q.queue.join()
+            await q.stop()
+            return job
+        job = asyncio.run(go())
+        self.assertEqual(job.status, "done")
+        self.assertEqual(self.ran, ["open notepad", "type hello"])
+        statuses = [s for i, s, _ in self.events if i == job.id]
+        self.assertEqual(statuses, ["queued", "running", "running", "done"])
+
+    def test_workers_run_in_parallel(self):
+        async def go():
+            q = self.make_queue(delay=0.2, workers=3)
+            q.start()
+            start = asyncio.get_running_loop().time()
+            for i in range(3):
+                await q.submit(f"cmd {i}")
+            await q.queue.join()
+            await q.stop()
+            return asyncio.get_running_loop().time() - start
+        self.assertLess(asyncio.run(go()), 0.5)
+
+    def test_failure_reported(self):
+        async def go():
+            q = self.make_queue()
+            q.start()
+            job = await q.submit("boom and never")
+            await q.queue.join()
+            await q.stop()
+            return job
+        job = asyncio.run(go())
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "step failed")
+        self.assertNotIn("never", self.ran)
+
+    def test_backpressure(self):
+        async def go():
+            q = self.make_queue(max_pending=2) # workers not started
+            return [(await q.submit(f"cmd {i}")).status for i in range(3)]
+        self.assertEqual(asyncio.run(go()), ["queued", "queued", "rejected"])
+
+    def test_cancel_queued_and_running(self):
+        async def go():
+            q = self.make_queue(delay=5.0, workers=1)
+            q.start()
+            running = await q.submit("slow")
+            queued = await q.submit("later")
+            await asyncio.sleep(0.05)
+            self.assertTrue(await q.cancel(queued.id))
+            self.assertTrue(await q.cancel(running.id))
+            await asyncio.wait_for(q.queue.join(), 1.0)
+            self.assertFalse(await q.cancel(running.id)) # already finished
+            await q.stop()
+            return running, queued
+        running, queued = asyncio.run(go())
+        self.assertEqual(running.status, "cancelled")
+        self.assertEqual(queued.status, "cancelled")
+        self.assertEqual(self.ran, ["slow"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import asyncio
+import time
+import unittest
+from fake_ollama import FakeOllamaServer
+from jarvis_llm import LLMClient
+
+def _echo(req):
+    # streams the prompt back word by word, plain calls get "echo: <prompt>"
+    return req["prompt"] if req.get("stream") else "echo: " + req["prompt"]
+
+class TestLLMClient(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeOllamaServer(response=_echo).start()
+        self.client = LLMClient({"ai_provider": "ollama", "llm": {"ollama_url": self.server.url}})
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_connection_reused(self):
+        for i in range(5):
+            self.assertEqual(self.client.generate(f"hi {i}"), f"echo: hi {i}")
+        self.assertEqual(self.client.ollama.created, 1)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_system_prompt_passed(self):
+        result = self.client.ollama_generate("hi", system="be brief")
+        self.assertEqual(result["response"], "echo: hi")
+        self.assertEqual(self.server.requests[-1]["system"], "be brief")
+
+    def test_stream(self):
+        pieces = list(self.client.stream("one two three"))
+        self.assertEqual(pieces, ["one ", "two ", "three "])
+        # stream fully drained, so the connection goes back to the pool
+        self.assertEqual(self.client.generate("again"), "echo: again")
+        self.assertEqual(self.client.ollama.created, 1)
+
+    def test_unreachable_returns_none(self):
+        client = LLMClient({"ai_provider": "ollama", "llm": {"ollama_url": "http://127.0.0.1:9", "connect_timeout": 0.5}})
+        self.assertIsNone(client.generate("hi"))
+
+class TestAsyncLLMClient(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeOllamaServer(response=_echo).start()
+        self.client = LLMClient({"ai_provider": "ollama", "llm": {"ollama_url": self.server.url}})
+
+    def tearDown(self):
+        self.server.stop()
+
+    def run_async(self, coro):
+        async def wrapper():
+            try:
+                return await coro
+            finally:
+                self.client.close()
+        return asyncio.run(wrapper())
+
+    def test_generate_reuses_connection(self):
+        async def go():
+            return [await self.client.agenerate(f"hi {i}") for i in range(3)]
+        self.assertEqual(self.run_async(go()), ["echo: hi 0", "echo: hi 1", "echo: hi 2"])
+        self.assertEqual(self.client.aollama.created, 1)
+
+    def test_stream(self):
+        async def go():
+            pieces = [p async for p in self.client.astream("one two three")]
+            return pieces, await self.client.agenerate("again")
+        pieces, again = self.run_async(go())
+        self.assertEqual(pieces, ["one ", "two ", "three "])
+        self.assertEqual(again, "echo: again")
+        self.assertEqual(self.client.aollama.created, 1)
+
+    def test_concurrent_requests(self):
+        self.server.delay = 0.3
+        async def go():
+            return await asyncio.gather(*(self.client.agenerate(f"q{i}") for i in range(4)))
+        start = time.monotonic()
+        results = self.run_async(go())
+        self.assertEqual(results, [f"echo: q{i}" for i in range(4)])
+        self.assertLess(time.monotonic() - start, 1.0) # in parallel, not 4 x 0.3s
+
+    def test_http_error_returns_none(self):
+        self.server.status = 500
+        self.assertIsNone(self.run_async(self.client.agenerate("hi")))
+
+if __name__ == '__main__':
+    unittest.main()
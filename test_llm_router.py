@@ -0,0 +1,141 @@
+import asyncio
+import time
+import unittest
+from capabilities.safety import ResilienceManager
+from fake_ollama import FakeOllamaServer
+from jarvis_llm import LLMClient
+from jarvis_router import LLMRouter
+
+class _Assistant:
+    def __init__(self, config=None):
+        self.config = config or {}
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.res = ResilienceManager(_Assistant({"circuit_breaker": {"failure_threshold": 3, "cooldown_seconds": 0.2}}))
+
+    def test_opens_after_threshold(self):
+        for _ in range(2):
+            self.res.record_failure("a")
+        self.assertTrue(self.res.allow("a"))
+        self.res.record_failure("a")
+        self.assertFalse(self.res.allow("a"))
+        self.assertTrue(self.res.is_open("a"))
+
+    def test_half_open_single_trial(self):
+        for _ in range(3):
+            self.res.record_failure("a")
+        time.sleep(0.25)
+        self.assertFalse(self.res.is_open("a"))
+        self.assertTrue(self.res.allow("a"))
+        self.assertFalse(self.res.allow("a")) # trial already taken
+        self.res.record_success("a")
+        self.assertEqual(self.res.breaker_states()["a"]["state"], "closed")
+
+    def test_failed_trial_reopens(self):
+        for _ in range(3):
+            self.res.record_failure("a")
+        time.sleep(0.25)
+        self.assertTrue(self.res.allow("a"))
+        self.res.record_failure("a")
+        self.assertEqual(self.res.breaker_states()["a"]["state"], "open")
+
+class TestLLMRouter(unittest.TestCase):
+    """Two fake Ollama servers stand in for two providers."""
+    def setUp(self):
+        self.servers = {"a": FakeOllamaServer(response="from a").start(),
+                        "b": FakeOllamaServer(response="from b").start()}
+        self.clients = {name: LLMClient({"llm": {"ollama_url": s.url, "read_timeout": 5.0}})
+                        for name, s in self.servers.items()}
+        self.resilience = ResilienceManager(_Assistant({"circuit_breaker": {"cooldown_seconds": 60}}))
+        providers = {name: (lambda req, c=c: c.generate(req["prompt"], provider="ollama"))
+                     for name, c in self.clients.items()}
+        self.router = LLMRouter(providers, self.resilience, order=["a", "b"], hedge_delay=0.2, min_samples=3)
+
+    def tearDown(self):
+        self.router.shutdown()
+        for name in self.servers:
+            self.clients[name].close()
+            self.servers[name].stop()
+
+    def test_prefers_first_provider(self):
+        self.assertEqual(self.router.call({"prompt": "hi"}), ("from a", "a"))
+        self.assertEqual(len(self.servers["b"].requests), 0)
+        self.assertEqual(self.router.report()["a"]["samples"], 1)
+
+    def test_hedges_when_primary_slow(self):
+        self.servers["a"].delay = 1.0
+        start = time.monotonic()
+        result = self.router.call({"prompt": "hi"})
+        self.assertEqual(result, ("from b", "b"))
+        self.assertLess(time.monotonic() - start, 0.9)
+        self.assertEqual(self.router.hedges, 1)
+
+    def test_hedge_delay_follows_p90(self):
+        for _ in range(5):
+            self.router.record("a", 0.05, True)
+        self.assertAlmostEqual(self.router.hedge_after("a"), 0.05)
+        self.assertEqual(self.router.hedge_after("b"), 0.2) # not enough samples yet
+
+    def test_failover_and_breaker(self):
+        self.servers["a"].status = 500
+        for _ in range(3):
+            self.assertEqual(self.router.call({"prompt": "hi"}), ("from b", "b"))
+        self.assertEqual(self.router.report()["a"]["circuit"], "open")
+        # Open circuit: "a" isn't even tried any more
+        seen = len(self.servers["a"].requests)
+        self.assertEqual(self.router.generate("hi"), "from b")
+        self.assertEqual(len(self.servers["a"].requests), seen)
+        self.assertEqual(self.router.candidates(), ["b"])
+
+    def test_all_failing(self):
+        for s in self.servers.values():
+            s.status = 500
+        self.assertEqual(self.router.call({"prompt": "hi"}), (None, None))
+
+    def test_stream_records_outcome(self):
+        stream_fn = lambda name, prompt, system: self.clients[name].stream(prompt, provider="ollama")
+        self.assertEqual("".join(self.router.stream("hi", stream_fn=stream_fn)).strip(), "from a")
+        self.servers["a"].status = 500
+        self.assertEqual(list(self.router.stream("hi", stream_fn=stream_fn)), [])
+        self.assertAlmostEqual(self.router.report()["a"]["error_rate"], 0.5)
+
+    def test_stream_error_reaches_caller(self):
+        def broken():
+            yield "Half an"
+            raise ConnectionError("stream reset")
+        with self.assertRaises(ConnectionError):
+            list(self.router.track("a", broken()))
+        self.assertEqual(self.router.report()["a"]["error_rate"], 1.0) # a partial answer is still a failure
+
+class TestAsyncLLMRouter(unittest.TestCase):
+    def setUp(self):
+        self.resilience = ResilienceManager(_Assistant())
+        self.delays = {"a": 0.0, "b": 0.0}
+        self.failing = set()
+
+        async def provider(name, req):
+            await asyncio.sleep(self.delays[name])
+            return None if name in self.failing else f"from {name}"
+
+        self.provider = provider
+        self.router = LLMRouter({"a": None, "b": None}, self.resilience, order=["a", "b"], hedge_delay=0.1)
+
+    def tearDown(self):
+        self.router.shutdown()
+
+    def test_hedges_when_primary_slow(self):
+        self.delays["a"] = 1.0
+        start = time.monotonic()
+        result = asyncio.run(self.router.acall({}, self.provider))
+        self.assertEqual(result, ("from b", "b"))
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(self.router.hedges, 1)
+
+    def test_failover(self):
+        self.failing.add("a")
+        self.assertEqual(asyncio.run(self.router.acall({}, self.provider)), ("from b", "b"))
+        self.assertEqual(self.router.report()["a"]["error_rate"], 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from jarvis_logging import LogPipeline, read_records, rotated_segments
+
+class TestLogPipeline(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "events.jsonl")
+
+    def lines(self):
+        with open(self.path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_buffered_until_flush(self):
+        log = LogPipeline(self.path)
+        log.get_logger("nlu").info("ai_nlu", input="hi", output={"type": "greeting"})
+        self.assertFalse(os.path.exists(self.path)) # nothing on the caller's thread
+        self.assertEqual(log.flush(), 1)
+        record = self.lines()[0]
+        self.assertEqual((record["component"], record["event"], record["output"]), ("nlu", "ai_nlu", {"type": "greeting"}))
+        log.close()
+
+    def test_component_levels(self):
+        log = LogPipeline(self.path, level="info", levels={"handle": "warning", "nlu": "debug"})
+        log.get_logger("handle").info("intent")
+        log.get_logger("nlu").debug("detail")
+        log.get_logger("listen").debug("skipped")
+        log.get_logger("listen").info("heard")
+        log.flush()
+        self.assertEqual([r["event"] for r in self.lines()], ["detail", "heard"])
+        self.assertFalse(log.get_logger("handle").enabled("info"))
+        log.close()
+
+    def test_background_writer(self):
+        log = LogPipeline(self.path, flush_interval=0.05).start()
+        log.get_logger("listen").info("heard", text="open notepad")
+        deadline = time.time() + 5
+        while log.stats()["written"] < 1 and time.time() < deadline:
+            time.sleep(0.02)
+        log.close()
+        self.assertEqual(self.lines()[0]["text"], "open notepad")
+
+    def test_concurrent_flushes_keep_order(self):
+        class Slow:
+            def __str__(self): # formatted while the first flush holds its batch
+                time.sleep(0.2)
+                return "slow"
+
+        log = LogPipeline(self.path)
+        logger = log.get_logger("listen")
+        logger.info("heard", n=0, slow=Slow())
+        first = threading.Thread(target=log.flush)
+        first.start()
+        time.sleep(0.05)
+        logger.info("heard", n=1)
+        log.flush() # e.g. close() while the writer thread is mid-flush
+        first.join()
+        log.close()
+        self.assertEqual([r["n"] for r in self.lines()], [0, 1])
+
+    def test_size_rotation(self):
+        log = LogPipeline(self.path, max_bytes=200, backups=2)
+        for i in range(5):
+            log.get_logger("handle").info("intent", n=i, pad="x" * 200)
+            log.flush()
+        log.close()
+        segments = rotated_segments(self.path)
+        self.assertEqual(len(segments), 2) # older ones deleted
+        with gzip.open(segments[-1], "rt", encoding="utf-8") as f:
+            self.assertEqual(json.loads(f.readline())["n"], 3)
+        self.assertEqual([r["n"] for r in read_records(self.path)], [2, 3, 4])
+
+    def test_time_rotation(self):
+        log = LogPipeline(self.path, rotate_seconds=0.05)
+        log.get_logger("listen").info("heard", text="one")
+        log.flush()
+        time.sleep(0.1)
+        log.get_logger("listen").info("heard", text="two")
+        log.flush()
+        log.close()
+        self.assertEqual(len(rotated_segments(self.path)), 1)
+        self.assertEqual([r["text"] for r in self.lines()], ["two"])
+
+if __name__ == '__main__':
+    unittest.main()
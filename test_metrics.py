@@ -0,0 +1,71 @@
+import unittest
+from jarvis_metrics import MetricsSampler, StatsStream, delta
+
+class FakeProbe:
+    def __init__(self):
+        self.values = {"cpu": 10.0, "ram": 50.0, "battery": 80, "plugged": True}
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return dict(self.values)
+
+class TestMetricsSampler(unittest.TestCase):
+    def setUp(self):
+        self.probe = FakeProbe()
+        self.sampler = MetricsSampler(interval=1.0, history=3, probe=self.probe)
+
+    def test_ring_buffer_and_average(self):
+        for cpu in (10.0, 20.0, 30.0, 40.0):
+            self.probe.values["cpu"] = cpu
+            self.sampler.sample()
+        self.assertEqual([v for _, v in self.sampler.series("cpu")], [20.0, 30.0, 40.0])
+        self.assertAlmostEqual(self.sampler.average("cpu"), 30.0)
+
+    def test_latest_reuses_sample(self):
+        self.sampler.sample()
+        for _ in range(5):
+            self.sampler.latest(max_age=60)
+        self.assertEqual(self.probe.calls, 1)
+        self.sampler.latest(max_age=-1) # too old, takes a new one
+        self.assertEqual(self.probe.calls, 2)
+
+    def test_delta(self):
+        self.assertEqual(delta(None, {"cpu": 1}), {"cpu": 1})
+        self.assertEqual(delta({"cpu": 10.0, "plugged": True}, {"cpu": 10.3, "plugged": False}), {"plugged": False})
+        self.assertEqual(delta({"cpu": 10.0}, {"cpu": 12.0}), {"cpu": 12.0})
+
+class TestStatsStream(unittest.TestCase):
+    def setUp(self):
+        self.probe = FakeProbe()
+        self.sampler = MetricsSampler(interval=1.0, probe=self.probe)
+        self.sampler.sample()
+        self.stream = StatsStream(self.sampler, default_interval=1.0)
+
+    def test_full_then_deltas(self):
+        self.stream.subscribe("a")
+        (_, first), = self.stream.updates(now=0)
+        self.assertTrue(first["full"])
+        self.assertEqual(first["data"]["cpu"], 10.0)
+        # nothing changed -> nothing sent
+        self.assertEqual(self.stream.updates(now=1), [])
+        self.probe.values["cpu"] = 55.0
+        self.sampler.sample()
+        (_, second), = self.stream.updates(now=2)
+        self.assertEqual(second["data"], {"cpu": 55.0})
+        self.assertFalse(second["full"])
+
+    def test_per_client_rate(self):
+        self.stream.subscribe("fast")
+        self.stream.subscribe("slow", interval=5.0)
+        sent = {"fast": 0, "slow": 0}
+        for t in range(10):
+            self.probe.values["cpu"] = 10.0 * t
+            self.sampler.sample()
+            for key, _ in self.stream.updates(now=t):
+                sent[key] += 1
+        self.assertEqual(sent, {"fast": 10, "slow": 2})
+        self.assertEqual(self.probe.calls, 11) # the stream itself never probes
+
+if __name__ == '__main__':
+    unittest.main()
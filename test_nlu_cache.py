@@ -0,0 +1,59 @@
+import os
+import tempfile
+import time
+import unittest
+from database import JarvisDB
+from jarvis_nlu_cache import IntentCache, normalize_utterance
+
+class TestIntentCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db = JarvisDB(os.path.join(self.tmpdir, "cache.db"))
+
+    def test_normalize(self):
+        self.assertEqual(normalize_utterance("Jarvis, open YouTube please!"), "open youtube please")
+        self.assertEqual(normalize_utterance("open youtube.com?"), "open youtube.com")
+
+    def test_hit_and_miss(self):
+        cache = IntentCache(self.db)
+        self.assertIsNone(cache.get("open youtube please"))
+        cache.put("open youtube please", {"type": "open_youtube"})
+        self.assertEqual(cache.get("Jarvis open YouTube, please.")["type"], "open_youtube")
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_free_text_slots_need_the_exact_utterance(self):
+        cache = IntentCache(self.db)
+        cache.put("type hello, world", {"type": "keyboard_type", "text": "hello, world"})
+        cache.put("execute shutdown /s", {"type": "system_command", "command": "shutdown /s"})
+        self.assertIsNone(cache.get("type hello world"))
+        self.assertIsNone(cache.get("execute shutdown s"))
+        self.assertEqual(cache.get("Jarvis Type hello, world")["text"], "hello, world")
+        self.assertEqual(IntentCache(self.db).get("execute shutdown /s")["command"], "shutdown /s")
+
+    def test_lru_eviction(self):
+        cache = IntentCache(None, max_size=2)
+        cache.put("a", {"type": "a"})
+        cache.put("b", {"type": "b"})
+        cache.get("a")
+        cache.put("c", {"type": "c"})
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+
+    def test_ttl(self):
+        cache = IntentCache(None, ttl_seconds=0.05)
+        cache.put("hello", {"type": "greeting"})
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("hello"))
+
+    def test_persistence(self):
+        cache = IntentCache(self.db)
+        cache.put("shutdown the system please", {"type": "system_control", "action": "shutdown"})
+        cache.put("hello", {"type": "greeting"}, persist=False)
+
+        reloaded = IntentCache(self.db)
+        self.assertEqual(reloaded.get("shutdown the system please")["action"], "shutdown")
+        self.assertIsNone(reloaded.get("hello"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+import jarvis_prompts
+from jarvis_prompts import nlu_template, estimate_tokens
+
+class TestPromptTemplates(unittest.TestCase):
+    def test_prefix_is_static(self):
+        template = nlu_template({})
+        sys_a, user_a = template.render(text="open notepad")
+        sys_b, user_b = template.render(text="what is the time")
+        self.assertEqual(sys_a, sys_b)
+        self.assertIn("open notepad", user_a)
+        self.assertNotIn("open notepad", sys_a)
+        self.assertEqual(template.render_full(text="hi"), sys_a + user_a.replace("open notepad", "hi"))
+
+    def test_variant_selection(self):
+        self.assertEqual(nlu_template({"nlu_prompt": "compact"}).name, "nlu_compact")
+        self.assertEqual(nlu_template({"nlu_prompt": "full"}).name, "nlu_full")
+        self.assertEqual(nlu_template({"nlu_prompt": "bogus"}).name, "nlu_full")
+
+    def test_compact_is_smaller_but_keeps_schema(self):
+        full = jarvis_prompts.NLU_FULL
+        compact = jarvis_prompts.NLU_COMPACT
+        self.assertLess(compact.static_tokens, full.static_tokens / 2)
+        self.assertIn(jarvis_prompts.INTENT_SCHEMA, compact.prefix)
+
+    def test_token_accounting(self):
+        template = jarvis_prompts.PromptTemplate("t", "static prefix", "IN: {text}")
+        _, user = template.render(text="hello world")
+        template.record(user, prompt_tokens=40, cached_tokens=30)
+        stats = template.stats()
+        self.assertEqual(stats["calls"], 1)
+        self.assertEqual(stats["avg_request_tokens"], estimate_tokens(user))
+        self.assertEqual(stats["cached_tokens"], 30)
+
+if __name__ == '__main__':
+    unittest.main()
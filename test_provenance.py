@@ -0,0 +1,86 @@
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+from capabilities.provenance import ProvenanceStore, main
+
+def entry(ts, intent_type, **extra):
+    return {"timestamp": ts, "intent": {"type": intent_type, **extra}, "outcome": "parsed", "user": "primary_user"}
+
+class TestProvenanceStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def fill(self, store, n=300, start=1000.0):
+        for i in range(n):
+            store.append(entry(start + i, "system_command" if i % 10 == 0 else "chat", n=i))
+        store.flush()
+
+    def test_buffered_until_flush(self):
+        store = ProvenanceStore(self.dir)
+        store.append(entry(1.0, "greeting"))
+        self.assertEqual(store.stats()["entries"], 0)
+        self.assertEqual([e["intent"]["type"] for e in store.query()], ["greeting"]) # query flushes
+        store.close()
+
+    def test_rotation_and_queries(self):
+        store = ProvenanceStore(self.dir, segment_bytes=2000)
+        self.fill(store)
+        self.assertGreater(store.stats()["segments"], 5)
+        hits = store.query(since=1100, until=1200, types=["system_command"])
+        self.assertEqual([e["intent"]["n"] for e in hits], list(range(100, 200, 10)))
+        self.assertEqual(len(store.query(since=1250)), 50)
+        self.assertEqual(len(store.query(types=["chat"], limit=7)), 7)
+        store.close()
+
+    def test_reopen_uses_index(self):
+        store = ProvenanceStore(self.dir, segment_bytes=2000)
+        self.fill(store)
+        store.close()
+        reopened = ProvenanceStore(self.dir, segment_bytes=2000)
+        self.assertEqual(reopened.stats()["entries"], 300)
+        self.assertEqual(len(reopened.query(types=["system_command"])), 30)
+        reopened.append(entry(5000.0, "joke"))
+        self.assertEqual(reopened.query(since=4000)[0]["intent"]["type"], "joke")
+
+    def test_recovers_from_stale_index(self):
+        store = ProvenanceStore(self.dir)
+        self.fill(store, n=5)
+        seg = store.segments[-1]
+        with open(seg.data_path, "ab") as f: # written, crashed before the index, plus a torn line
+            f.write((json.dumps(entry(2000.0, "system_command")) + "\n").encode() + b'{"timest')
+        with open(seg.index_path, "a") as f:
+            f.write('[1999.0, ')
+        reopened = ProvenanceStore(self.dir)
+        self.assertEqual([e["timestamp"] for e in reopened.query(types=["system_command"])], [1000.0, 2000.0])
+        reopened.append(entry(3000.0, "chat"))
+        reopened.flush()
+        self.assertEqual(ProvenanceStore(self.dir).stats()["entries"], 7)
+
+    def test_legacy_import(self):
+        legacy = os.path.join(self.dir, "provenance_log.jsonl")
+        with open(legacy, "w") as f:
+            f.write(json.dumps(entry(10.0, "greeting")) + "\n")
+        store = ProvenanceStore(os.path.join(self.dir, "store"))
+        self.assertEqual(store.import_legacy(legacy), 1)
+        self.assertEqual(store.import_legacy(legacy), 0) # only into an empty store
+        self.assertEqual(store.stats()["entries"], 1)
+
+    def test_cli(self):
+        store = ProvenanceStore(self.dir)
+        now = time.time()
+        store.append(entry(now - 3 * 86400, "system_command"))
+        store.append(entry(now - 60, "system_command", action="shutdown"))
+        store.append(entry(now - 30, "chat"))
+        store.close()
+        out = io.StringIO()
+        with redirect_stdout(out):
+            main(["--dir", self.dir, "--since", "24h", "--type", "system_command"])
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([e["intent"].get("action") for e in lines], ["shutdown"])
+
+if __name__ == '__main__':
+    unittest.main()
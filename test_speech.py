@@ -0,0 +1,112 @@
+import threading
+import time
+import unittest
+from jarvis_speech import SentenceSegmenter, SpeechQueue
+
+class TestSentenceSegmenter(unittest.TestCase):
+    def test_streamed_tokens(self):
+        seg = SentenceSegmenter()
+        out = []
+        for token in ["The capital", " of France is Paris", ". It has about", " two million people.", " Nice!"]:
+            out.extend(seg.feed(token))
+        self.assertEqual(out, ["The capital of France is Paris.", "It has about two million people."])
+        self.assertEqual(seg.flush(), "Nice!")
+
+    def test_abbreviations_and_decimals(self):
+        seg = SentenceSegmenter()
+        out = seg.feed("Dr. Smith measured 3.5 litres of water today. Then he left. ")
+        self.assertEqual(out, ["Dr. Smith measured 3.5 litres of water today.", "Then he left."])
+
+    def test_short_fragments_merged(self):
+        seg = SentenceSegmenter()
+        self.assertEqual(seg.feed("Sure. Opening the browser now. "), ["Sure. Opening the browser now."])
+
+class TestSpeechQueue(unittest.TestCase):
+    def drain(self, q):
+        out = []
+        while True:
+            item = q.get(timeout=0)
+            if item is None:
+                return out
+            out.append(item.text)
+            q.done(item, True)
+
+    def test_priority_order(self):
+        q = SpeechQueue()
+        q.put("long answer", "low")
+        q.put("first normal")
+        q.put("battery critical", "urgent")
+        q.put("second normal")
+        self.assertEqual(self.drain(q), ["battery critical", "first normal", "second normal", "long answer"])
+
+    def test_coalescing(self):
+        q = SpeechQueue()
+        q.put("Searching for chrome...", transient=True)
+        q.put("Opened chrome")
+        q.put("Opened chrome") # duplicate
+        q.put("Volume 40", key="volume")
+        q.put("Volume 60", key="volume")
+        self.assertEqual(self.drain(q), ["Opened chrome", "Volume 60"])
+        self.assertEqual(q.stats()["coalesced"], 3)
+
+    def test_urgent_preempts_and_resumes(self):
+        q = SpeechQueue()
+        q.put("a long research answer")
+        item = q.get()
+        q.put("not urgent")
+        self.assertFalse(q.interrupted.is_set())
+        q.put("urgent warning", "urgent")
+        self.assertTrue(q.interrupted.is_set())
+        q.done(item, completed=False)
+        self.assertEqual(self.drain(q), ["urgent warning", "a long research answer", "not urgent"])
+
+    def test_newer_message_cuts_transient_short(self):
+        q = SpeechQueue()
+        q.put("Researching quantum computing, please wait...", transient=True)
+        item = q.get()
+        q.put("Here is what I found.")
+        self.assertTrue(q.interrupted.is_set())
+        q.done(item, completed=False)
+        self.assertEqual(self.drain(q), ["Here is what I found."])
+
+    def test_stop_flushes(self):
+        played = []
+        q = SpeechQueue()
+
+        def player():
+            while True:
+                item = q.get()
+                if item is None:
+                    return
+                stopped = q.interrupted.wait(0.5) # "speaking" for up to 0.5 s
+                played.append((item.text, not stopped))
+                q.done(item, not stopped)
+
+        t = threading.Thread(target=player)
+        t.start()
+        for i in range(3):
+            q.put(f"sentence {i}")
+        time.sleep(0.1)
+        self.assertTrue(q.speaking)
+        self.assertEqual(q.stop(), 2) # barge-in
+        time.sleep(0.1)
+        q.close()
+        t.join(1)
+        self.assertEqual(played, [("sentence 0", False)])
+        self.assertEqual(q.stats()["interrupted"], 1)
+        self.assertFalse(q.speaking)
+
+    def test_wait_idle(self):
+        q = SpeechQueue()
+        self.assertTrue(q.wait_idle(timeout=0))
+        q.put("Yes?")
+        self.assertTrue(q.busy) # queued, not picked up by the player yet
+        self.assertFalse(q.wait_idle(timeout=0.05))
+        item = q.get()
+        threading.Timer(0.1, q.done, (item, True)).start()
+        self.assertTrue(q.wait_idle(timeout=1))
+        self.assertFalse(q.busy)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import unittest
+import jarvis_stt
+from jarvis_stt import STTBackend, GoogleSTT, create_backend
+from test_wakeword import WORD, noise
+
+VOSK_MODEL = os.environ.get("VOSK_MODEL") # path to a downloaded Vosk model
+
+
+class LengthSTT(STTBackend):
+    name = "length"
+
+    def transcribe(self, pcm):
+        return f"{len(pcm)} bytes"
+
+
+class TestBackends(unittest.TestCase):
+    def test_non_streaming_backend_collects_audio(self):
+        partials = []
+        stream = LengthSTT().stream(on_partial=partials.append)
+        for i in range(0, len(WORD), 640):
+            stream.feed(WORD[i:i + 640])
+        self.assertEqual(stream.finish(), f"{len(WORD)} bytes")
+        self.assertEqual(partials, [])
+
+    def test_transcribe_is_required(self):
+        class NoTranscribe(STTBackend):
+            name = "broken"
+        with self.assertRaises(TypeError):
+            NoTranscribe()
+
+    def test_default_and_fallback(self):
+        self.assertIsInstance(create_backend({}), GoogleSTT)
+        self.assertEqual(create_backend({"stt": {"engine": "google", "language": "en-us"}}).language, "en-us")
+        # Missing package or model: still usable
+        backend = create_backend({"stt": {"engine": "vosk", "model": "/nonexistent"}})
+        self.assertIsInstance(backend, GoogleSTT)
+        self.assertFalse(backend.streaming)
+
+
+@unittest.skipIf(jarvis_stt.vosk is None or not VOSK_MODEL, "vosk or VOSK_MODEL not available")
+class TestVosk(unittest.TestCase):
+    def test_model_loaded_once(self):
+        a = jarvis_stt.VoskSTT(VOSK_MODEL)
+        b = jarvis_stt.VoskSTT(VOSK_MODEL)
+        self.assertIs(a.model, b.model)
+
+    def test_stream_matches_batch(self):
+        backend = jarvis_stt.VoskSTT(VOSK_MODEL)
+        pcm = noise(0.5) + WORD + noise(0.5)
+        stream = backend.stream()
+        for i in range(0, len(pcm), 640):
+            stream.feed(pcm[i:i + 640])
+        self.assertEqual(stream.finish(), backend.transcribe(pcm))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from jarvis_logging import LogPipeline
+from jarvis_tracing import Tracer, NO_SPAN
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.tracer = Tracer(capacity=3)
+
+    def test_nested_spans_share_trace(self):
+        with self.tracer.span("command", source="test") as root:
+            with self.tracer.span("nlu"):
+                with self.tracer.span("nlu.local"):
+                    self.tracer.annotate(stage="regex")
+            with self.tracer.span("handler", intent="joke"):
+                time.sleep(0.01)
+        trace = self.tracer.recent()[0]
+        self.assertEqual(trace["trace_id"], root.trace_id)
+        self.assertEqual([s["name"] for s in trace["spans"]], ["command", "nlu", "nlu.local", "handler"])
+        spans = {s["name"]: s for s in trace["spans"]}
+        self.assertEqual(spans["nlu.local"]["parent_id"], spans["nlu"]["span_id"])
+        self.assertEqual(spans["nlu.local"]["attrs"], {"stage": "regex"})
+        self.assertGreaterEqual(spans["handler"]["duration_ms"], 10)
+        self.assertGreaterEqual(trace["duration_ms"], spans["handler"]["duration_ms"])
+
+    def test_handoff_to_another_thread(self):
+        with self.tracer.span("command"):
+            parent = self.tracer.current()
+        # Finishes after the root, like TTS playback
+        t = threading.Thread(target=lambda: self.tracer.span("tts.play", parent=parent).__enter__().__exit__(None, None, None))
+        t.start(); t.join()
+        names = [s["name"] for s in self.tracer.recent()[0]["spans"]]
+        self.assertEqual(names, ["command", "tts.play"])
+
+    def test_executor_with_copied_context(self):
+        async def main():
+            with self.tracer.span("command"):
+                loop = asyncio.get_running_loop()
+                with ThreadPoolExecutor(1) as pool:
+                    def handle():
+                        with self.tracer.span("handle"):
+                            pass
+                    await loop.run_in_executor(pool, contextvars.copy_context().run, handle)
+        asyncio.run(main())
+        self.assertEqual(len(self.tracer.recent()), 1)
+        self.assertEqual(len(self.tracer.recent()[0]["spans"]), 2)
+
+    def test_ring_buffer_and_stages(self):
+        for i in range(5):
+            with self.tracer.span("command"):
+                with self.tracer.span("nlu"):
+                    pass
+        self.assertEqual(len(self.tracer.recent(limit=10)), 3)
+        self.assertEqual(self.tracer.stages()["nlu"]["count"], 3)
+
+    def test_error_recorded(self):
+        with self.assertRaises(ValueError):
+            with self.tracer.span("handler"):
+                raise ValueError("boom")
+        self.assertEqual(self.tracer.recent()[0]["spans"][0]["attrs"], {"error": "ValueError"})
+
+    def test_disabled(self):
+        tracer = Tracer(enabled=False)
+        self.assertIs(tracer.span("command"), NO_SPAN)
+        with tracer.span("command"):
+            tracer.annotate(x=1)
+        self.assertEqual(tracer.recent(), [])
+
+    def test_spans_logged(self):
+        path = os.path.join(tempfile.mkdtemp(), "log.jsonl")
+        log = LogPipeline(path)
+        tracer = Tracer().configure({"tracing": {}}, log)
+        with tracer.span("command"):
+            with tracer.span("nlu"):
+                tracer.annotate(name="shadowed")
+        log.close()
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r["name"] for r in records], ["nlu", "command"])
+        self.assertEqual(records[0]["attrs"], {"name": "shadowed"})
+        self.assertEqual(len({r["trace_id"] for r in records}), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import math
+import os
+import random
+import tempfile
+import unittest
+import wave
+from array import array
+import jarvis_wakeword
+from jarvis_wakeword import EnergyVAD, WakeWordSpotter, WakeWordStage, AudioFileSource
+
+RATE = 16000
+
+
+def tone(seconds, f0, f1, amp=8000):
+    """A frequency sweep with a harmonic, standing in for a spoken word."""
+    n = int(seconds * RATE)
+    out, phase = array("h"), 0.0
+    for i in range(n):
+        phase += 2 * math.pi * (f0 + (f1 - f0) * i / n) / RATE
+        out.append(int(amp * (0.7 * math.sin(phase) + 0.3 * math.sin(2 * phase))))
+    return out.tobytes()
+
+
+def noise(seconds, amp=60, seed=1):
+    rng = random.Random(seed)
+    return array("h", (rng.randint(-amp, amp) for _ in range(int(seconds * RATE)))).tobytes()
+
+
+WORD = tone(0.25, 300, 900) + tone(0.25, 900, 500)
+OTHER = tone(0.25, 1800, 1200) + tone(0.25, 2500, 2500)
+
+
+class TestEnergyVAD(unittest.TestCase):
+    def test_silence_and_speech(self):
+        vad = EnergyVAD()
+        self.assertFalse(vad.contains_speech(noise(1.0)))
+        self.assertTrue(vad.contains_speech(noise(0.5) + WORD + noise(0.5)))
+
+    def test_short_click_is_not_speech(self):
+        vad = EnergyVAD()
+        self.assertFalse(vad.contains_speech(noise(0.5) + tone(0.04, 1000, 1000) + noise(0.5)))
+
+    def test_trim(self):
+        vad = EnergyVAD()
+        trimmed = vad.trim(noise(1.0) + WORD + noise(1.0), pad_ms=0)
+        self.assertAlmostEqual(len(trimmed) / 2 / RATE, 0.5, delta=0.05)
+        self.assertEqual(vad.trim(noise(0.5)), b"")
+
+
+class TestWakeWordStage(unittest.TestCase):
+    def test_silence_never_reaches_the_cloud(self):
+        stage = WakeWordStage("jarvis", WakeWordSpotter())
+        calls = []
+        self.assertFalse(stage.check(noise(2.0), lambda: calls.append(1) or "jarvis"))
+        self.assertEqual(calls, [])
+        self.assertEqual(stage.stats["silent"], 1)
+
+    def test_cloud_fallback_without_templates(self):
+        stage = WakeWordStage("jarvis", WakeWordSpotter(), auto_enroll=0)
+        self.assertTrue(stage.check(noise(0.3) + WORD + noise(0.3), lambda: "hey Jarvis"))
+        self.assertFalse(stage.check(noise(0.3) + OTHER + noise(0.3), lambda: "hello"))
+        self.assertEqual(stage.stats["cloud_checks"], 2)
+
+    def test_cloud_fallback_keeps_the_command(self):
+        stage = WakeWordStage("jarvis", WakeWordSpotter(), auto_enroll=0)
+        self.assertEqual(stage.detect(noise(0.3) + WORD + noise(0.3), lambda: "Jarvis, open Notepad"),
+                         (True, None, "open notepad"))
+
+
+@unittest.skipIf(jarvis_wakeword.np is None, "numpy not installed")
+class TestWakeWordSpotter(unittest.TestCase):
+    def test_detects_template_inside_chunk(self):
+        spotter = WakeWordSpotter()
+        self.assertTrue(spotter.add_template(WORD))
+        hit, distance, end = spotter.detect(noise(0.4) + tone(0.25, 300, 900, 4000) + tone(0.25, 900, 500, 4000)
+                                            + noise(1.0, seed=2))
+        self.assertTrue(hit, distance)
+        self.assertAlmostEqual(end, 0.9, delta=0.1)
+        hit, miss_distance, _ = spotter.detect(noise(0.4) + OTHER + noise(1.0, seed=2))
+        self.assertFalse(hit, miss_distance)
+        self.assertLess(distance, miss_distance)
+
+    def test_auto_enroll_then_local(self):
+        directory = tempfile.mkdtemp()
+        stage = WakeWordStage("jarvis", WakeWordSpotter(), templates_dir=directory, auto_enroll=1)
+        self.assertTrue(stage.check(noise(0.3) + WORD + noise(0.3), lambda: "Jarvis"))
+        self.assertEqual(len(os.listdir(directory)), 1)
+        calls = []
+        self.assertTrue(stage.check(noise(0.5) + WORD + noise(0.5, seed=3), lambda: calls.append(1) or ""))
+        self.assertEqual(calls, [])
+        self.assertEqual(stage.stats["local_checks"], 1)
+        # Templates are picked up again on restart
+        spotter = WakeWordSpotter()
+        self.assertEqual(spotter.load_templates(directory), 1)
+
+    def test_cloud_confirms_until_enrolled(self):
+        stage = WakeWordStage("jarvis", WakeWordSpotter(), auto_enroll=3)
+        for seed in range(6):
+            self.assertTrue(stage.check(noise(0.3, seed=seed) + WORD + noise(0.3), lambda: "Jarvis"))
+        self.assertEqual(stage.stats["enrolled"], 3)
+        self.assertEqual(stage.stats["cloud_checks"], 3)
+        self.assertEqual(stage.stats["local_checks"], 3)
+        self.assertFalse(stage.enrolling)
+
+    def test_file_source_resamples(self):
+        path = os.path.join(tempfile.mkdtemp(), "clip.wav")
+        samples = array("h", WORD)[::2] # 8 kHz
+        with wave.open(path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(8000)
+            f.writeframes(samples.tobytes())
+        source = AudioFileSource(path)
+        self.assertAlmostEqual(source.duration, 0.5, delta=0.01)
+        self.assertEqual(b"".join(source.frames()), source.pcm)
+
+
+if __name__ == "__main__":
+    unittest.main()
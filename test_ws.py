@@ -0,0 +1,103 @@
+import asyncio
+import unittest
+from jarvis_ws import ConnectionManager
+
+class FakeSocket:
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.received = []
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        if self.fail:
+            raise ConnectionResetError("gone")
+        await asyncio.sleep(self.delay)
+        self.received.append(message)
+
+    async def close(self):
+        self.closed = True
+
+class TestConnectionManager(unittest.TestCase):
+    def test_slow_client_does_not_delay_others(self):
+        async def go():
+            manager = ConnectionManager()
+            fast, slow = FakeSocket(), FakeSocket(delay=1.0)
+            await manager.connect(fast)
+            await manager.connect(slow)
+            start = asyncio.get_running_loop().time()
+            for i in range(5):
+                await manager.broadcast({"type": "speak", "data": i})
+            broadcast_time = asyncio.get_running_loop().time() - start
+            await asyncio.sleep(0.05)
+            return broadcast_time, fast, slow
+        broadcast_time, fast, slow = asyncio.run(go())
+        self.assertLess(broadcast_time, 0.05)
+        self.assertEqual([m["data"] for m in fast.received], [0, 1, 2, 3, 4])
+        self.assertEqual(slow.received, [])
+
+    def test_stats_dropped_speak_kept(self):
+        async def go():
+            manager = ConnectionManager(max_queue=8, max_lossy=2)
+            slow = FakeSocket(delay=10.0)
+            await manager.connect(slow)
+            await asyncio.sleep(0) # writer is now stuck on its first send
+            await manager.broadcast({"type": "speak", "data": "first"})
+            for i in range(20):
+                await manager.broadcast({"type": "stats", "data": i})
+                await manager.broadcast({"type": "transcript", "data": f"t{i}"} if i % 5 == 0 else {"type": "stats", "data": i})
+            client = manager.clients[slow]
+            return list(client.queue), client.dropped
+        queue, dropped = asyncio.run(go())
+        stats = [m["data"] for m in queue if m["type"] == "stats"]
+        self.assertLessEqual(len(stats), 2)
+        self.assertEqual(stats[-1], 19) # newest stats kept
+        self.assertEqual([m["data"] for m in queue if m["type"] == "transcript"], ["t0", "t5", "t10", "t15"])
+        self.assertGreater(dropped, 0)
+
+    def test_partial_transcripts_are_lossy(self):
+        async def go():
+            manager = ConnectionManager(max_queue=8, max_lossy=2)
+            slow = FakeSocket(delay=10.0)
+            await manager.connect(slow)
+            await asyncio.sleep(0)
+            for word in ("open", "open note", "open notepad"):
+                await manager.broadcast({"type": "transcript", "data": word, "partial": True})
+            await manager.broadcast({"type": "transcript", "data": "open notepad"})
+            return list(manager.clients[slow].queue)
+        queue = asyncio.run(go())
+        self.assertEqual([(m["data"], m.get("partial", False)) for m in queue],
+                         [("open note", True), ("open notepad", True), ("open notepad", False)])
+
+    def test_dead_connection_pruned(self):
+        async def go():
+            manager = ConnectionManager()
+            ok, dead = FakeSocket(), FakeSocket(fail=True)
+            await manager.connect(ok)
+            await manager.connect(dead)
+            await manager.broadcast({"type": "speak", "data": "hi"})
+            await asyncio.sleep(0.05)
+            return manager, ok, dead
+        manager, ok, dead = asyncio.run(go())
+        self.assertEqual(manager.active_connections, [ok])
+        self.assertEqual(ok.received, [{"type": "speak", "data": "hi"}])
+
+    def test_hopeless_client_disconnected(self):
+        async def go():
+            manager = ConnectionManager(max_queue=2, max_backlog=3)
+            slow = FakeSocket(delay=10.0)
+            await manager.connect(slow)
+            await asyncio.sleep(0)
+            for i in range(5):
+                await manager.broadcast({"type": "speak", "data": i})
+            await asyncio.sleep(0)
+            return manager, slow
+        manager, slow = asyncio.run(go())
+        self.assertEqual(manager.active_connections, [])
+        self.assertTrue(slow.closed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -374,12 +374,14 @@ const App: React.FC = () => {
                 else if (s === 'processing') setStatus(AppStatus.PROCESSING);
                 else if (s === 'idle') setStatus(AppStatus.IDLE);
             } else if (msg.type === 'transcript') {
+                if (msg.partial) return; // live caption while still speaking, the final one follows
                 addMessage('user', msg.data);
             } else if (msg.type === 'speak') {
                 addMessage('model', msg.data);
                 speak(msg.data);
             } else if (msg.type === 'stats') {
-                setSysStats(msg.data);
+                // Only changed fields are sent, merge them in
+                setSysStats(prev => ({ ...prev, ...msg.data }));
             }
         };
     };
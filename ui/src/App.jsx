@@ -38,11 +38,12 @@ function App() {
         setStatus(msg.data === 'started' ? 'idle' : msg.data === 'stopped' ? 'offline' : msg.data)
       } else if (msg.type === 'transcript') {
         setLastMessage(msg.data)
+        if (msg.partial) return // live caption while still speaking, the final one follows
         setTranscript(prev => [...prev.slice(-4), { text: msg.data, role: 'user', time: new Date().toLocaleTimeString() }])
       } else if (msg.type === 'speak') {
         setTranscript(prev => [...prev.slice(-4), { text: msg.data, role: 'jarvis', time: new Date().toLocaleTimeString() }])
       } else if (msg.type === 'stats') {
-        setSysStats(msg.data)
+        setSysStats(prev => ({ ...prev, ...msg.data })) // only changed fields are sent
       }
     }
   }